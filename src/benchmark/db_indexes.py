@@ -0,0 +1,125 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for hot lookup queries with and without the secondary indexes
+# declared in zibot/core/db.py, on a temporary SQLite database seeded with
+# 1M custom command lookup rows.
+#
+# Usage: python src/benchmark/db_indexes.py [lookupRows]
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from tortoise import Tortoise, connections
+from tortoise.functions import Max
+
+from zibot.core import db
+
+
+GUILDS = 10_000
+OTHER_ROWS = 200_000
+CHUNK = 50_000
+
+
+async def seed(lookupRows: int) -> None:
+    conn = connections.get("default")
+    rng = random.Random(2264)
+    now = dt.datetime.now(dt.timezone.utc)
+
+    async def insert(query: str, rows: list[list[Any]]) -> None:
+        for i in range(0, len(rows), CHUNK):
+            await conn.execute_many(query, rows[i : i + CHUNK])
+
+    await insert('INSERT INTO "guilds" ("id") VALUES (?)', [[i] for i in range(GUILDS)])
+    await insert(
+        'INSERT INTO "commands" ("id", "type", "name", "category", "content", "uses", "ownerId", "createdAt", '
+        '"visibility", "enabled") VALUES (?, "text", ?, "unsorted", "", 0, 0, ?, 0, 1)',
+        [[i, f"cmd{i}", now] for i in range(1, 1001)],
+    )
+    await insert(
+        'INSERT INTO "commandsLookup" ("cmd_id", "name", "guild_id") VALUES (?, ?, ?)',
+        [[i % 1000 + 1, f"cmd{i}", i % GUILDS] for i in range(lookupRows)],
+    )
+    await insert(
+        'INSERT INTO "timer" ("event", "extra", "expires", "created", "owner") VALUES ("reminder", "{}", ?, ?, 0)',
+        [[now + dt.timedelta(seconds=rng.randrange(86400 * 365)), now] for _ in range(OTHER_ROWS)],
+    )
+    await insert(
+        'INSERT INTO "caseLog" ("caseId", "type", "modId", "targetId", "reason", "createdAt", "guild_id") '
+        'VALUES (?, "ban", ?, 0, "", ?, ?)',
+        [[i // GUILDS + 1, rng.randrange(50), now, i % GUILDS] for i in range(OTHER_ROWS)],
+    )
+    for table, column in (("disabled", "command"), ("prefixes", "prefix"), ("guildMutes", "mutedId")):
+        await insert(
+            f'INSERT INTO "{table}" ("{column}", "guild_id") VALUES (?, ?)',
+            [[f"{i // GUILDS}" if column != "mutedId" else i, i % GUILDS] for i in range(OTHER_ROWS)],
+        )
+    await conn.execute_script("ANALYZE")
+
+
+QUERIES: dict[str, Callable[[int], Awaitable[Any]]] = {
+    # Name that doesn't exist, the common case for chatter starting with a prefix
+    "commandsLookup (guild_id, name)": lambda g: db.CommandsLookup.filter(guild_id=g, name="typo").first(),
+    "timer ORDER BY expires": lambda _: db.Timer.all().order_by("expires").first(),
+    "caseLog MAX(caseId)": lambda g: db.CaseLog.filter(guild_id=g).annotate(caseId=Max("caseId")).values("caseId"),
+    "caseLog (guild_id, modId)": lambda g: db.CaseLog.filter(guild_id=g, modId=g % 50).count(),
+    "disabled (guild_id)": lambda g: db.Disabled.filter(guild_id=g).values_list("command", flat=True),
+    "prefixes (guild_id)": lambda g: db.Prefixes.filter(guild_id=g).values_list("prefix", flat=True),
+    "guildMutes (guild_id)": lambda g: db.GuildMutes.filter(guild_id=g).values_list("mutedId", flat=True),
+}
+
+
+async def measure(number: int = 50) -> dict[str, float]:
+    rng = random.Random(0)
+    ret = {}
+    for name, query in QUERIES.items():
+        guildIds = [rng.randrange(GUILDS) for _ in range(number)]
+        start = time.perf_counter()
+        for guildId in guildIds:
+            await query(guildId)
+        ret[name] = (time.perf_counter() - start) / number * 1e3
+    return ret
+
+
+async def main() -> None:
+    lookupRows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(db_url=f"sqlite://{tmp}/bench.db", modules={"models": ["zibot.core.db"]})
+        await Tortoise.generate_schemas()
+
+        print(f"Seeding {lookupRows} lookup rows...")
+        await seed(lookupRows)
+
+        indexed = await measure()
+
+        conn = connections.get("default")
+        _, rows = await conn.execute_query("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+        for row in rows:
+            await conn.execute_script(f'DROP INDEX "{row["name"]}"')
+        unindexed = await measure(5)
+
+        await Tortoise.close_connections()
+
+    print(f"{'query':<34}{'no index':>12}{'indexed':>12}")
+    for name in QUERIES:
+        print(f"{name:<34}{unindexed[name]:>10.3f}ms{indexed[name]:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Micro-benchmark for per-message command dispatch overhead (prefix lookup,
+# priority handling and context parsing), no network or database involved.
+#
+# Usage: python src/benchmark/dispatch.py
+
+from __future__ import annotations
+
+import copy
+import sys
+import timeit
+from pathlib import Path
+
+from discord.ext.commands.view import StringView
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from zibot.core.dispatch import parseCommand
+from zibot.core.prefix import PrefixMatcher
+
+
+BOT_ID = 740122842988937286
+PREFIXES = [f"<@{BOT_ID}> ", f"<@!{BOT_ID}> ", ">", "z!", "?", "zi.", "!!"]
+MESSAGES = [
+    ">ping",
+    ">>ping",
+    ">./hello world",
+    "z!help command run",
+    f"<@{BOT_ID}> ping",
+    "just chatting, not a command",
+    "another message that is not for the bot at all",
+]
+
+
+class FakeMessage:
+    """Stand-in for discord.Message, only carries what dispatcher needs"""
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.id = 0
+        self.author = None
+        self.channel = None
+        self.guild = None
+
+
+def _getContext(message: FakeMessage, prefixes: list[str]) -> tuple[str | None, str | None]:
+    """Mirrors what Bot.get_context does with a list prefix"""
+    view = StringView(message.content)
+    for prefix in prefixes:
+        if view.skip_string(prefix):
+            return prefix, view.get_word()
+    return None, None
+
+
+def oldDispatch(message: FakeMessage) -> tuple | None:
+    # when_mentioned_or + custom prefixes is rebuilt on every get_context
+    prefixes = [*PREFIXES]
+    prefix, _ = _getContext(message, prefixes)
+    if not prefix:
+        return None
+
+    priority = 0
+    unixStyle = False
+    msg = copy.copy(message)
+    msgContent = msg.content[len(prefix) :]
+    if msgContent.startswith(">") or msgContent.startswith("!") or (unixStyle := msgContent.startswith("./")):
+        priority = 1
+        msgContent = msgContent[2 if unixStyle else 1 :]
+        msg.content = prefix + msgContent
+        prefix, _ = _getContext(msg, [*PREFIXES])
+
+    tmp = msgContent.split(" ")
+    return priority, str(tmp.pop(0)).lower(), " ".join(tmp)
+
+
+MATCHER = PrefixMatcher(PREFIXES)
+
+
+def newDispatch(message: FakeMessage) -> tuple | None:
+    content = message.content
+    prefix = MATCHER.match(content)
+    if not prefix:
+        return None
+
+    parsed = parseCommand(content, prefix)
+    view = StringView(content)
+    view.skip_string(content[: parsed.start])
+    view.get_word()
+    return parsed.priority, parsed.name, parsed.argument
+
+
+def main() -> None:
+    messages = [FakeMessage(i) for i in MESSAGES]
+
+    for message in messages:
+        assert oldDispatch(message) == newDispatch(message), message.content
+
+    number = 20_000
+    for name, func in (("old", oldDispatch), ("new", newDispatch)):
+        elapsed = min(timeit.repeat(lambda: [func(m) for m in messages], number=number, repeat=5))
+        perMessage = elapsed / (number * len(messages)) * 1e9
+        print(f"{name}: {perMessage:8.1f} ns/message")
+
+
+if __name__ == "__main__":
+    main()
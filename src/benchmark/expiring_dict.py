@@ -0,0 +1,71 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for ExpiringDict lookups, compared to the old implementation
+# that scanned every item on each access.
+#
+# Usage: python src/benchmark/expiring_dict.py
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Any
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from zibot.core.data import ExpiringDict
+
+
+class OldExpiringDict(dict):
+    """ExpiringDict before it's O(1), verifyCache walks every item"""
+
+    def __init__(self, maxAgeSeconds: int = 3600) -> None:
+        self.maxAgeSeconds = maxAgeSeconds
+        super().__init__()
+
+    def verifyCache(self) -> None:
+        curTime = time.monotonic()
+        toRemove = [k for (k, (v, t)) in self.items() if curTime > (t + self.maxAgeSeconds)]
+        for k in toRemove:
+            del self[k]
+
+    def __getitem__(self, key: Any) -> Any:
+        self.verifyCache()
+        return super().__getitem__(key)[0]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.verifyCache()
+        return super().__setitem__(key, (value, time.monotonic()))
+
+
+def fill(cls, size: int):
+    items = cls(maxAgeSeconds=3600)
+    for i in range(size):
+        # dict.__setitem__ so filling the old one doesn't take forever
+        dict.__setitem__(items, i, (i, time.monotonic()))
+    return items
+
+
+def main() -> None:
+    rng = random.Random(2264)
+    for size in (10_000, 100_000):
+        keys = [rng.randrange(size) for _ in range(100)]
+        for name, cls in (("old", OldExpiringDict), ("new", ExpiringDict)):
+            items = fill(cls, size)
+            number = 1 if name == "old" else 1000
+            elapsed = min(timeit.repeat(lambda: [items[k] for k in keys], number=number, repeat=3))
+            perLookup = elapsed / (number * len(keys)) * 1e6
+            print(f"{size:>7} entries, {name}: {perLookup:10.3f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
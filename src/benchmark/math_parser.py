@@ -0,0 +1,200 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for MathBlock / calc, compiled (and cached) expressions compared
+# to the old pyparsing parser that parsed the expression on every eval.
+# Also checks both parsers agree on the whole corpus.
+#
+# Usage: python src/benchmark/math_parser.py [number]
+
+from __future__ import annotations
+
+import math
+import operator
+import sys
+import timeit
+from pathlib import Path
+
+from pyparsing import (
+    CaselessLiteral,
+    Combine,
+    Forward,
+    Group,
+    Literal,
+    Optional,
+    Word,
+    ZeroOrMore,
+    alphas,
+    nums,
+    oneOf,
+)
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from src import tse
+
+
+class OldNumericStringParser(object):
+    """TSE's old pyparsing based parser, parses the expression on every eval"""
+
+    def pushFirst(self, strg, loc, toks):
+        self.exprStack.append(toks[0])
+
+    def pushUMinus(self, strg, loc, toks):
+        if toks and toks[0] == "-":
+            self.exprStack.append("unary -")
+
+    def __init__(self):
+        """
+        expop   :: '^'
+        multop  :: '*' | '/'
+        addop   :: '+' | '-'
+        integer :: ['+' | '-'] '0'..'9'+
+        atom    :: PI | E | real | fn '(' expr ')' | '(' expr ')'
+        factor  :: atom [ expop factor ]*
+        term    :: factor [ multop factor ]*
+        expr    :: term [ addop term ]*
+        """
+        point = Literal(".")
+        e = CaselessLiteral("E")
+        fnumber = Combine(
+            Word("+-" + nums, nums) + Optional(point + Optional(Word(nums))) + Optional(e + Word("+-" + nums, nums))
+        )
+        ident = Word(alphas, alphas + nums + "_$")
+        mod = Literal("%")
+        plus = Literal("+")
+        minus = Literal("-")
+        mult = Literal("*")
+        iadd = Literal("+=")
+        imult = Literal("*=")
+        idiv = Literal("/=")
+        isub = Literal("-=")
+        div = Literal("/")
+        lpar = Literal("(").suppress()
+        rpar = Literal(")").suppress()
+        addop = plus | minus
+        multop = mult | div | mod
+        iop = iadd | isub | imult | idiv
+        expop = Literal("^")
+        pi = CaselessLiteral("PI")
+        expr = Forward()
+        atom = (
+            (Optional(oneOf("- +")) + (ident + lpar + expr + rpar | pi | e | fnumber).setParseAction(self.pushFirst))
+            | Optional(oneOf("- +")) + Group(lpar + expr + rpar)
+        ).setParseAction(self.pushUMinus)
+        # by defining exponentiation as "atom [ ^ factor ]..." instead of
+        # "atom [ ^ atom ]...", we get right-to-left exponents, instead of left-to-right
+        # that is, 2^3^2 = 2^(3^2), not (2^3)^2.
+        factor = Forward()
+        factor << atom + ZeroOrMore((expop + factor).setParseAction(self.pushFirst))
+        term = factor + ZeroOrMore((multop + factor).setParseAction(self.pushFirst))
+        expr << term + ZeroOrMore((addop + term).setParseAction(self.pushFirst))
+        final = expr + ZeroOrMore((iop + expr).setParseAction(self.pushFirst))
+        # addop_term = ( addop + term ).setParseAction( self.pushFirst )
+        # general_term = term + ZeroOrMore( addop_term ) | OneOrMore( addop_term)
+        # expr <<  general_term
+        self.bnf = final
+        # map operator symbols to corresponding arithmetic operations
+        epsilon = 1e-12
+        self.opn = {
+            "+": operator.add,
+            "-": operator.sub,
+            "+=": operator.iadd,
+            "-=": operator.isub,
+            "*": operator.mul,
+            "*=": operator.imul,
+            "/": operator.truediv,
+            "/=": operator.itruediv,
+            "^": operator.pow,
+            "%": operator.mod,
+        }
+        self.fn = {
+            "sin": math.sin,
+            "cos": math.cos,
+            "tan": math.tan,
+            "exp": math.exp,
+            "abs": abs,
+            "trunc": lambda a: int(a),
+            "round": round,
+            "sgn": lambda a: abs(a) > epsilon and ((a > 0) - (a < 0)) or 0,
+            "log": lambda a: math.log(a, 10),
+            "ln": math.log,
+            "log2": math.log2,
+        }
+
+    def evaluateStack(self, s):
+        op = s.pop()
+        if op == "unary -":
+            return -self.evaluateStack(s)
+        if op in self.opn:
+            op2 = self.evaluateStack(s)
+            op1 = self.evaluateStack(s)
+            return self.opn[op](op1, op2)
+        elif op == "PI":
+            return math.pi  # 3.1415926535
+        elif op == "E":
+            return math.e  # 2.718281828
+        elif op in self.fn:
+            return self.fn[op](self.evaluateStack(s))
+        elif op[0].isalpha():
+            return 0
+        else:
+            return float(op)
+
+    def eval(self, num_string, parseAll=True):
+        self.exprStack = []
+        results = self.bnf.parseString(num_string, parseAll)
+        return self.evaluateStack(self.exprStack[:])
+
+
+CORPUS = (
+    "1+1",
+    "12*6",
+    "5^5",
+    "50/2",
+    "2^3^2",
+    "-2^2",
+    "(1+2)*3-4/5",
+    "10 % 3 + 7 * (2 - 9)",
+    "-(4 + 5) * -3",
+    "1.5e3 / 2.5 - 0.25",
+    "2 * PI * 10",
+    "E ^ 2",
+    "sin(1) + cos(2) * tan(0.5)",
+    "abs(-42) + trunc(3.7) + round(2.4)",
+    "sgn(-5) + sgn(0) + sgn(5)",
+    "log(1000) + ln(E) + log2(8)",
+    "exp(2) - abs(-16)",
+    "((((1 + 2) * 3) - 4) / 5) ^ 2",
+    "1 + 2 * 3 - 4 / 5 + 6 * 7 - 8 / 9 + 10 * 11",
+    "10 += 5",
+    "3 *= 2 + 1",
+)
+
+
+def main(number: int = 1000) -> None:
+    old = OldNumericStringParser()
+    new = tse.MathParser()
+
+    for expression in CORPUS:
+        expected = old.eval(expression)
+        result = new.eval(expression)
+        assert math.isclose(expected, result), (expression, expected, result)
+
+    print(f"{len(CORPUS)} expressions, {number} rounds")
+    oldTime = timeit.timeit(lambda: [old.eval(e) for e in CORPUS], number=number)
+    print(f"old (pyparsing):  {oldTime / number * 1000:.3f}ms per round")
+    newTime = timeit.timeit(lambda: [new.eval(e) for e in CORPUS], number=number)
+    print(f"new (cached):     {newTime / number * 1000:.3f}ms per round")
+    uncached = tse.MathParser(cache_size=0)
+    uncachedTime = timeit.timeit(lambda: [uncached.eval(e) for e in CORPUS], number=number)
+    print(f"new (uncached):   {uncachedTime / number * 1000:.3f}ms per round")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,159 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for building custom command's seed variables in a large guild,
+# compared to the old adapters that computed every attribute (including
+# walking every member to count bots) when constructed.
+#
+# Usage: python src/benchmark/tse_adapters.py [members]
+
+from __future__ import annotations
+
+import datetime as dt
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from src import tse
+
+
+NOW = dt.datetime.now(dt.timezone.utc)
+
+
+class FakeMember:
+    """Stand-in for discord.Member, only carries what adapters need"""
+
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.name = f"member{id}"
+        self.global_name = self.name
+        self.display_name = self.name
+        self.discriminator = "0"
+        self.created_at = NOW
+        self.joined_at = NOW
+        self.bot = id % 10 == 0
+        self.colour = "#000000"
+        self.display_avatar = SimpleNamespace(url=f"https://cdn.discordapp.com/avatars/{id}.png")
+        self.status = "online"
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeGuild:
+    """Stand-in for discord.Guild"""
+
+    def __init__(self, memberCount: int) -> None:
+        self.id = 0
+        self.name = "Big Guild"
+        self.created_at = NOW
+        self.members = [FakeMember(i) for i in range(memberCount)]
+        self.member_count = memberCount
+        self.icon = None
+        self.description = None
+        self.channels = list(range(500))
+        self.roles = list(range(250))
+        self.owner = self.members[0]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class OldGuildAdapter(tse.AttributeAdapter):
+    """GuildAdapter before attributes are resolved lazily"""
+
+    def __init__(self, base) -> None:
+        super().__init__(base)
+        guild = base
+        bots = 0
+        humans = 0
+        for m in guild.members:
+            if m.bot:
+                bots += 1
+            else:
+                humans += 1
+        self._attributes.update(
+            {
+                "id": guild.id,
+                "created_at": guild.created_at,
+                "timestamp": int(guild.created_at.timestamp()),
+                "name": guild.name,
+                "icon": (getattr(guild.icon, "url", "https://cdn.discordapp.com/embed/avatars/1.png"), False),
+                "member_count": guild.member_count,
+                "members": guild.member_count,
+                "bots": bots,
+                "humans": humans,
+                "description": guild.description or "No description.",
+                "channels": len(guild.channels),
+                "roles": len(guild.roles),
+                "owner": guild.owner,
+            }
+        )
+
+
+class OldMemberAdapter(tse.AttributeAdapter):
+    """MemberAdapter before attributes are resolved lazily"""
+
+    def __init__(self, base) -> None:
+        super().__init__(base)
+        member = base
+        self._attributes.update(
+            {
+                "id": member.id,
+                "created_at": member.created_at,
+                "timestamp": int(member.created_at.timestamp()),
+                "name": member.name,
+                "color": member.colour,
+                "colour": member.colour,
+                "display_name": member.global_name,
+                "nick": member.display_name,
+                "avatar": (member.display_avatar.url, False),
+                "discriminator": member.discriminator,
+                "joined_at": getattr(member, "joined_at", member.created_at),
+                "mention": member.mention,
+                "bot": member.bot,
+            }
+        )
+
+
+def seed(guild: FakeGuild, memberAdapter, guildAdapter) -> dict:
+    """Same seed variables CustomCommand._processTag builds"""
+    author = memberAdapter(guild.members[1])
+    guildAdapter = guildAdapter(guild)
+    return {
+        "author": author,
+        "user": author,
+        "target": author,
+        "member": author,
+        "guild": guildAdapter,
+        "server": guildAdapter,
+    }
+
+
+def main() -> None:
+    memberCount = int(sys.argv[1]) if len(sys.argv) > 1 else 250_000
+    guild = FakeGuild(memberCount)
+    engine = tse.Interpreter([tse.StrictVariableGetterBlock()])
+
+    for script in ("Hello world!", "{author(mention)} {server(humans)} {server(bots)}"):
+        for name, adapters in (("old", (OldMemberAdapter, OldGuildAdapter)), ("new", (tse.MemberAdapter, tse.GuildAdapter))):
+            # Only the new adapters with a plain-text script are fast enough for more
+            number = 2000 if name == "new" and "{" not in script else 20
+            elapsed = min(timeit.repeat(lambda: engine.process(script, seed(guild, *adapters)), number=number, repeat=3))
+            print(f"{memberCount} members, {script!r:<52} {name}: {elapsed / number * 1e6:12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for TagScript processing with and without compiled templates,
+# parsing (node tree + verbs) is only paid once when templates are reused.
+#
+# Usage: python src/benchmark/tse_compile.py
+
+from __future__ import annotations
+
+import sys
+import timeit
+from pathlib import Path
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from src import tse
+
+
+BLOCKS = [
+    tse.AssignmentBlock(),
+    tse.EmbedBlock(),
+    tse.LooseVariableGetterBlock(),
+    tse.RedirectBlock(),
+    tse.RequireBlock(),
+    tse.RandomBlock(),
+    tse.ReactBlock(),
+    tse.ReactUBlock(),
+    tse.SilentBlock(),
+]
+TEMPLATES = {
+    "welcome": "Welcome, {member}! You're member #{guild(member_count)} of **{guild}**. Enjoy your stay!",
+    "command": (
+        "{=(greet):{random:Hi,Hello,Hey,Yo}}{=(name):{target(name)}}"
+        "{embed(title):{greet} {name}!}{embed(description):{args} - requested by {author(mention)}}"
+        "{embed(color):#ff0000}{react:👋}" + " {author} said {args}" * 20
+    ),
+}
+
+
+def main() -> None:
+    engine = tse.Interpreter(BLOCKS)
+    seed = {
+        "member": tse.StringAdapter("Z3R0"),
+        "author": tse.StringAdapter("Z3R0"),
+        "target": tse.StringAdapter("ziBot"),
+        "args": tse.StringAdapter("hello world"),
+    }
+
+    number = 2000
+    for name, message in TEMPLATES.items():
+        template = engine.compile(message)
+        parse = min(timeit.repeat(lambda: tse.Template(message), number=number, repeat=5))
+        old = min(timeit.repeat(lambda: engine.process(message, dict(seed)), number=number, repeat=5))
+        new = min(timeit.repeat(lambda: engine.process(template, dict(seed)), number=number, repeat=5))
+        print(
+            f"{name:<8} {len(template.nodes):>3} nodes, parse: {parse / number * 1e6:8.1f} us, "
+            f"process: {old / number * 1e6:8.1f} us -> {new / number * 1e6:8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
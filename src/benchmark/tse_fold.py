@@ -0,0 +1,66 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for constant folding, processing compiled templates of scripts
+# made of pure blocks with literal input, compared to processing them
+# without folding. Outputs are checked to be identical first.
+#
+# Usage: python src/benchmark/tse_fold.py [number]
+
+from __future__ import annotations
+
+import sys
+import timeit
+from pathlib import Path
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from src import tse
+
+
+BLOCKS = [
+    tse.AssignmentBlock(),
+    tse.LooseVariableGetterBlock(),
+    tse.MathBlock(),
+    tse.IfBlock(),
+    tse.ReplaceBlock(),
+    tse.SubstringBlock(),
+    tse.URLEncodeBlock(),
+    tse.StrfBlock(),
+]
+SCRIPTS = {
+    "constants": (
+        "Cooldown is {math:60*60*24} seconds ({math:{math:60*60*24}/3600} hours). "
+        "Search: <https://www.google.com/search?q={urlencode(+):{replace(_, ):how_to_use_zibot}}> "
+        "Launched {strf(1600000000):%Y-%m-%d} {substr(0-3):{replace(o,0):foobar}}"
+    ),
+    "mixed": (
+        "{=(cooldown):{math:60*60*24}}Hello {user}! Cooldown is {cooldown} seconds, "
+        "{if({math:2^10}==1024.0):{urlencode:that's a lot}|wrong} {user} "
+        "{replace(a,4):{replace(e,3):{replace(o,0):leetspeak for {user}}}}"
+    ),
+}
+
+
+def main(number: int = 10000) -> None:
+    folding, plain = tse.Interpreter(BLOCKS), tse.Interpreter(BLOCKS, fold_constants=False)
+    seed = {"user": tse.StringAdapter("Z3R0")}
+
+    for name, script in SCRIPTS.items():
+        foldedTemplate, plainTemplate = folding.compile(script), plain.compile(script)
+        assert folding.process(foldedTemplate, dict(seed)).body == plain.process(plainTemplate, dict(seed)).body
+
+        folded = sum(fold is not None for *_, fold in foldedTemplate.nodes)
+        print(f"{name}: {len(foldedTemplate.nodes)} blocks, {folded} folded")
+        for label, engine, template in (("plain", plain, plainTemplate), ("folded", folding, foldedTemplate)):
+            elapsed = timeit.timeit(lambda: engine.process(template, dict(seed)), number=number)
+            print(f"  {label:>6}: {elapsed / number * 1e6:8.1f} µs per run")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
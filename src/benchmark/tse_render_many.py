@@ -0,0 +1,138 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for greeting a batch of members that joined the same guild,
+# Interpreter.render_many with a shared guild adapter (copied per member
+# with the member count at the time they joined, like greetMembers does),
+# compared to calling Interpreter.process for every member like
+# handleGreeting used to.
+#
+# Usage: python src/benchmark/tse_render_many.py [members] [joins]
+
+from __future__ import annotations
+
+import datetime as dt
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from src import tse
+
+
+NOW = dt.datetime.now(dt.timezone.utc)
+# Same blocks as EventHandler's engine
+BLOCKS = [
+    tse.LooseVariableGetterBlock(),
+    tse.RandomBlock(),
+    tse.AssignmentBlock(),
+    tse.RequireBlock(),
+    tse.EmbedBlock(),
+    tse.ReactBlock(),
+]
+MESSAGE = (
+    "Welcome to {server(name)}, {member(mention)}! You're member #{server(members)} "
+    "({server(humans)} humans, {server(bots)} bots). {=(rules):<#123>}Please read {rules}. "
+    "Account created at {member(created_at)}"
+)
+
+
+class FakeMember:
+    """Stand-in for discord.Member, only carries what adapters need"""
+
+    def __init__(self, id: int, guild: FakeGuild) -> None:
+        self.id = id
+        self.name = f"member{id}"
+        self.global_name = self.name
+        self.display_name = self.name
+        self.discriminator = "0"
+        self.created_at = NOW
+        self.joined_at = NOW
+        self.bot = id % 10 == 0
+        self.colour = "#000000"
+        self.display_avatar = SimpleNamespace(url=f"https://cdn.discordapp.com/avatars/{id}.png")
+        self.guild = guild
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeGuild:
+    """Stand-in for discord.Guild"""
+
+    def __init__(self, memberCount: int) -> None:
+        self.id = 0
+        self.name = "Big Guild"
+        self.created_at = NOW
+        self.members = [FakeMember(i, self) for i in range(memberCount)]
+        self.member_count = memberCount
+        self.icon = None
+        self.description = None
+        self.channels = list(range(500))
+        self.roles = list(range(250))
+        self.owner = self.members[0]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+def seed(member, guild: tse.GuildAdapter) -> dict:
+    """Same seed variables EventHandler.getGreetSeed builds"""
+    target = tse.MemberAdapter(member)
+    return {"user": target, "member": target, "guild": guild, "server": guild}
+
+
+def main(memberCount: int = 50_000, joins: int = 500) -> None:
+    guild = FakeGuild(memberCount)
+    joined = guild.members[-joins:]
+    joins = len(joined)
+    engine = tse.Interpreter(BLOCKS)
+
+    # Member count at the time each member joined
+    counts = range(memberCount - joins + 1, memberCount + 1)
+
+    start = time.perf_counter()
+    expected = []
+    for m, count in zip(joined, counts):
+        guild.member_count = count
+        expected.append(engine.process(engine.compile(MESSAGE), seed(m, tse.GuildAdapter(guild))))
+    processTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    guildAdapter = tse.GuildAdapter(guild)
+    seeds = [seed(m, guildAdapter.with_attributes(member_count=c, members=c)) for m, c in zip(joined, counts)]
+    responses = engine.render_many(MESSAGE, seeds, return_exceptions=True)
+    batchTime = time.perf_counter() - start
+
+    # Without sharing the guild adapter, only the interpreter's work is saved
+    start = time.perf_counter()
+    unshared = engine.render_many(
+        MESSAGE,
+        [seed(m, tse.GuildAdapter(guild).with_attributes(member_count=c, members=c)) for m, c in zip(joined, counts)],
+    )
+    unsharedTime = time.perf_counter() - start
+
+    assert [r.body for r in responses] == [r.body for r in unshared] == [r.body for r in expected]  # type: ignore
+    assert len({r.body for r in responses}) == joins  # type: ignore
+    print(f"{joins} joins in a guild with {memberCount} members")
+    for name, elapsed in (
+        ("process()", processTime),
+        ("render_many(), adapter per join", unsharedTime),
+        ("render_many()", batchTime),
+    ):
+        print(f"{name:>32}: {elapsed * 1e3:8.1f} ms ({elapsed / joins * 1e6:7.1f} us per join)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
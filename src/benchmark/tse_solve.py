@@ -0,0 +1,128 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+# Benchmark for Interpreter._solve on large scripts, compared to the old
+# implementation that rebuilt the output and shifted every remaining node
+# after each substitution. Outputs are checked to be identical first.
+#
+# Usage: python src/benchmark/tse_solve.py
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+
+srcPath = Path(__file__).parent.parent
+sys.path.extend((str(srcPath), str(srcPath.parent)))
+
+from src import tse
+from src.tse.interpreter import Context
+
+
+BLOCKS = [
+    tse.AssignmentBlock(),
+    tse.StrictVariableGetterBlock(),
+    tse.MathBlock(),
+    tse.IfBlock(),
+    tse.AnyBlock(),
+    tse.StopBlock(),
+    tse.ReplaceBlock(),
+    tse.PythonBlock(),
+]
+
+
+class OldInterpreter(tse.Interpreter):
+    """Interpreter before _solve is linear"""
+
+    def _solve(self, message, node_ordered_list, response, charlimit, *, verb_limit=2000, **budget):
+        final = message
+        total_work = 0
+
+        for i, node in enumerate(node_ordered_list):
+            node.verb = tse.Verb(final[node.coordinates[0] : node.coordinates[1] + 1], limit=verb_limit)
+            ctx = Context(node.verb, response, self, message)
+
+            self._get_acceptors(ctx, node)
+            if node.output is None:
+                continue
+
+            if charlimit is not None:
+                total_work = total_work + len(node.output)
+                if total_work > charlimit:
+                    raise tse.WorkloadExceededError(f"{total_work}/{charlimit}")
+
+            start, end = node.coordinates
+            differential = len(node.output) - ((end + 1) - start)
+            if "TSE_STOP" in response.actions:
+                return final[:start] + node.output
+            final = final[:start] + node.output + final[end + 1 :]
+
+            for future_n in islice(node_ordered_list, i + 1, None):
+                newStart = (
+                    future_n.coordinates[0] + differential if future_n.coordinates[0] > start else future_n.coordinates[0]
+                )
+                newEnd = (
+                    future_n.coordinates[1] + differential if future_n.coordinates[1] > start else future_n.coordinates[1]
+                )
+                future_n.coordinates = (newStart, newEnd)
+
+        return final
+
+
+def randomScript(rng: random.Random, depth: int = 0) -> str:
+    """Random mix of text, nested blocks and stray brackets"""
+    parts = []
+    for _ in range(rng.randrange(1, 6)):
+        inner = randomScript(rng, depth + 1) if depth < 3 and rng.random() < 0.4 else rng.choice("abxy12")
+        parts.append(
+            rng.choice(
+                (
+                    "text ",
+                    "{",
+                    "}",
+                    f"{{=({rng.choice('ab')}):{inner}}}",
+                    f"{{{rng.choice('ab')}}}",
+                    f"{{math:{inner}+{rng.randrange(9)}}}",
+                    f"{{if({inner}=={rng.choice('ab12')}):yes|{inner}}}",
+                    f"{{replace(a,{inner}):{inner}}}",
+                    f"{{stop({inner}==x):stopped}}",
+                    f"{{unknown({inner}):{inner}}}",
+                    f"{{in({inner}):{inner}}}",
+                )
+            )
+        )
+    return "".join(parts)
+
+
+def largeScript(blocks: int) -> str:
+    """Script with lots of blocks and large variable expansions"""
+    return "{=(big):" + "lorem ipsum " * 500 + "}" + "".join(f"{{big}}{{=(v{i}):{i}}}{{v{i}}} " for i in range(blocks))
+
+
+def main() -> None:
+    old, new = OldInterpreter(BLOCKS), tse.Interpreter(BLOCKS)
+
+    rng = random.Random(2264)
+    corpus = [randomScript(rng) for _ in range(5000)]
+    for script in corpus:
+        expected, response = old.process(script), new.process(script)
+        assert (expected.body, expected.actions) == (response.body, response.actions), script
+    print(f"{len(corpus)} random scripts, identical output")
+
+    for blocks in (100, 500, 1000):
+        script = largeScript(blocks)
+        for name, engine in (("old", old), ("new", new)):
+            start = time.perf_counter()
+            engine.process(script)
+            print(f"{blocks * 3:>5} blocks, {name}: {(time.perf_counter() - start) * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,20 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from __future__ import annotations
 
+import asyncio
+import datetime as dt
+from contextlib import suppress
+
 import discord.ext.test as dpytest
 import pytest
+from tortoise import Tortoise
 
+from zibot.core import db
 from zibot.core.bot import ziBot
+from zibot.core.dispatch import parseCommand
+from zibot.core.prefix import PrefixMatcher
+from zibot.core.settings import GuildConfigWriter, GuildSettings, compactGuildConfigs
+from zibot.utils import utcnow
 
 
 @pytest.mark.asyncio
@@ -17,3 +27,194 @@ async def testBotMentioned(bot: ziBot):
     """Test prefix list being sent when bot is mentioned"""
     await dpytest.message(bot.user.mention)  # type: ignore
     assert not dpytest.verify().message().nothing()
+
+
+@pytest.mark.asyncio
+async def testGuildSettingsCachedWhenEmpty(bot: ziBot):
+    """Test guild without custom prefixes/disabled commands is still cached"""
+    guild = dpytest.get_config().guilds[0]
+    settings = await bot.getGuildSettings(guild.id)
+    assert settings.prefixes == [] and settings.disabled == []
+    assert bot.cache.guildSettings.get(guild.id) is settings  # type: ignore
+
+
+@pytest.mark.asyncio
+async def testGuildSettingsSingleFlight(bot: ziBot):
+    """Test concurrent cold loads for the same guild are coalesced"""
+    guild = dpytest.get_config().guilds[0]
+    bot.cache.guildSettings.clear(guild.id)  # type: ignore
+    saved = bot.singleFlight.saved["guildSettings"]
+
+    results = await asyncio.gather(*[bot.getGuildSettings(guild.id) for _ in range(5)])
+    assert all(settings is results[0] for settings in results)
+    assert bot.singleFlight.saved["guildSettings"] - saved == 4
+
+
+@pytest.mark.asyncio
+async def testGuildSettingsFetchMany(bot: ziBot):
+    """Test bulk loaded settings are the same as the ones loaded one by one"""
+    guild = dpytest.get_config().guilds[0]
+    await dpytest.message(">prefix + ?")
+
+    settings, rowCount = await GuildSettings.fetchMany([guild.id, 0])
+    single = await GuildSettings.fetch(guild.id)
+    assert settings[guild.id].prefixes == single.prefixes == ["?"]
+    assert settings[guild.id].configs == single.configs
+    assert settings[0].prefixes == [] and rowCount >= 1
+
+
+@pytest.mark.asyncio
+async def testSetGuildConfigUpsert(bot: ziBot):
+    """Test config changes are batched into a single row per guild"""
+    guild = dpytest.get_config().guilds[0]
+    await bot.setGuildConfig(guild.id, "ccMode", 1)
+    await bot.setGuildConfig(guild.id, "welcomeMsg", "hi")
+    await bot.configWriter.flush()
+    await bot.setGuildConfig(guild.id, "ccMode", 2)
+    await bot.configWriter.flush()
+
+    rows = await db.GuildConfigs.filter(guild_id=guild.id).values("ccMode", "welcomeMsg")
+    assert rows == [{"ccMode": 2, "welcomeMsg": "hi"}]
+
+
+@pytest.mark.asyncio
+async def testPendingConfigSurvivesEviction(bot: ziBot):
+    """Test config that's not written yet isn't lost when guild settings are evicted"""
+    guild = dpytest.get_config().guilds[0]
+    await bot.setGuildConfig(guild.id, "welcomeMsg", "hi")
+    bot.cache.guildSettings.clear(guild.id)  # type: ignore
+    assert await bot.getGuildConfig(guild.id, "welcomeMsg") == "hi"
+
+    await bot.configWriter.flush()
+    bot.cache.guildSettings.clear(guild.id)  # type: ignore
+    assert await bot.getGuildConfig(guild.id, "welcomeMsg") == "hi"
+
+
+@pytest.mark.asyncio
+async def testConfigWrittenDuringFlush(bot: ziBot):
+    """Test config set while a flush is running gets its own flush, and close() doesn't drop an in-flight one"""
+    guild = dpytest.get_config().guilds[0]
+    writer = GuildConfigWriter(delay=0)
+    writer.set(db.GuildConfigs, guild.id, "welcomeMsg", "hi")
+    # Wait for the delayed flush to pick it up
+    while not writer._flushing:
+        await asyncio.sleep(0)
+    writer.set(db.GuildConfigs, guild.id, "ccMode", 1)
+    while writer._pending or writer._flushing:
+        await asyncio.sleep(0.01)
+    assert await db.GuildConfigs.filter(guild_id=guild.id).values("ccMode", "welcomeMsg") == [
+        {"ccMode": 1, "welcomeMsg": "hi"}
+    ]
+
+    writer.set(db.GuildConfigs, guild.id, "welcomeMsg", "bye")
+    while not writer._flushing:
+        await asyncio.sleep(0)
+    await writer.close()
+    assert await db.GuildConfigs.filter(guild_id=guild.id).values_list("welcomeMsg", flat=True) == ["bye"]
+
+
+@pytest.mark.asyncio
+async def testCompactGuildConfigs(bot: ziBot):
+    """Test duplicate config rows from older versions collapse into the row that was read"""
+    # Tables from before guild_id was unique
+    await Tortoise.get_connection("default").execute_script(
+        'ALTER TABLE "guildConfigs" RENAME TO "_guildConfigs";'
+        'CREATE TABLE "guildConfigs" AS SELECT * FROM "_guildConfigs";'
+        'DROP TABLE "_guildConfigs";'
+    )
+    await db.Guilds.create(id=1)
+    await db.GuildConfigs.create(id=100, guild_id=1, ccMode=2, welcomeMsg="hi")
+    await db.GuildConfigs.create(id=101, guild_id=1, ccMode=0)
+    await db.GuildConfigs.create(id=102, guild_id=1, welcomeMsg="bye")
+
+    assert await compactGuildConfigs() == 2
+    rows = await db.GuildConfigs.filter(guild_id=1).values("id", "ccMode", "welcomeMsg")
+    assert rows == [{"id": 100, "ccMode": 2, "welcomeMsg": "hi"}]
+    assert await compactGuildConfigs() == 0
+
+
+@pytest.mark.asyncio
+async def testUsageRollupUpsert(bot: ziBot):
+    """Test usage flushes on the same day add up into a single row per command"""
+    for _ in range(3):
+        bot.usage.addCommand("ping")
+        bot.usage.addCustomCommand(1)
+        await bot.usage.flush()
+    bot.usage.addCommand("help")
+    await bot.usage.flush()
+
+    rows = await db.CommandUsage.all().order_by("custom", "command").values_list("custom", "command", "uses")
+    assert [(bool(c), name, uses) for c, name, uses in rows] == [(False, "help", 1), (False, "ping", 3), (True, "1", 3)]
+
+    commands, custom = await bot.usage.fetchTotals()
+    assert commands["ping"] == 3 and custom == 3
+
+
+@pytest.mark.asyncio
+async def testUsageFlushLoopCancelled(bot: ziBot):
+    """Test cancelling the flush loop midway (e.g. on shutdown) doesn't lose counters"""
+    bot.usage.addCommand("ping")
+    bot.flushUsage.start()
+    # Wait for the loop to swap the counters out
+    while bot.usage.commands:
+        await asyncio.sleep(0)
+    task = bot.flushUsage.get_task()
+    bot.flushUsage.cancel()
+    with suppress(asyncio.CancelledError):
+        await task
+
+    bot.usage.addCommand("ping")
+    await bot.usage.flush()
+    assert await db.CommandUsage.filter(command="ping").values_list("uses", flat=True) == [2]
+
+
+@pytest.mark.asyncio
+async def testPurgeDepartedGuilds(bot: ziBot):
+    """Test departed guilds (including ones scheduled by old timers) are wiped in bulk"""
+    guild = dpytest.get_config().guilds[0]
+    now = utcnow()
+    await db.Guilds.bulk_create([db.Guilds(id=1), db.Guilds(id=2), db.Guilds(id=3)])
+    await db.Timer.create(event="guild_del", extra={}, expires=now, created=now - dt.timedelta(days=40), owner=1)
+    for guildId in (1, 2, guild.id):
+        cmd = await db.Commands.create(type="text", name="hello", content="hi", ownerId=0, createdAt=now)
+        await db.CommandsLookup.create(cmd=cmd, name="hello", guild_id=guildId)
+        await db.Prefixes.create(prefix="?", guild_id=guildId)
+    await db.Guilds.filter(id=3).update(leftAt=now - dt.timedelta(days=31))
+
+    cmdIds = await db.CommandsLookup.filter(guild_id__in=[1, guild.id]).order_by("guild_id").values_list("cmd_id", flat=True)
+    for guildId, cmdId in zip((1, guild.id), cmdIds):
+        bot.cache.customCommands.set((guildId, cmdId), object())  # type: ignore
+        bot.cache.ccResponses.set((cmdId, "hi", ()), object())  # type: ignore
+
+    await bot.manageGuildDeletion()
+    assert not await db.Timer.filter(event="guild_del").exists()
+    assert await db.Guilds.filter(id=guild.id, leftAt=None).exists()
+
+    assert await bot.purgeDepartedGuilds() == 2
+    assert await db.Guilds.filter(leftAt__not_isnull=True).values_list("id", flat=True) == [2]
+    assert sorted(await db.CommandsLookup.all().values_list("guild_id", flat=True)) == [2, guild.id]
+    assert await db.Commands.all().count() == 2
+    assert not await db.Prefixes.filter(guild_id__in=[1, 3]).exists()
+    # Departed guild's commands are gone from the caches too
+    assert list(bot.cache.customCommands.items) == [(guild.id, cmdIds[1])]  # type: ignore
+    assert [key[0] for key in bot.cache.ccResponses.items] == [cmdIds[1]]  # type: ignore
+
+
+def testPrefixMatcher():
+    """Test prefix matcher picks the same prefix when_mentioned_or would"""
+    matcher = PrefixMatcher(["<@1> ", "<@!1> ", ">", ">>", "z!"])
+    assert matcher.match(">>ping") == ">"
+    assert matcher.match("<@1> ping") == "<@1> "
+    assert matcher.match("z!ping") == "z!"
+    assert matcher.match("zping") is None
+    assert matcher.match("") is None
+
+
+def testParseCommand():
+    """Test priority marker and custom command's arguments parsing"""
+    parsed = parseCommand(">>Hello world  !", ">")
+    assert (parsed.priority, parsed.start, parsed.name, parsed.argument) == (1, 2, "hello", "world  !")
+    parsed = parseCommand(">./hello", ">")
+    assert (parsed.priority, parsed.start, parsed.name, parsed.argument) == (1, 3, "hello", "")
+    parsed = parseCommand("z!ping", "z!")
+    assert (parsed.priority, parsed.start, parsed.name) == (0, 2, "ping")
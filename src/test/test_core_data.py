@@ -0,0 +1,58 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import time
+
+from zibot.core.data import CacheListProperty, CacheProperty, ExpiringDict
+
+
+def testCachePropertyLRU():
+    """Test least recently used item is evicted once cache is full"""
+    cache = CacheProperty(maxSize=2)
+    cache.set(1, "a").set(2, "b")
+    assert cache.get(1) == "a"  # 2 is now the least recently used
+    cache.set(3, "c")
+
+    assert 2 not in cache and cache.get(2) is None
+    assert cache.get(1) == "a" and cache.get(3) == "c"
+    assert cache.stats == {"size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def testCachePropertyTTL(monkeypatch):
+    """Test item expires after ttl, including items inside list property"""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+
+    cache = CacheListProperty(unique=True, ttl=10)
+    cache.add(1, ">").add(1, "!")
+    assert cache.get(1) == [">", "!"]
+
+    now += 11
+    assert cache.get(1) is None
+    cache.add(1, "?")
+    assert cache.get(1) == ["?"]
+
+
+def testExpiringDict(monkeypatch):
+    """Test expired items are dropped, and re-set items get a fresh age"""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+
+    items = ExpiringDict({"a": 1, "b": 2}, maxAgeSeconds=10)
+    now += 5
+    items["a"] = 3
+    items["c"] = 4
+
+    now += 6
+    assert "b" not in items and items.get("b") is None
+    assert items["a"] == 3 and "c" in items
+    assert list(items) == ["a", "c"]
+
+    now += 10
+    items.verifyCache()
+    assert not items
@@ -0,0 +1,75 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import discord.ext.test as dpytest
+import pytest
+
+from zibot.core.bot import ziBot
+from zibot.exts.events.events import EventHandler
+
+
+@pytest.mark.asyncio
+async def testBatchedGreetings(bot: ziBot, monkeypatch):
+    """Test members greeted in one batch get their own member count, and a failed send doesn't drop the rest"""
+    config = dpytest.get_config()
+    guild, channel = config.guilds[0], config.channels[0]
+    if not bot.get_cog("EventHandler"):
+        await bot.load_extension("zibot.exts.events")
+    handler: EventHandler = bot.get_cog("EventHandler")  # type: ignore
+    await bot.setGuildConfig(guild.id, "welcomeCh", channel.id, "GuildChannels")
+    await bot.setGuildConfig(guild.id, "welcomeMsg", "{member(id)} is member #{server(members)}")
+    first, second = guild.me, config.members[0]
+    await dpytest.empty_queue()
+
+    await handler.greetMembers([(first, 5), (second, 6)], "welcome")
+    assert dpytest.get_message().content == f"{first.id} is member #5"
+    assert dpytest.get_message().content == f"{second.id} is member #6"
+
+    send = discord.TextChannel.send
+
+    async def flakySend(self, content=None, **kwargs):
+        if str(first.id) in str(content):
+            raise discord.HTTPException(SimpleNamespace(status=500, reason="Internal Server Error"), "oops")
+        return await send(self, content, **kwargs)
+
+    monkeypatch.setattr(discord.TextChannel, "send", flakySend)
+    await handler.greetMembers([(first, 5), (second, 6)], "welcome")
+    assert dpytest.get_message().content == f"{second.id} is member #6"
+    assert dpytest.verify().message().nothing()
+
+
+@pytest.mark.asyncio
+async def testGreetingBatchInBackground(bot: ziBot, monkeypatch):
+    """Test greetings are sent in the background, joins during a running batch are greeted by the next one"""
+    guild = dpytest.get_config().guilds[0]
+    if not bot.get_cog("EventHandler"):
+        await bot.load_extension("zibot.exts.events")
+    handler: EventHandler = bot.get_cog("EventHandler")  # type: ignore
+    first, second, third = (SimpleNamespace(id=i, guild=guild) for i in range(3))
+    batches: list[list] = []
+    release = asyncio.Event()
+
+    async def greetMembers(members, type):
+        batches.append([member for member, _ in members])
+        await release.wait()
+
+    monkeypatch.setattr(handler, "greetMembers", greetMembers)
+    # Returns without waiting for the batch to be sent
+    await handler.handleGreeting(first, "welcome")  # type: ignore
+    await asyncio.sleep(0)
+    await handler.handleGreeting(second, "welcome")  # type: ignore
+    await handler.handleGreeting(third, "welcome")  # type: ignore
+    release.set()
+    while (guild.id, "welcome") in handler._pendingGreetings:
+        await asyncio.sleep(0)
+
+    assert batches == [[first], [second, third]]
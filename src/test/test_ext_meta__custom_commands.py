@@ -10,6 +10,7 @@ import discord.ext.test as dpytest
 import pytest
 
 from zibot.core.bot import ziBot
+from zibot.exts.meta._custom_command import ENGINE
 from zibot.exts.meta._errors import CCommandAlreadyExists, CCommandNotFound
 
 
@@ -57,3 +58,97 @@ async def testCommandPriorityExecution(bot: ziBot):
 
     await dpytest.message(">ping")
     assert dpytest.get_message(peek=True).content != msg
+
+
+@pytest.mark.asyncio
+async def testCommandLookupIndex(bot: ziBot):
+    """Test name/alias index is kept in sync with add/alias/remove"""
+    guild = dpytest.get_config().guilds[0]
+    await dpytest.message(">cmd + test test")
+    await dpytest.message(">cmd alias test test-alias")
+
+    lookup = bot.cache.ccLookup.get(guild.id)  # type: ignore
+    assert lookup["test"] == lookup["test-alias"]
+
+    await dpytest.message(">cmd - test")
+    assert lookup == {}
+    with pytest.raises(CCommandNotFound):
+        await dpytest.message(">cmd - test-alias")
+
+
+@pytest.mark.asyncio
+async def testCommandCacheInvalidation(bot: ziBot):
+    """Test cached custom command is reused, and dropped once it's edited"""
+    await dpytest.message(">cmd + test old")
+    await dpytest.message(">>test")
+    await dpytest.message(">>test")
+    assert dpytest.get_message(peek=True).content == "old"
+    assert bot.cache.customCommands.hits >= 1  # type: ignore
+
+    await dpytest.message(">cmd edit test new")
+    await dpytest.message(">>test")
+    assert dpytest.get_message(peek=True).content == "new"
+
+
+@pytest.mark.asyncio
+async def testCommandWorkloadExceeded(bot: ziBot):
+    """Test large commands run off the event loop, and over budget ones fail cleanly"""
+    await dpytest.message(">cmd + big " + "{=(a):1}" * 150 + "done")
+    await dpytest.message(">>big")
+    assert dpytest.get_message(peek=True).content == "done"
+
+    await dpytest.message(">cmd + heavy " + "{=(a):1}" * 2001)
+    await dpytest.message(">>heavy")
+    assert str(dpytest.get_embed(peek=True).title).endswith("too heavy to run!")
+
+
+@pytest.mark.asyncio
+async def testCommandResponseMemoized(bot: ziBot):
+    """Test deterministic commands are memoized by the variables they use"""
+    await dpytest.message(">cmd + memo {prefix}memo {args}")
+    await dpytest.message(">>memo a")
+    assert dpytest.get_message(peek=True).content == ">memo a"
+    await dpytest.message(">>memo a")
+    assert dpytest.get_message(peek=True).content == ">memo a"
+    assert len(bot.cache.ccResponses) == 1
+    await dpytest.message(">>memo b")
+    assert dpytest.get_message(peek=True).content == ">memo b"
+    assert len(bot.cache.ccResponses) == 2
+
+    await dpytest.message(">cmd + counter {uses}")
+    await dpytest.message(">>counter")
+    await dpytest.message(">>counter")
+    assert dpytest.get_message(peek=True).content == "2"
+    assert len(bot.cache.ccResponses) == 2
+
+
+@pytest.mark.asyncio
+async def testCommandPureBlocks(bot: ziBot):
+    """Test pure blocks work in custom commands, constant ones are folded"""
+    await dpytest.message(">cmd + pure {math:{math:60*60}*24} {if({args}==a):yes|no}")
+    await dpytest.message(">>pure a")
+    assert dpytest.get_message(peek=True).content == "86400.0 yes"
+    await dpytest.message(">>pure b")
+    assert dpytest.get_message(peek=True).content == "86400.0 no"
+
+    template = ENGINE.compile("{math:{math:60*60}*24} {if({args}==a):yes|no}")
+    assert template.nodes[0][3][1] == "86400.0"  # type: ignore
+
+
+@pytest.mark.asyncio
+async def testCommandMemoizedByValue(bot: ziBot):
+    """Test memoized responses are keyed by the values read, not just who the author is"""
+    author = dpytest.get_config().members[0]
+    await dpytest.message(">cmd + hello Hi {author(name)}")
+    await dpytest.message(">>hello")
+    assert dpytest.get_message(peek=True).content == f"Hi {author.name}"
+
+    author._user.name = "renamed"
+    await dpytest.message(">>hello")
+    assert dpytest.get_message(peek=True).content == "Hi renamed"
+
+    # Random members can't be memoized
+    await dpytest.message(">cmd + lucky {server(random)}")
+    memoized = len(bot.cache.ccResponses)
+    await dpytest.message(">>lucky")
+    assert len(bot.cache.ccResponses) == memoized
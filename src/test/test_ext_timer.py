@@ -0,0 +1,119 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+
+import pytest
+import pytest_asyncio
+
+from zibot.core import db
+from zibot.core.bot import ziBot
+from zibot.exts.timer.timer import Timer, TimerData
+from zibot.utils import utcnow
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: dt.datetime = utcnow()
+
+    def __call__(self) -> dt.datetime:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += dt.timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr("zibot.exts.timer.timer.utcnow", clock)
+    return clock
+
+
+@pytest_asyncio.fixture  # type: ignore
+async def timer(bot: ziBot) -> Timer:
+    """Timer cog without its dispatcher, timers are dispatched by calling `dispatchDue`"""
+    if not bot.get_cog("Timer"):
+        await bot.load_extension("zibot.exts.timer")
+    timer: Timer = bot.get_cog("Timer")  # type: ignore
+    timer.cog_unload()
+    timer._reset()
+    return timer
+
+
+def collectCompleted(bot: ziBot, event: str = "test") -> list[TimerData]:
+    completed: list[TimerData] = []
+
+    async def onTimerComplete(data: TimerData) -> None:
+        completed.append(data)
+
+    bot.add_listener(onTimerComplete, f"on_{event}_timer_complete")
+    return completed
+
+
+async def dispatchUntilIdle(timer: Timer) -> float:
+    while not (timeout := await timer.dispatchDue()):
+        pass
+    # Let the listeners run
+    await asyncio.sleep(0)
+    return timeout
+
+
+@pytest.mark.asyncio
+async def testTimerHeapDispatch(bot: ziBot, timer: Timer, clock: Clock):
+    """Test timers are dispatched in order, together when they expire at the same time"""
+    # Small batch so top up is exercised
+    timer.BATCH_SIZE = 2
+    completed = collectCompleted(bot)
+
+    now = clock.now
+    await timer.createTimer(now + dt.timedelta(days=1), "test", created=now, owner=0)
+    cancelled = await timer.createTimer(now + dt.timedelta(seconds=20), "test", created=now, owner=1)
+    for i in range(3):
+        await timer.createTimer(now + dt.timedelta(seconds=30), "test", i, created=now, owner=2)
+
+    assert await timer.cancelTimers(owner=1) == 1
+    # Cancelled timer is skipped
+    assert await dispatchUntilIdle(timer) == 30
+    assert completed == []
+
+    clock.advance(30)
+    assert await dispatchUntilIdle(timer) == timer.MAX_SLEEP - 30
+    assert cancelled.id not in [i.id for i in completed]
+    assert sorted(i.args[0] for i in completed) == [0, 1, 2]
+    assert await db.Timer.filter(event="test").values_list("owner", flat=True) == [0]
+
+
+@pytest.mark.asyncio
+async def testTimerCreatedDuringTopUp(bot: ziBot, timer: Timer, clock: Clock):
+    """Test timer created while a top up is querying the database isn't skipped"""
+    completed = collectCompleted(bot)
+    fetched = asyncio.Event()
+    release = asyncio.Event()
+    fetchBatch = timer._fetchBatch
+
+    async def slowFetchBatch() -> list[dict]:
+        data = await fetchBatch()
+        fetched.set()
+        await release.wait()
+        return data
+
+    timer._fetchBatch = slowFetchBatch  # type: ignore
+    topUp = asyncio.create_task(timer._topUp())
+    await fetched.wait()
+    # Query already ran, so the top up can't see this timer
+    created = await timer.createTimer(clock.now + dt.timedelta(seconds=10), "test", created=clock.now, owner=0)
+    release.set()
+    await topUp
+    del timer._fetchBatch
+
+    assert timer._exhausted
+    clock.advance(10)
+    await dispatchUntilIdle(timer)
+    assert [i.id for i in completed] == [created.id]
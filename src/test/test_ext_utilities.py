@@ -0,0 +1,47 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from decimal import Decimal, Overflow
+
+import pytest
+
+from zibot.utils.sandbox import EvaluationLimitExceeded, MathSandbox
+
+
+@pytest.mark.asyncio
+async def testMathSandbox():
+    """Test expressions that take too long are stopped"""
+    sandbox = MathSandbox(1, cpuTime=0.1)
+    try:
+        await sandbox.start()
+        assert await sandbox.evaluate("1 + 2 * 3") == Decimal(7)
+        with pytest.raises(Overflow):
+            await sandbox.evaluate("9^9^9")
+        # Each one takes a while inside libmpdec
+        with pytest.raises(EvaluationLimitExceeded):
+            await sandbox.evaluate(" + ".join(["fact(1000)^0.5"] * 10))
+        assert await sandbox.evaluate("2^10") == Decimal(1024)
+    finally:
+        sandbox.close()
+
+
+@pytest.mark.asyncio
+async def testMathSandboxConcurrent():
+    """Test expressions evaluated alongside one that gets its worker killed aren't affected"""
+    sandbox = MathSandbox(2, cpuTime=0.1)
+    heavy = " + ".join(["fact(1000)^0.5"] * 10)
+    try:
+        await sandbox.start()
+        results = await asyncio.gather(
+            sandbox.evaluate(heavy), *[sandbox.evaluate("1 + 1") for _ in range(4)], return_exceptions=True
+        )
+        assert isinstance(results[0], EvaluationLimitExceeded)
+        assert results[1:] == [Decimal(2)] * 4
+    finally:
+        sandbox.close()
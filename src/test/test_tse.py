@@ -0,0 +1,241 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from src import tse
+from src.tse.interpreter import Context, Response
+
+
+BLOCKS = [
+    tse.AssignmentBlock(),
+    tse.StrictVariableGetterBlock(),
+    tse.MathBlock(),
+    tse.AnyBlock(),
+    tse.IfBlock(),
+    tse.AllBlock(),
+    tse.StopBlock(),
+    tse.ReplaceBlock(),
+    tse.PythonBlock(),
+]
+SCRIPTS = [
+    "Hello {user}!",
+    "{=(x):2}{=(y):{x}}{math:{x}+{y}*3} {y}",
+    "{if({x}==2):two|not two} {=(x):2}{if({x}==2):two|not two}",
+    "{any({a}==1|{b}==2):yes|no}{=(b):2}{all({b}==2|{b}>1):yes|no}",
+    "{replace(o,0):{=(word):foo}{word} bot}",
+    "{in(zi):ziBot}{contains(bot):ziBot} } { {unclosed",
+    "before {stop({=(s):1}{s}==1):stopped} after",
+    "{=(n):{math:1+1}}{=(n):{math:{n}*{n}}}{n}",
+]
+# Output of the old quadratic solver
+EXPECTED = [
+    "Hello Z3R0!",
+    "8.0 2",
+    "not two two",
+    "noyes",
+    "f00 b0t",
+    "truefalse } { {unclosed",
+    "before stopped",
+    "4.0",
+]
+
+
+def testSolve():
+    """Test nested, stray and stopping blocks are substituted in place"""
+    engine = tse.Interpreter(BLOCKS)
+    for script, expected in zip(SCRIPTS, EXPECTED):
+        assert engine.process(script, {"user": tse.StringAdapter("Z3R0")}).body == expected, script
+
+
+def testTemplateProcess():
+    """Test compiled templates give the same response as processing the string"""
+    engine = tse.Interpreter(BLOCKS)
+    for script in SCRIPTS:
+        seed = {"user": tse.StringAdapter("Z3R0")}
+        expected = engine.process(script, dict(seed))
+        template = engine.compile(script)
+        assert engine.compile(script) is template
+        for _ in range(2):
+            response = engine.process(template, dict(seed))
+            assert (response.body, response.actions) == (expected.body, expected.actions), script
+
+
+def testBlockDispatch():
+    """Test blocks looked up by declaration are the same blocks that will accept it"""
+    blocks = [
+        *BLOCKS,
+        tse.LooseVariableGetterBlock(),
+        tse.EmbedBlock(),
+        tse.ReactBlock(),
+        tse.StrfBlock(),
+        tse.ShortCutRedirectBlock("args"),
+        tse.RandomBlock(),
+    ]
+    engine = tse.Interpreter(blocks)
+    response = Response()
+    response.variables["x"] = tse.StringAdapter("1")
+    for declaration in ("=", "Math", "IF", "if", "x", "X", "react", "embed", "Embed", "strf", "STRF", "12", "nope", ""):
+        ctx = Context(tse.Verb("{%s(param):payload}" % declaration), response, engine, "")
+        assert engine._acceptors(ctx) == [b for b in blocks if b.will_accept(ctx)], declaration
+
+
+def testLazyAdapter():
+    """Test adapter attributes are only resolved when they're used"""
+    members = [SimpleNamespace(id=i, bot=i % 2 == 0) for i in range(5)]
+    guild = SimpleNamespace(id=1, name="guild", created_at=dt.datetime(2020, 1, 1), members=members)
+    adapter = tse.GuildAdapter(guild)
+    engine = tse.Interpreter([tse.StrictVariableGetterBlock()])
+    response = engine.process("{guild(id)} {guild(bots)} {guild(humans)} {guild(nope)}", {"guild": adapter})
+    assert response.body == "1 3 2 {guild(nope)}"
+    assert sorted(adapter._attributes) == ["bots", "humans", "id"]
+
+
+def testBudget():
+    """Test scripts going over their budget are stopped"""
+    engine = tse.Interpreter(BLOCKS, node_limit=3)
+    assert engine.process("{=(a):1}{=(b):2}{a}{b}", node_limit=4).body == "12"
+    with pytest.raises(tse.WorkloadExceededError):
+        engine.process("{=(a):1}{=(b):2}{a}{b}")
+    with pytest.raises(tse.WorkloadExceededError):
+        engine.process("{=(a):" + "x" * 100 + "}{a}{a}", charlimit=150)
+    with pytest.raises(tse.WorkloadExceededError):
+        engine.process("{a}", time_limit=0)
+
+
+def testMathParser():
+    """Test math expressions are evaluated and compiled expressions are reused"""
+    parser = tse.MathParser()
+    assert parser.eval("1 + 2 * 3 - 4 / 2") == 5
+    assert parser.eval("-2^2") == 4
+    assert parser.eval("2^3^2") == parser.eval("2**3**2") == 512
+    assert parser.eval("(1 + 2) * -3") == -9
+    assert parser.eval("hypot(3, 4) + fact(3) + sgn(-2)") == 10
+    assert parser.eval("2 * pi") == parser.eval("TAU")
+    assert parser.compile("1 + 1") is parser.compile("1 + 1")
+    for expression in ("x + 1", "foo(1)", "1 +", "(1", "1)", "1 2", "fact(1001)"):
+        with pytest.raises(ValueError):
+            parser.eval(expression)
+    assert tse.MathParser(strict=False).eval("x + 1") == 1
+    assert tse.MathParser(strict_functions=False).eval("foo(1) + 1") == 1
+    with pytest.raises(OverflowError):
+        parser.eval("round(9)^round(9)^round(9)")
+
+
+def testMathBlock():
+    """Test math block keeps the old parser's fallbacks and doesn't evaluate huge powers"""
+    engine = tse.Interpreter([tse.MathBlock()])
+    # Unknown function is an int 0, like the old parser's
+    assert engine.process("{math:foo(10)}").body == "0"
+    assert engine.process("{math:foo(2)+1}").body == "1.0"
+    assert engine.process("{math:x+1}").body == "{math:x+1}"
+    assert engine.process("{math:fact(1000)^fact(1000)}").body == "{math:fact(1000)^fact(1000)}"
+
+
+def randomScript(rng: random.Random, depth: int = 0) -> str:
+    """Random mix of text, pure and impure blocks, and stray brackets"""
+    parts = []
+    for _ in range(rng.randrange(1, 5)):
+        inner = randomScript(rng, depth + 1) if depth < 3 and rng.random() < 0.4 else rng.choice("ab12 ")
+        parts.append(
+            rng.choice(
+                (
+                    "text ",
+                    "{",
+                    "}",
+                    f"{{=({rng.choice(['a', 'math', 'if'])}):{inner}}}",
+                    f"{{{rng.choice('ab')}}}",
+                    f"{{math:{inner}+{rng.randrange(9)}}}",
+                    f"{{if({inner}=={rng.choice('ab12')}):yes|{inner}}}",
+                    f"{{replace(a,{inner}):{inner}}}",
+                    f"{{substr({rng.randrange(3)}):{inner}}}",
+                    f"{{urlencode:{inner}}}",
+                    f"{{strf({rng.choice(['', '0', inner])}):%Y {inner}}}",
+                    f"{{stop({inner}==x):stopped}}",
+                    f"{{in({inner}):{inner}}}",
+                )
+            )
+        )
+    return "".join(parts)
+
+
+def testConstantFolding():
+    """Test folding pure blocks doesn't change the output"""
+    blocks = [*BLOCKS, tse.SubstringBlock(), tse.URLEncodeBlock(), tse.StrfBlock()]
+    folding, plain = tse.Interpreter(blocks), tse.Interpreter(blocks, fold_constants=False)
+
+    template = folding.compile("{=(a):1}{math:{math:60*60}*24} {a}")
+    assert [fold is not None for *_, fold in template.nodes] == [False, True, False, False]
+    # A variable getter would've taken the block instead
+    assert folding.process("{=(math):nope}{math:1+1}").body == "nope"
+
+    # Folded blocks still count towards the budget
+    with pytest.raises(tse.WorkloadExceededError):
+        folding.process(folding.compile("{math:{math:1}+{math:2}}{math:3}"), node_limit=3)
+    with pytest.raises(tse.WorkloadExceededError):
+        folding.process(folding.compile("{replace(b,cc):{replace(a,bb):aaaa}}"), charlimit=20)
+    # Folding itself stops at the interpreter's budget, `process` enforces it
+    limited = tse.Interpreter(blocks, charlimit=100)
+    script = "{replace(a,aaaaaaaaaa):" * 4 + "a" + "}" * 4
+    template = limited.compile(script)
+    assert not any(fold and len(fold[1]) > 100 for *_, fold in template.nodes)
+    with pytest.raises(tse.WorkloadExceededError):
+        limited.process(template)
+
+    rng = random.Random(2264)
+    for _ in range(2000):
+        script = randomScript(rng)
+        seed = {"b": tse.StringAdapter("2")}
+        expected = plain.process(plain.compile(script), dict(seed))
+        response = folding.process(folding.compile(script), dict(seed))
+        assert (response.body, response.actions) == (expected.body, expected.actions), script
+
+
+def testRenderMany():
+    """Test rendering a batch gives the same responses as processing each seed"""
+    engine = tse.Interpreter(BLOCKS)
+    seeds = [{"user": tse.StringAdapter(name), "x": tse.StringAdapter(str(i))} for i, name in enumerate(("a", "b", "c"))]
+    for script in SCRIPTS:
+        responses = engine.render_many(script, [dict(seed) for seed in seeds])
+        for seed, response in zip(seeds, responses):
+            expected = engine.process(script, dict(seed))
+            assert (response.body, response.actions) == (expected.body, expected.actions), script
+    assert engine.render_many("{user}", []) == []
+
+    class BrokenAdapter(tse.Adapter):
+        def get_value(self, ctx):
+            raise RuntimeError("broken")
+
+    seeds = [{"user": tse.StringAdapter("a")}, {"user": BrokenAdapter()}, {"user": tse.StringAdapter("c")}]
+    with pytest.raises(tse.ProcessError):
+        engine.render_many("{user}", [dict(seed) for seed in seeds])
+    responses = engine.render_many("{user}", seeds, return_exceptions=True)
+    assert isinstance(responses[1], tse.ProcessError)
+    assert [responses[0].body, responses[2].body] == ["a", "c"]  # type: ignore
+
+
+def testTemplateAnalysis():
+    """Test templates know the variables they read and whether they're deterministic"""
+    engine = tse.Interpreter([tse.LooseVariableGetterBlock(), tse.RandomBlock(), tse.StrfBlock(), *BLOCKS])
+    template = engine.compile("Hi {user}! {if({args(1)}==a):{math:1+1}|b}")
+    assert template.deterministic and {"user", "args", "if", "math"} <= template.variables
+    assert engine.compile("{strf(0):%Y}").deterministic
+    for script in ("{random:a,b}", "{strf:%Y}", "{if({user}==a):{strf:%Y}|b}"):
+        assert not engine.compile(script).deterministic, script
+    assert engine.compile("{{user}}").variables is None
+    reads = engine.compile("{user(name)} {user(name)} {user(id)} {args({user})}").reads
+    assert [(name, str(verb) if verb else None) for name, verb in reads] == [  # type: ignore
+        ("user", "{user(name)}"),
+        ("user", "{user(id)}"),
+        ("user", "{user}"),
+        ("args", None),
+    ]
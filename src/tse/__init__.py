@@ -4,6 +4,7 @@ from .exceptions import *
 from .interface import Adapter as Adapter
 from .interface import Block as Block
 from .interpreter import *
+from .mathparser import *
 from .utils import *
 from .verb import Verb as Verb
 
@@ -25,6 +25,9 @@ class ArgumentAdapter(Adapter):
     def __repr__(self):
         return f"<{type(self).__qualname__} arguments={repr(self.arguments)}>"
 
+    def cache_key(self, verb: Verb = None):
+        return self.arguments
+
     def get_value(self, ctx: Verb) -> str:
         if not ctx.parameter:
             return self.arguments
@@ -1,7 +1,8 @@
+from copy import copy
 from random import choice
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
 
-from discord import Guild, Member, TextChannel
+from discord import Guild, TextChannel
 
 from ..interface import Adapter
 from ..utils import escape_content
@@ -16,17 +17,41 @@ __all__ = (
 )
 
 
+AdapterT = TypeVar("AdapterT", bound="AttributeAdapter")
+
+
+def _created_at(adapter: "AttributeAdapter") -> Any:
+    return getattr(adapter.object, "created_at", None) or "N/A"
+
+
+def _timestamp(adapter: "AttributeAdapter") -> int:
+    created_at = getattr(adapter.object, "created_at", None)
+    return int(created_at.timestamp() if created_at else 0)
+
+
 class AttributeAdapter(Adapter):
+    """
+    Base adapter for Discord objects.
+
+    Attributes are resolved from `_getters` the first time they're used and
+    memoized in `_attributes`, so unused attributes cost nothing. Subclasses
+    can still put precomputed values in `_attributes` in `update_attributes`.
+    Copies made by `with_attributes` share that memo.
+    """
+
+    _getters: Dict[str, Callable[["AttributeAdapter"], Any]] = {
+        "id": lambda adapter: adapter.object.id,
+        "created_at": _created_at,
+        "timestamp": _timestamp,
+        "name": lambda adapter: getattr(adapter.object, "name", str(adapter.object)),
+    }
+
     def __init__(self, base):
         self.object = base
-        created_at = getattr(base, "created_at", None)
-        self._attributes = {
-            "id": base.id,
-            "created_at": created_at or "N/A",
-            "timestamp": int(created_at.timestamp() if created_at else 0),
-            "name": getattr(base, "name", str(base)),
-        }
-        self._methods = {}
+        self._attributes: Dict[str, Any] = {}
+        # Attributes that differ from the adapter this one was copied from
+        self._overrides: Dict[str, Any] = {}
+        self._methods: Dict[str, Callable[[], Any]] = {}
         self.update_attributes()
         self.update_methods()
 
@@ -39,6 +64,45 @@ class AttributeAdapter(Adapter):
     def update_methods(self):
         pass
 
+    def cache_key(self, verb: Optional[Verb] = None):
+        # Keyed by the value itself, attributes (names, member counts) change
+        if verb is None or verb.parameter in self._methods:
+            # Any attribute could be read, or it's a random member
+            return None
+        try:
+            return (self.get_value(verb),)
+        except Exception:
+            # Let processing deal with it
+            return None
+
+    def with_attributes(self: AdapterT, **attributes: Any) -> AdapterT:
+        """Copy of this adapter with some attributes overridden
+
+        Other attributes are still resolved once for this adapter and all of
+        its copies, e.g. a guild's member count at the time each member joined.
+        """
+        adapter = copy(self)
+        adapter._overrides = {**self._overrides, **attributes}
+        return adapter
+
+    def get_attribute(self, name: str) -> Any:
+        """Get attribute's value, resolving it if it hasn't been used yet
+
+        Raises KeyError if the object doesn't have the attribute.
+        """
+        try:
+            return self._overrides[name]
+        except KeyError:
+            pass
+
+        try:
+            return self._attributes[name]
+        except KeyError:
+            pass
+
+        value = self._attributes[name] = self._getters[name](self)
+        return value
+
     def get_value(self, ctx: Verb) -> Optional[str]:
         should_escape = False
 
@@ -46,7 +110,7 @@ class AttributeAdapter(Adapter):
             return_value = str(self.object)
         else:
             try:
-                value = self._attributes[ctx.parameter]
+                value = self.get_attribute(ctx.parameter)
             except KeyError:
                 if method := self._methods.get(ctx.parameter):
                     value = method()
@@ -101,20 +165,18 @@ class MemberAdapter(AttributeAdapter):
         The author's top role's color as a hex code.
     """
 
-    def update_attributes(self):
-        member: Member = self.object
-        additional_attributes = {
-            "color": member.colour,
-            "colour": member.colour,
-            "display_name": member.global_name,
-            "nick": member.display_name,
-            "avatar": (member.display_avatar.url, False),
-            "discriminator": member.discriminator,
-            "joined_at": getattr(member, "joined_at", member.created_at),
-            "mention": member.mention,
-            "bot": member.bot,
-        }
-        self._attributes.update(additional_attributes)
+    _getters = {
+        **AttributeAdapter._getters,
+        "color": lambda adapter: adapter.object.colour,
+        "colour": lambda adapter: adapter.object.colour,
+        "display_name": lambda adapter: adapter.object.global_name,
+        "nick": lambda adapter: adapter.object.display_name,
+        "avatar": lambda adapter: (adapter.object.display_avatar.url, False),
+        "discriminator": lambda adapter: adapter.object.discriminator,
+        "joined_at": lambda adapter: getattr(adapter.object, "joined_at", adapter.object.created_at),
+        "mention": lambda adapter: adapter.object.mention,
+        "bot": lambda adapter: adapter.object.bot,
+    }
 
 
 class ChannelAdapter(AttributeAdapter):
@@ -147,14 +209,19 @@ class ChannelAdapter(AttributeAdapter):
         The channel's topic.
     """
 
-    def update_attributes(self):
-        if isinstance(self.object, TextChannel):
-            additional_attributes = {
-                "nsfw": self.object.nsfw,
-                "mention": self.object.mention,
-                "topic": self.object.topic or None,
-            }
-            self._attributes.update(additional_attributes)
+    _getters = {
+        **AttributeAdapter._getters,
+        "nsfw": lambda adapter: adapter.text_channel.nsfw,
+        "mention": lambda adapter: adapter.text_channel.mention,
+        "topic": lambda adapter: adapter.text_channel.topic or None,
+    }
+
+    @property
+    def text_channel(self) -> TextChannel:
+        """The channel, raises KeyError if it's not a text channel"""
+        if not isinstance(self.object, TextChannel):
+            raise KeyError(self.object)
+        return self.object
 
 
 class GuildAdapter(AttributeAdapter):
@@ -205,27 +272,30 @@ class GuildAdapter(AttributeAdapter):
         A random offline member from the server.
     """
 
-    def update_attributes(self):
-        guild: Guild = self.object
-        bots = 0
-        humans = 0
-        for m in guild.members:
-            if m.bot:
-                bots += 1
-            else:
-                humans += 1
-        additional_attributes = {
-            "icon": (getattr(guild.icon, "url", "https://cdn.discordapp.com/embed/avatars/1.png"), False),
-            "member_count": guild.member_count,
-            "members": guild.member_count,
-            "bots": bots,
-            "humans": humans,
-            "description": guild.description or "No description.",
-            "channels": len(guild.channels),
-            "roles": len(guild.roles),
-            "owner": guild.owner,
-        }
-        self._attributes.update(additional_attributes)
+    _getters = {
+        **AttributeAdapter._getters,
+        "icon": lambda adapter: (
+            getattr(adapter.object.icon, "url", "https://cdn.discordapp.com/embed/avatars/1.png"),
+            False,
+        ),
+        "member_count": lambda adapter: adapter.object.member_count,
+        "members": lambda adapter: adapter.object.member_count,
+        "bots": lambda adapter: adapter.count_members()[0],
+        "humans": lambda adapter: adapter.count_members()[1],
+        "description": lambda adapter: adapter.object.description or "No description.",
+        "channels": lambda adapter: len(adapter.object.channels),
+        "roles": lambda adapter: len(adapter.object.roles),
+        "owner": lambda adapter: adapter.object.owner,
+    }
+
+    def count_members(self) -> Tuple[int, int]:
+        """Number of (bots, humans) in the server, walks every member once"""
+        if "bots" not in self._attributes or "humans" not in self._attributes:
+            guild: Guild = self.object
+            bots = sum(1 for m in guild.members if m.bot)
+            self._attributes["bots"] = bots
+            self._attributes["humans"] = len(guild.members) - bots
+        return self._attributes["bots"], self._attributes["humans"]
 
     def update_methods(self):
         additional_methods = {
@@ -9,5 +9,8 @@ class IntAdapter(Adapter):
     def __repr__(self):
         return f"<{type(self).__qualname__} integer={repr(self.integer)}>"
 
+    def cache_key(self, verb: Verb = None):
+        return self.integer
+
     def get_value(self, ctx: Verb) -> str:
         return str(self.integer)
@@ -11,6 +11,9 @@ class StringAdapter(Adapter):
     def __repr__(self):
         return f"<{type(self).__qualname__} string={repr(self.string)}>"
 
+    def cache_key(self, verb: Verb = None):
+        return self.string, self.escape_content
+
     def get_value(self, ctx: Verb) -> str:
         return self.return_value(self.handle_ctx(ctx))
 
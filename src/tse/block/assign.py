@@ -29,9 +29,7 @@ class AssignmentBlock(Block):
         # The day is Monday.
     """
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration.lower()
-        return dec in ("=", "assign", "let", "var")
+    ACCEPTED_NAMES = ("=", "assign", "let", "var")
 
     def process(self, ctx: Context) -> Optional[str]:
         if ctx.verb.parameter is None:
@@ -100,11 +100,7 @@ class EmbedBlock(Block):
         "image": setattr,
     }
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration
-        if dec:
-            return dec.lower() == "embed"
-        return False
+    ACCEPTED_NAMES = ("embed",)
 
     @staticmethod
     def get_embed(ctx: Context) -> Embed:
@@ -23,9 +23,8 @@ class FiftyFiftyBlock(Block):
         # I pick heads
     """
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration.lower()
-        return dec in ("5050", "50", "?")
+    ACCEPTED_NAMES = ("5050", "50", "?")
+    DETERMINISTIC = False
 
     def process(self, ctx: Context) -> Optional[str]:
         if ctx.verb.payload is None:
@@ -25,6 +25,8 @@ class LooseVariableGetterBlock(Block):
         # This is my variable.
     """
 
+    VARIABLE_GETTER = True
+
     def will_accept(self, ctx: Context) -> bool:
         return True
 
@@ -33,9 +33,8 @@ class RandomBlock(Block):
         # Assigns a random insult to the insult variable
     """
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration.lower()
-        return dec in ("random", "#", "rand")
+    ACCEPTED_NAMES = ("random", "#", "rand")
+    DETERMINISTIC = False
 
     def process(self, ctx: Context) -> Optional[str]:
         if ctx.verb.payload is None:
@@ -23,9 +23,7 @@ class RedirectBlock(Block):
         {redirect(626861902521434160)}
     """
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration.lower()
-        return dec == "redirect"
+    ACCEPTED_NAMES = ("redirect",)
 
     def process(self, ctx: Context) -> Optional[str]:
         if not ctx.verb.parameter:
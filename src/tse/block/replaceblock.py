@@ -29,9 +29,8 @@ class ReplaceBlock(Block):
         # T e s t
     """
 
-    def will_accept(self, ctx: Context):
-        dec = ctx.verb.declaration.lower()
-        return dec == "replace"
+    ACCEPTED_NAMES = ("replace",)
+    PURE = True
 
     def process(self, ctx: Context):
         if not (ctx.verb.parameter and ctx.verb.payload):
@@ -85,9 +84,8 @@ class PythonBlock(Block):
         # -1
     """
 
-    def will_accept(self, ctx: Context):
-        dec = ctx.verb.declaration.lower()
-        return dec in ("contains", "in", "index")
+    ACCEPTED_NAMES = ("contains", "in", "index")
+    PURE = True
 
     def process(self, ctx: Context):
         dec = ctx.verb.declaration.lower()
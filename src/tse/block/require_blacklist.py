@@ -27,9 +27,7 @@ class RequireBlock(Block):
         {require(757425366209134764, 668713062186090506, 737961895356792882):You aren't allowed to use this tag.}
     """
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration.lower()
-        return any([dec == "require", dec == "whitelist"])
+    ACCEPTED_NAMES = ("require", "whitelist")
 
     def process(self, ctx: Context) -> Optional[str]:
         if not ctx.verb.parameter:
@@ -65,9 +63,7 @@ class BlacklistBlock(Block):
         {blacklist(Tag Blacklist, 668713062186090506):You are blacklisted from using tags.}
     """
 
-    def will_accept(self, ctx: Context) -> bool:
-        dec = ctx.verb.declaration.lower()
-        return dec == "blacklist"
+    ACCEPTED_NAMES = ("blacklist",)
 
     def process(self, ctx: Context) -> Optional[str]:
         if not ctx.verb.parameter:
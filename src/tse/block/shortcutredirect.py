@@ -6,6 +6,9 @@ from ..verb import Verb
 
 
 class ShortCutRedirectBlock(Block):
+    # Redirects to a variable that isn't named by the declaration
+    DETERMINISTIC = False
+
     def __init__(self, var_name):
         self.redirect_name = var_name
 
@@ -9,6 +9,13 @@ class StrfBlock(Block):
     def will_accept(self, ctx: Context) -> bool:
         return ctx.verb.declaration == "strf"
 
+    def is_pure(self, ctx: Context) -> bool:
+        # Without a timestamp it formats the current time
+        return bool(ctx.verb.parameter)
+
+    def is_deterministic(self, ctx: Context) -> bool:
+        return self.is_pure(ctx)
+
     def process(self, ctx: Context) -> Optional[str]:
         if not ctx.verb.payload:
             return
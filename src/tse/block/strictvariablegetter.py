@@ -26,6 +26,8 @@ class StrictVariableGetterBlock(Block):
         # This is my variable.
     """
 
+    VARIABLE_GETTER = True
+
     def will_accept(self, ctx: Context) -> bool:
         return ctx.verb.declaration in ctx.response.variables
 
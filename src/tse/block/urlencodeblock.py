@@ -30,9 +30,8 @@ class URLEncodeBlock(Block):
         # <https://phen-cogs.readthedocs.io/en/latest/search.html?q=command+block&check_keywords=yes&area=default>
     """
 
-    def will_accept(self, ctx: Context):
-        dec = ctx.verb.declaration.lower()
-        return dec == "urlencode"
+    ACCEPTED_NAMES = ("urlencode",)
+    PURE = True
 
     def process(self, ctx: Context):
         if not ctx.verb.payload:
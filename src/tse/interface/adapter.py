@@ -1,4 +1,6 @@
-from typing import Optional
+from typing import Hashable, Optional
+
+from ..verb import Verb
 
 
 class Adapter:
@@ -10,3 +12,22 @@ class Adapter:
 
     def get_value(self, ctx: "interpreter.Context") -> Optional[str]:
         return ""
+
+    def cache_key(self, verb: Optional[Verb] = None) -> Optional[Hashable]:
+        """
+        Identifies what this adapter outputs for `verb`, so responses that
+        use it can be memoized. Adapters with the same key must give the
+        same value.
+
+        Parameters
+        ----------
+        verb: Optional[Verb]
+            The block reading this adapter, ``None`` if it's only known
+            while processing.
+
+        Returns
+        -------
+        Optional[Hashable]
+            The key, or ``None`` if this adapter can't be memoized.
+        """
+        return None
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class Block:
@@ -6,8 +6,34 @@ class Block:
     The base class for TagScript blocks.
 
     Implementations must subclass this to create new blocks.
+
+    Attributes
+    ----------
+    ACCEPTED_NAMES: Optional[Tuple[str, ...]]
+        Lowercased declarations this block accepts. Blocks that set this
+        don't need to implement :meth:`will_accept`, the interpreter will
+        look them up by declaration instead of asking every block.
+    PURE: bool
+        Whether :meth:`will_accept` and :meth:`process` only depend on the
+        verb, without reading or changing the response, time or randomness.
+        Pure blocks with literal input are folded into their output when
+        a template is compiled.
+    VARIABLE_GETTER: bool
+        Whether this block does nothing unless the verb's declaration is a
+        variable in `Response.variables`. Folding is then still possible,
+        as long as the declaration isn't a variable at runtime.
+    DETERMINISTIC: bool
+        Whether this block gives the same output for the same verb and
+        variables. Blocks that use randomness, the current time or anything
+        outside the response must set this to ``False``, responses of
+        scripts that use them can't be memoized.
     """
 
+    ACCEPTED_NAMES: Optional[Tuple[str, ...]] = None
+    PURE: bool = False
+    VARIABLE_GETTER: bool = False
+    DETERMINISTIC: bool = True
+
     def __init__(self):
         pass
 
@@ -18,7 +44,7 @@ class Block:
         """
         Describes whether the block is valid for the given `Context`.
 
-        Subclasses must implement this.
+        Subclasses must implement this, unless they set `ACCEPTED_NAMES`.
 
         Parameters
         ----------
@@ -35,7 +61,22 @@ class Block:
         NotImplementedError
             The subclass did not implement this required method.
         """
-        raise NotImplementedError
+        if self.ACCEPTED_NAMES is None:
+            raise NotImplementedError
+        dec = ctx.verb.declaration
+        return dec is not None and dec.lower() in self.ACCEPTED_NAMES
+
+    def is_static(self) -> bool:
+        """Whether this block accepts only `ACCEPTED_NAMES`, no matter the `Context`"""
+        return self.ACCEPTED_NAMES is not None and type(self).will_accept is Block.will_accept
+
+    def is_pure(self, ctx: "interpreter.Context") -> bool:
+        """Whether this block is pure for the given `Context`, see `PURE`"""
+        return self.PURE
+
+    def is_deterministic(self, ctx: "interpreter.Context") -> bool:
+        """Whether this block is deterministic for the given `Context`, see `DETERMINISTIC`"""
+        return self.DETERMINISTIC
 
     def pre_process(self, ctx: "interpreter.Context"):
         return None
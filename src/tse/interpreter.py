@@ -1,5 +1,7 @@
-from itertools import islice
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
 
 from .exceptions import ProcessError, TagScriptError, WorkloadExceededError
 from .interface import Adapter, Block
@@ -7,19 +9,27 @@ from .verb import Verb
 
 
 __all__ = (
+    "Fold",
     "Node",
     "build_node_tree",
+    "Template",
     "Response",
     "Context",
     "Interpreter",
 )
 
 
+# (index of the folded node, its output, declarations that must not be variables,
+# characters output by its nested nodes)
+Fold = Tuple[int, str, FrozenSet[str], int]
+
+
 class Node:
-    def __init__(self, coordinates: Tuple[int, int], ver: Verb = None):
+    def __init__(self, coordinates: Tuple[int, int], ver: Verb = None, fold: Optional[Fold] = None):
         self.output: Optional[str] = None
         self.verb: Verb = ver
         self.coordinates: Tuple[int, int] = coordinates
+        self.fold: Optional[Fold] = fold
 
     def __str__(self):
         return str(self.verb) + " at " + str(self.coordinates)
@@ -50,6 +60,64 @@ def build_node_tree(message: str) -> List[Node]:
     return nodes
 
 
+class Template:
+    """
+    A compiled TagScript string, can be processed any number of times
+    without being parsed again.
+
+    Attributes
+    ----------
+    message: str
+        The TagScript string this template was compiled from.
+    nodes: Tuple[Tuple[int, int, Optional[Verb], Optional[Fold]], ...]
+        Coordinates of every block in processing order, along with its
+        pre-parsed verb. Blocks that contain other blocks depend on their
+        output, so their verb is ``None`` and is parsed while processing.
+        Blocks folded into a constant by :meth:`Interpreter.compile` are
+        skipped along with their nested blocks, the fold is set on the
+        first one of them.
+    variables: Optional[FrozenSet[str]]
+        Variables the script might read, ``None`` if it can't be known, e.g.
+        a block's declaration comes from another block.
+    reads: Optional[Tuple[Tuple[str, Optional[Verb]], ...]]
+        Every (variable, verb) the script might read them with, the verb is
+        ``None`` if it's only known while processing. ``None`` along with
+        `variables`.
+    deterministic: bool
+        Whether the script gives the same response for the same values of
+        `variables`, so responses can be memoized.
+
+    `variables`, `reads` and `deterministic` depend on the blocks, they're
+    set by :meth:`Interpreter.compile`.
+    """
+
+    __slots__ = ("message", "nodes", "variables", "reads", "deterministic")
+
+    def __init__(self, message: str, *, verb_limit: int = 2000):
+        self.message: str = message
+
+        nodes = []
+        last_end = -1
+        for node in build_node_tree(message):
+            start, end = node.coordinates
+            # Nodes are ordered by their closing bracket, a nested node
+            # would've been closed right before this one
+            verb = Verb(message[start : end + 1], limit=verb_limit) if last_end < start else None
+            nodes.append((start, end, verb, None))
+            last_end = end
+        self.nodes: Tuple[Tuple[int, int, Optional[Verb], Optional[Fold]], ...] = tuple(nodes)
+        self.variables: Optional[FrozenSet[str]] = None
+        self.reads: Optional[Tuple[Tuple[str, Optional[Verb]], ...]] = None
+        self.deterministic: bool = False
+
+    def __repr__(self):
+        return "<Template nodes={0} message={1.message!r}>".format(len(self.nodes), self)
+
+    def build_nodes(self) -> List[Node]:
+        """Fresh nodes to be solved, nodes are mutated while processing"""
+        return [Node((start, end), verb, fold) for start, end, verb, fold in self.nodes]
+
+
 class Response:
     """
     Response is another packaged class that contains data
@@ -109,38 +177,306 @@ class Interpreter:
     Attributes
     ----------
     blocks: List[Block]
-        A list of blocks to be used for TagScript processing.
+        A list of blocks to be used for TagScript processing. Blocks are
+        indexed by their declaration when the interpreter is created, so
+        this shouldn't be modified afterwards.
+    cache_size: int
+        How many compiled templates to keep, least recently used ones are
+        dropped first.
+    charlimit: Optional[int]
+        Default maximum characters to process, see :meth:`process`.
+    node_limit: Optional[int]
+        Default maximum blocks to process, see :meth:`process`.
+    time_limit: Optional[float]
+        Default maximum seconds to spend processing, see :meth:`process`.
+    fold_constants: bool
+        Whether :meth:`compile` folds pure blocks with literal input into
+        their output, see :attr:`Block.PURE`.
     """
 
-    def __init__(self, blocks: List[Block]):
+    def __init__(
+        self,
+        blocks: List[Block],
+        *,
+        cache_size: int = 512,
+        charlimit: Optional[int] = None,
+        node_limit: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        fold_constants: bool = True,
+    ):
         self.blocks: List[Block] = blocks
+        self.cache_size: int = cache_size
+        self.charlimit: Optional[int] = charlimit
+        self.node_limit: Optional[int] = node_limit
+        self.time_limit: Optional[float] = time_limit
+        self.fold_constants: bool = fold_constants
+
+        # Lowercased declaration -> candidate blocks in registration order, as
+        # (block, accepted). Blocks that have to be asked via `will_accept`
+        # are candidates for every declaration.
+        names = [(b, {name.lower() for name in b.ACCEPTED_NAMES} if b.is_static() else None) for b in blocks]
+        self._dynamic_blocks: List[Tuple[Block, bool]] = [(b, False) for b, accepts in names if accepts is None]
+        self._blocks_by_name: Dict[str, List[Tuple[Block, bool]]] = {
+            name: [(b, accepts is not None) for b, accepts in names if accepts is None or name in accepts]
+            for name in set().union(*(accepts for _, accepts in names if accepts is not None))
+        }
+        self._templates: "OrderedDict[str, Template]" = OrderedDict()
 
     def __repr__(self):
         return "<Interpreter blocks={0.blocks!r}>".format(self)
 
+    def compile(self, message: str) -> Template:
+        """Compiles a TagScript string, compiled templates are cached by their content.
+
+        Parameters
+        ----------
+        message: str
+            A TagScript string to be compiled.
+
+        Returns
+        -------
+        Template
+            A template that can be passed to :meth:`process` instead of the string.
+        """
+        try:
+            template = self._templates[message]
+        except KeyError:
+            pass
+        else:
+            # Might've been dropped by a compile running in another thread
+            with suppress(KeyError):
+                self._templates.move_to_end(message)
+            return template
+
+        template = Template(message)
+        template.reads, template.deterministic = self._analyze(template)
+        if template.reads is not None:
+            template.variables = frozenset(name for name, _ in template.reads)
+        if self.fold_constants:
+            template.nodes = self._fold(template)
+        if self.cache_size > 0:
+            self._templates[message] = template
+            if len(self._templates) > self.cache_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def _candidates(self, ctx: Context) -> List[Tuple[Block, bool]]:
+        dec = ctx.verb.declaration
+        return self._dynamic_blocks if dec is None else self._blocks_by_name.get(dec.lower(), self._dynamic_blocks)
+
+    def _acceptors(self, ctx: Context) -> List[Block]:
+        return [b for b, accepted in self._candidates(ctx) if accepted or b.will_accept(ctx)]
+
+    def _analyze(self, template: Template) -> Tuple[Optional[Tuple[Tuple[str, Optional[Verb]], ...]], bool]:
+        """Variables the template might read and whether it's deterministic, see :class:`Template`"""
+        message = template.message
+        # (declaration, verb string) -> (declaration, verb)
+        reads: Dict[Tuple[str, Optional[str]], Tuple[str, Optional[Verb]]] = {}
+        deterministic = True
+        for start, end, verb, _ in template.nodes:
+            # Nested blocks are expanded in place, as long as they're not part
+            # of the declaration the same blocks will be candidates
+            nested = verb is None
+            if nested:
+                verb = Verb(message[start : end + 1])
+                if verb.declaration is not None and ("{" in verb.declaration or "}" in verb.declaration):
+                    return None, False
+
+            ctx = Context(verb, Response(), self, message)
+            for b, accepted in self._candidates(ctx):
+                if b.VARIABLE_GETTER:
+                    if verb.declaration is not None:
+                        read = (verb.declaration, None) if nested else (verb.declaration, verb)
+                        reads.setdefault((verb.declaration, None if nested else str(verb)), read)
+                    continue
+                if not deterministic:
+                    continue
+                try:
+                    if not (accepted or b.will_accept(ctx)):
+                        continue
+                    # Verb of a nested block isn't final yet
+                    deterministic = b.DETERMINISTIC and (
+                        b.is_deterministic(ctx) if not nested else type(b).is_deterministic is Block.is_deterministic
+                    )
+                except Exception:
+                    deterministic = False
+        return tuple(reads.values()), deterministic
+
+    def _fold_verb(self, verb: Verb, message: str) -> Tuple[bool, Optional[str], FrozenSet[str]]:
+        """Process verb at compile time
+
+        A verb is constant when every block that could process it is pure,
+        up to the first one that outputs something. Variable getters only
+        do something when the declaration is a variable, so they're allowed
+        as long as it isn't one at runtime.
+
+        Returns
+        -------
+        Tuple[bool, Optional[str], FrozenSet[str]]
+            Whether the verb is constant, its output and declarations that
+            must not be variables for it to stay constant.
+        """
+        ctx = Context(verb, Response(), self, message)
+        guards: FrozenSet[str] = frozenset()
+        for b, accepted in self._candidates(ctx):
+            if not b.is_pure(ctx):
+                # Impure blocks might accept or output something else at runtime
+                if not b.VARIABLE_GETTER:
+                    return False, None, guards
+                if verb.declaration is not None:
+                    guards = frozenset((verb.declaration,))
+                continue
+            if not (accepted or b.will_accept(ctx)):
+                continue
+            try:
+                value = b.process(ctx)
+            except Exception:
+                # Leave the error to `process`
+                return False, None, guards
+            if value is not None:
+                return True, value, guards
+        return True, None, guards
+
+    def _fold(self, template: Template) -> Tuple[Tuple[int, int, Optional[Verb], Optional[Fold]], ...]:
+        """Template's nodes with constant blocks folded into their output
+
+        Folding stops once it goes over the interpreter's budget, the rest
+        is left to `process`, which enforces it.
+        """
+        message = template.message
+        folds: Dict[int, Fold] = {}
+        # Same as `_solve`'s, plus where the node's first nested node is, how
+        # many characters were output inside it and, if it's constant, the
+        # declarations that must not be variables
+        resolved: List[Tuple[int, int, str, int, int, Optional[FrozenSet[str]]]] = []
+        deadline = time.monotonic() + self.time_limit if self.time_limit is not None else None
+        total_work = 0
+
+        for index, (start, end, verb, _) in enumerate(template.nodes):
+            if self.node_limit is not None and index >= self.node_limit:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                break
+
+            position = len(resolved)
+            while position and resolved[position - 1][0] > start:
+                position -= 1
+            children = resolved[position:]
+            del resolved[position:]
+            first = children[0][3] if children else index
+            work = sum(child[4] for child in children)
+
+            text = ""
+            output = None
+            guards: Optional[FrozenSet[str]] = None
+            if all(child[5] is not None for child in children):
+                text = self._splice(message, start, end + 1, [child[:3] for child in children])
+                constant, output, own_guards = self._fold_verb(verb or Verb(text), message)
+                if constant:
+                    guards = own_guards.union(*(child[5] for child in children))  # type: ignore
+
+            if guards is not None and output is not None:
+                total_work += len(output)
+                if self.charlimit is not None and total_work > self.charlimit:
+                    break
+                # Replaces folds of nested nodes that start at the same node
+                folds[first] = (index, output, guards, work)
+                resolved.append((start, end, output, first, work + len(output), guards))
+            else:
+                resolved.append((start, end, text, first, work, guards))
+
+        return tuple((start, end, verb, folds.get(index)) for index, (start, end, verb, _) in enumerate(template.nodes))
+
     def _get_acceptors(self, ctx: Context, node: Node):
-        acceptors: List[Block] = [b for b in self.blocks if b.will_accept(ctx)]
+        acceptors: List[Block] = self._acceptors(ctx)
         for b in acceptors:
             value = b.process(ctx)
             if value is not None:  # Value found? We're done here.
                 node.output = value
                 break
 
+    @staticmethod
+    def _splice(message: str, start: int, end: int, resolved: List[Tuple[int, int, str]]) -> str:
+        """`message[start:end]` with resolved nodes inside it substituted"""
+        parts = []
+        position = start
+        for node_start, node_end, text in resolved:
+            parts.append(message[position:node_start])
+            parts.append(text)
+            position = node_end + 1
+        parts.append(message[position:end])
+        return "".join(parts)
+
     def _solve(
-        self, message: str, node_ordered_list: List[Node], response: Response, charlimit: int, *, verb_limit: int = 2000
+        self,
+        message: str,
+        node_ordered_list: List[Node],
+        response: Response,
+        charlimit: int,
+        *,
+        verb_limit: int = 2000,
+        node_limit: Optional[int] = None,
+        deadline: Optional[float] = None,
     ):
-        final = message
         total_work = 0
+        count = 0
+        index = 0
+
+        # Resolved nodes that aren't inside another resolved node yet, as
+        # (start, end, text) in `message`'s coordinates. Nodes are ordered by
+        # their closing bracket, so children are always resolved right before
+        # their parent and sit at the end of this list.
+        resolved: List[Tuple[int, int, str]] = []
+
+        while index < len(node_ordered_list):
+            node = node_ordered_list[index]
+
+            # Skip to the folded node, its nested nodes are part of the output.
+            # Blocks in between are pure, so variables don't change on the way.
+            # They still count towards the budget, as if they were processed
+            if node.fold is not None and node.fold[2].isdisjoint(response.variables):
+                folded, output, _, work = node.fold
+                count += folded - index
+                total_work += work
+                node = node_ordered_list[folded]
+                node.output = output
+                index = folded
+
+            index += 1
+            count += 1
+            # Budget is checked between blocks, a single block can't be interrupted
+            if node_limit is not None and count > node_limit:
+                raise WorkloadExceededError(
+                    f"The TSE interpreter had its workload exceeded. The script has more than {node_limit} blocks"
+                )
+            if deadline is not None and time.monotonic() > deadline:
+                raise WorkloadExceededError("The TSE interpreter had its workload exceeded. The script took too long")
 
-        for i, node in enumerate(node_ordered_list):
-            # Get the updated verb string from coordinates and make the context
-            node.verb = Verb(final[node.coordinates[0] : node.coordinates[1] + 1], limit=verb_limit)
-            ctx = Context(node.verb, response, self, message)
+            start, end = node.coordinates
+
+            position = len(resolved)
+            while position and resolved[position - 1][0] > start:
+                position -= 1
+            children = resolved[position:]
+            del resolved[position:]
 
-            # Get all blocks that will attempt to take this
-            self._get_acceptors(ctx, node)
             if node.output is None:
-                continue  # If there was no value output, no need to text deform.
+                # Get the updated verb string and make the context, unless it's
+                # already parsed when the template is compiled
+                text = None
+                if node.verb is None:
+                    text = self._splice(message, start, end + 1, children)
+                    node.verb = Verb(text, limit=verb_limit)
+                ctx = Context(node.verb, response, self, message)
+
+                # Get all blocks that will attempt to take this
+                self._get_acceptors(ctx, node)
+                if node.output is None:
+                    # No value output, the node stays as is
+                    resolved.append(
+                        (start, end, text if text is not None else self._splice(message, start, end + 1, children))
+                    )
+                    continue
 
             if charlimit is not None:
                 total_work = total_work + len(node.output)  # Record how much we've done so far, for the rate limit
@@ -150,42 +486,35 @@ class Interpreter:
                         f"attempted were {total_work}/{charlimit}"
                     )
 
-            start, end = node.coordinates
-            message_slice_len = (end + 1) - start
-            replacement_len = len(node.output)
-            differential = replacement_len - message_slice_len  # The change in size of `final` after the change is applied
             if "TSE_STOP" in response.actions:
-                return final[:start] + node.output
-            final = final[:start] + node.output + final[end + 1 :]
-
-            # if each coordinate is later than `start` then it needs the diff applied.
-            for future_n in islice(node_ordered_list, i + 1, None):
-                new_start = None
-                new_end = None
-                if future_n.coordinates[0] > start:
-                    new_start = future_n.coordinates[0] + differential
-                else:
-                    new_start = future_n.coordinates[0]
-
-                if future_n.coordinates[1] > start:
-                    new_end = future_n.coordinates[1] + differential
-                else:
-                    new_end = future_n.coordinates[1]
-                future_n.coordinates = (new_start, new_end)
-
-        return final
-
-    def process(self, message: str, seed_variables: Dict[str, Adapter] = None, charlimit: Optional[int] = None) -> Response:
+                return self._splice(message, 0, start, resolved) + node.output
+            resolved.append((start, end, node.output))
+
+        return self._splice(message, 0, len(message), resolved)
+
+    def process(
+        self,
+        message: Union[str, Template],
+        seed_variables: Dict[str, Adapter] = None,
+        charlimit: Optional[int] = None,
+        *,
+        node_limit: Optional[int] = None,
+        time_limit: Optional[float] = None,
+    ) -> Response:
         """Processes a given TagScript string.
 
         Parameters
         ----------
-        message: str
-            A TagScript string to be processed.
+        message: Union[str, Template]
+            A TagScript string or a template compiled by :meth:`compile` to be processed.
         seed_variables: Dict[str, Adapter]
             A dictionary containing strings to adapters to provide context variables for processing.
         charlimit: int
-            The maximum characters to process.
+            The maximum characters to process, defaults to the interpreter's `charlimit`.
+        node_limit: int
+            The maximum blocks to process, defaults to the interpreter's `node_limit`.
+        time_limit: float
+            The maximum seconds to spend processing, defaults to the interpreter's `time_limit`.
 
         Returns
         -------
@@ -197,21 +526,120 @@ class Interpreter:
         TagScriptError
             A block intentionally raised an exception, most likely due to invalid user input.
         WorkloadExceededError
-            Signifies the interpreter reached the character limit, if one was provided.
+            Signifies the interpreter reached the character, block or time limit, if one was provided.
         ProcessError
             An unexpected error occurred while processing blocks.
         """
-        response = Response()
-        message_input = message
+        if isinstance(message, Template):
+            message_input = message.message
+            node_ordered_list = message.build_nodes()
+        else:
+            message_input = message
+            node_ordered_list = build_node_tree(message_input)
+
+        return self._process(
+            message_input,
+            node_ordered_list,
+            seed_variables,
+            self.charlimit if charlimit is None else charlimit,
+            self.node_limit if node_limit is None else node_limit,
+            self.time_limit if time_limit is None else time_limit,
+        )
+
+    def render_many(
+        self,
+        message: Union[str, Template],
+        seeds: Iterable[Dict[str, Adapter]],
+        charlimit: Optional[int] = None,
+        *,
+        node_limit: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        return_exceptions: bool = False,
+    ) -> List[Union[Response, TagScriptError]]:
+        """Processes a TagScript string once for every seed, e.g. a greeting for every member that joined.
+
+        The string is compiled once, blocks that don't depend on variables are
+        folded by :meth:`compile` and shared by the whole batch. Nodes are
+        reused between seeds instead of being built again.
+
+        Parameters
+        ----------
+        message: Union[str, Template]
+            A TagScript string or a template compiled by :meth:`compile` to be processed.
+        seeds: Iterable[Dict[str, Adapter]]
+            Seed variables for each response. Adapters can be shared between
+            seeds, so the same guild is only resolved once.
+        charlimit: int
+            The maximum characters to process per seed, defaults to the interpreter's `charlimit`.
+        node_limit: int
+            The maximum blocks to process per seed, defaults to the interpreter's `node_limit`.
+        time_limit: float
+            The maximum seconds to spend processing per seed, defaults to the interpreter's `time_limit`.
+        return_exceptions: bool
+            Whether a seed that failed to process gets its exception in place of
+            the response, instead of raising it and dropping the whole batch.
 
+        Returns
+        -------
+        List[Union[Response, TagScriptError]]
+            A response for every seed, in the same order.
+
+        Raises
+        ------
+        TagScriptError
+            A block intentionally raised an exception, most likely due to invalid user input.
+        WorkloadExceededError
+            Signifies the interpreter reached the character, block or time limit, if one was provided.
+        ProcessError
+            An unexpected error occurred while processing blocks.
+        """
+        template = message if isinstance(message, Template) else self.compile(message)
+        if charlimit is None:
+            charlimit = self.charlimit
+        if node_limit is None:
+            node_limit = self.node_limit
+        if time_limit is None:
+            time_limit = self.time_limit
+
+        node_ordered_list = template.build_nodes()
+        verbs = [verb for _, _, verb, _ in template.nodes]
+        responses = []
+        for seed_variables in seeds:
+            if responses:
+                # Only the verb (when it's parsed while processing) and output are changed by `_solve`
+                for node, verb in zip(node_ordered_list, verbs):
+                    node.verb = verb
+                    node.output = None
+            try:
+                response = self._process(
+                    template.message, node_ordered_list, seed_variables, charlimit, node_limit, time_limit
+                )
+            except TagScriptError as error:
+                if not return_exceptions:
+                    raise
+                responses.append(error)
+            else:
+                responses.append(response)
+        return responses
+
+    def _process(
+        self,
+        message: str,
+        node_ordered_list: List[Node],
+        seed_variables: Optional[Dict[str, Adapter]],
+        charlimit: Optional[int],
+        node_limit: Optional[int],
+        time_limit: Optional[float],
+    ) -> Response:
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+
+        response = Response()
         # Apply variables fed into `process`
         if seed_variables is not None:
             response.variables = {**response.variables, **seed_variables}
 
-        node_ordered_list = build_node_tree(message_input)
-
         try:
-            output = self._solve(message_input, node_ordered_list, response, charlimit)
+            output = self._solve(message, node_ordered_list, response, charlimit, node_limit=node_limit, deadline=deadline)
         except TagScriptError:
             raise
         except Exception as error:
@@ -0,0 +1,312 @@
+import math
+import operator
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+__all__ = ("MathParser",)
+
+
+Evaluator = Callable[[], Any]
+
+TOKEN_REGEX = re.compile(
+    r"\s*(?:"
+    r"(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[A-Za-z][A-Za-z0-9_$]*)"
+    r"|(?P<op>\*\*|[-+*/]=|[-+*/%^])"
+    r"|(?P<punct>[(),])"
+    r")"
+)
+EPSILON = 1e-12
+# Integer powers are exact and can take forever (9**9**9), floats overflow
+# on their own
+MAX_POWER_BITS = 65536
+
+
+def _power(a, b):
+    if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+        if b * abs(a).bit_length() > MAX_POWER_BITS:
+            raise OverflowError("Result is too large")
+    return operator.pow(a, b)
+
+
+# symbol -> (precedence, right associative, function)
+OPERATORS: Dict[str, Tuple[int, bool, Callable[[Any, Any], Any]]] = {
+    "+=": (0, False, operator.iadd),
+    "-=": (0, False, operator.isub),
+    "*=": (0, False, operator.imul),
+    "/=": (0, False, operator.itruediv),
+    "+": (1, False, operator.add),
+    "-": (1, False, operator.sub),
+    "*": (2, False, operator.mul),
+    "/": (2, False, operator.truediv),
+    "%": (2, False, operator.mod),
+    "^": (3, True, _power),
+    "**": (3, True, _power),
+}
+# Unary minus binds tighter than exponent, -2^2 = (-2)^2
+UNARY_PRECEDENCE = 4
+
+CONSTANTS: Dict[str, float] = {
+    "PI": math.pi,
+    "E": math.e,
+    "PHI": (1 + math.sqrt(5)) / 2,
+    "TAU": math.tau,
+}
+
+
+# Anything bigger takes too long, and it's way past float's range anyway
+MAX_FACTORIAL = 1000
+
+
+def _factorial(a):
+    if a != int(a):
+        raise ValueError("factorial() only accepts integral values")
+    if a > MAX_FACTORIAL:
+        raise ValueError(f"factorial() only accepts values up to {MAX_FACTORIAL}")
+    return math.factorial(int(a))
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "atan": math.atan,
+    "exp": math.exp,
+    "abs": abs,
+    "trunc": int,
+    "round": round,
+    "sgn": lambda a: -1 if a < -EPSILON else 1 if a > EPSILON else 0,
+    "sqrt": math.sqrt,
+    "floor": math.floor,
+    "fact": _factorial,
+    "log": lambda a: math.log(a, 10),
+    "ln": math.log,
+    "log2": math.log2,
+    # functions with multiple arguments
+    "multiply": lambda a, b: a * b,
+    "hypot": math.hypot,
+    # functions with a variable number of arguments
+    "all": lambda *a: all(a),
+}
+
+
+class MathParser:
+    """
+    Compiles arithmetic expressions into reusable evaluators.
+
+    Expressions are tokenized and converted with the shunting-yard algorithm,
+    the result is a tree of closures that can be called any number of times.
+    Compiled expressions are kept in an LRU keyed by the expression.
+
+    Supports ``+ - * / % ^ **`` (and ``+= -= *= /=`` with the lowest
+    precedence), unary ``+``/``-``, function calls and the constants
+    ``PI``, ``E``, ``PHI`` and ``TAU`` (case insensitive).
+
+    Attributes
+    ----------
+    number: Callable[[str], Any]
+        Converts number literals, e.g. ``float`` or ``decimal.Decimal``.
+    functions: Dict[str, Callable[..., Any]]
+        Functions that can be called from expressions.
+    convert: Optional[Callable[[Any], Any]]
+        Converts function results, so they can be mixed with `number`.
+    strict: bool
+        Whether unknown names raise ``ValueError``, otherwise they're 0.
+    strict_functions: bool
+        Same as `strict` but for unknown functions, defaults to `strict`.
+    cache_size: int
+        How many compiled expressions to keep.
+    """
+
+    def __init__(
+        self,
+        *,
+        number: Callable[[str], Any] = float,
+        functions: Optional[Dict[str, Callable[..., Any]]] = None,
+        convert: Optional[Callable[[Any], Any]] = None,
+        strict: bool = True,
+        strict_functions: Optional[bool] = None,
+        cache_size: int = 1024,
+    ):
+        self.number: Callable[[str], Any] = number
+        self.functions: Dict[str, Callable[..., Any]] = FUNCTIONS if functions is None else functions
+        self.convert: Optional[Callable[[Any], Any]] = convert
+        self.strict: bool = strict
+        self.strict_functions: bool = strict if strict_functions is None else strict_functions
+        self.cache_size: int = cache_size
+        self._constants: Dict[str, Any] = {
+            name: value if convert is None else convert(value) for name, value in CONSTANTS.items()
+        }
+        self._compiled: "OrderedDict[str, Evaluator]" = OrderedDict()
+
+    def __repr__(self):
+        return "<MathParser number={0.number!r} strict={0.strict!r}>".format(self)
+
+    @staticmethod
+    def tokenize(expression: str) -> List[Tuple[str, str]]:
+        """Split expression into (kind, value) tokens"""
+        tokens = []
+        position = 0
+        end = len(expression.rstrip())
+        while position < end:
+            match = TOKEN_REGEX.match(expression, position)
+            if not match or match.end() == position:
+                raise ValueError(f"Unexpected character at {position}: {expression[position:position + 10]!r}")
+            kind = match.lastgroup
+            tokens.append((kind, match.group(kind)))  # type: ignore
+            position = match.end()
+        return tokens
+
+    def to_rpn(self, tokens: List[Tuple[str, str]]) -> List[Tuple[str, Any]]:
+        """Shunting-yard, tokens to reverse polish notation
+
+        Output items are ("number", str), ("name", str), ("unary", "-"),
+        ("op", symbol) or ("call", (name, number of arguments)).
+        """
+        output: List[Tuple[str, Any]] = []
+        # ("op", symbol), ("unary", "-"), ("(", None) or ("call", [name, arguments])
+        stack: List[Tuple[str, Any]] = []
+        expect_operand = True
+
+        def precedence(item: Tuple[str, Any]) -> int:
+            return UNARY_PRECEDENCE if item[0] == "unary" else OPERATORS[item[1]][0]
+
+        for index, (kind, value) in enumerate(tokens):
+            if expect_operand:
+                if kind == "number":
+                    output.append(("number", value))
+                    expect_operand = False
+                elif kind == "name":
+                    if index + 1 < len(tokens) and tokens[index + 1] == ("punct", "("):
+                        stack.append(("call", [value, 1]))
+                    else:
+                        output.append(("name", value))
+                        expect_operand = False
+                elif kind == "op" and value in ("+", "-"):
+                    if value == "-":
+                        stack.append(("unary", "-"))
+                elif value == "(":
+                    # Function call's parenthesis is already on the stack
+                    if not (stack and stack[-1][0] == "call" and index and tokens[index - 1][0] == "name"):
+                        stack.append(("(", None))
+                else:
+                    raise ValueError(f"Expected a number, got {value!r}")
+                continue
+
+            if kind == "op":
+                if value not in OPERATORS:
+                    raise ValueError(f"Unknown operator {value!r}")
+                current, right = OPERATORS[value][:2]
+                while stack and stack[-1][0] in ("op", "unary"):
+                    top = precedence(stack[-1])
+                    if top > current or (top == current and not right):
+                        output.append(stack.pop())
+                    else:
+                        break
+                stack.append(("op", value))
+                expect_operand = True
+            elif value in (")", ","):
+                while stack and stack[-1][0] in ("op", "unary"):
+                    output.append(stack.pop())
+                if not stack:
+                    raise ValueError(f"Unexpected {value!r}")
+                if value == ",":
+                    if stack[-1][0] != "call":
+                        raise ValueError("Unexpected ','")
+                    stack[-1][1][1] += 1
+                    expect_operand = True
+                else:
+                    item = stack.pop()
+                    if item[0] == "call":
+                        output.append(("call", tuple(item[1])))
+            else:
+                raise ValueError(f"Expected an operator, got {value!r}")
+
+        if expect_operand:
+            raise ValueError("Unexpected end of expression")
+        while stack:
+            item = stack.pop()
+            if item[0] in ("(", "call"):
+                raise ValueError("Unclosed parenthesis")
+            output.append(item)
+        return output
+
+    def _build(self, rpn: List[Tuple[str, Any]]) -> Evaluator:
+        operands: List[Evaluator] = []
+        for kind, value in rpn:
+            if kind == "number":
+                operands.append(_constant(self.number(value)))
+            elif kind == "name":
+                constant = self._constants.get(value.upper())
+                if constant is None:
+                    if self.strict:
+                        raise ValueError(f"Unknown name {value!r}")
+                    constant = self.number("0")
+                operands.append(_constant(constant))
+            elif kind == "unary":
+                operands.append(_negate(operands.pop()))
+            elif kind == "op":
+                right = operands.pop()
+                operands.append(_binary(OPERATORS[value][2], operands.pop(), right))
+            else:
+                name, count = value
+                arguments = tuple(operands[-count:])
+                del operands[-count:]
+                function = self.functions.get(name)
+                if function is None:
+                    if self.strict_functions:
+                        raise ValueError(f"Unknown function {name!r}")
+                    # Plain int, so on its own it reads "0" like it always did
+                    operands.append(_constant(0))
+                else:
+                    operands.append(_call(function, arguments, self.convert))
+        return operands[0]
+
+    def compile(self, expression: str) -> Evaluator:
+        """Compiles an expression, returns a function that evaluates it
+
+        Raises
+        ------
+        ValueError
+            The expression is invalid.
+        """
+        try:
+            evaluator = self._compiled[expression]
+        except KeyError:
+            pass
+        else:
+            self._compiled.move_to_end(expression)
+            return evaluator
+
+        evaluator = self._build(self.to_rpn(self.tokenize(expression)))
+        if self.cache_size > 0:
+            self._compiled[expression] = evaluator
+            if len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+        return evaluator
+
+    def eval(self, expression: str) -> Any:
+        """Compiles (or reuses compiled) expression and evaluates it"""
+        return self.compile(expression)()
+
+
+def _constant(value: Any) -> Evaluator:
+    return lambda: value
+
+
+def _negate(operand: Evaluator) -> Evaluator:
+    return lambda: -operand()
+
+
+def _binary(function: Callable[[Any, Any], Any], left: Evaluator, right: Evaluator) -> Evaluator:
+    return lambda: function(left(), right())
+
+
+def _call(
+    function: Callable[..., Any], arguments: Tuple[Evaluator, ...], convert: Optional[Callable[[Any], Any]]
+) -> Evaluator:
+    if convert is None:
+        return lambda: function(*[argument() for argument in arguments])
+    return lambda: convert(function(*[argument() for argument in arguments]))
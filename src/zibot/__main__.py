@@ -99,6 +99,7 @@ def run():
                 None,
                 False,
                 getattr(_config, "migrationDir", getattr(_config, "migrationFolder", None)),
+                getattr(_config, "warmUpCache", False),
             )
         except ImportError as e:
             if e.name == "config":
@@ -136,6 +137,7 @@ def run():
                     None,
                     False,
                     os.environ.get("ZIBOT_MIGRATION_DIR"),
+                    os.environ.get("ZIBOT_WARM_UP_CACHE", "").lower() in ("1", "true", "yes"),
                 )
 
         if not config:
@@ -183,6 +185,7 @@ async def _datamigration(config: Config):
         db.GuildRoles,
         db.GuildMutes,
         db.CaseLog,
+        db.CommandUsage,
     ]
     for index, model in enumerate(models):
         current = await model.all(using_db=Tortoise.get_connection("default"))
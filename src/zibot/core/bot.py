@@ -7,7 +7,6 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 from __future__ import annotations
 
 import asyncio
-import copy
 import datetime
 import json
 import logging
@@ -15,7 +14,8 @@ import os
 import re
 import shutil
 import sys
-from collections import Counter
+import time
+from collections import Counter, defaultdict
 from contextlib import suppress
 from typing import TYPE_CHECKING, Any
 
@@ -24,26 +24,33 @@ import discord
 import zmq
 import zmq.asyncio
 from aerich import Command as AerichCommand
+from aerich.ddl.sqlite import SqliteDDL
 from discord.ext import commands, tasks
+from discord.ext.commands.view import StringView
 from discord.ui import Button
 from tortoise import Tortoise, connections
 from tortoise.exceptions import DBConnectionError, OperationalError
+from tortoise.expressions import Subquery
 from tortoise.models import Model
+from tortoise.transactions import in_transaction
 
 from .. import __version__ as botVersion
 from ..exts.meta._custom_command import CustomCommand
 from ..exts.meta._errors import CCommandDisabled, CCommandNotFound, CCommandNotInGuild
 from ..exts.meta._utils import getDisabledCommands
-from ..exts.timer.timer import Timer, TimerData
-from ..utils import utcnow
+from ..utils import dedupeCaseIds, utcnow
 from ..utils.format import formatCmdName
 from . import db
 from .colour import ZColour
 from .config import Config
 from .context import Context
-from .data import JSON, Blacklist, Cache, CacheDictProperty, CacheListProperty
+from .data import JSON, Blacklist, Cache, CacheProperty, SingleFlight
+from .dispatch import parseCommand
 from .guild import GuildWrapper
 from .i18n import FluentTranslator, Localization
+from .prefix import Prefix, PrefixMatcher
+from .settings import GuildConfigWriter, GuildSettings, compactGuildConfigs
+from .usage import UsageBuffer
 
 
 EXTS = []
@@ -62,13 +69,13 @@ EMOJI_REGEX = re.compile(r";(?P<name>[a-zA-Z0-9_]{2,32});")
 
 
 async def _callablePrefix(bot: ziBot, message: discord.Message) -> list:
-    """Callable Prefix for the bot."""
-    base = [bot.defPrefix]
-    guild: GuildWrapper | None = GuildWrapper.fromContext(message.guild, bot)
-    if guild:
-        prefixes = await guild.getPrefixes()
-        base.extend(prefixes)
-    return commands.when_mentioned_or(*sorted(base))(bot, message)
+    """Callable Prefix for the bot.
+
+    Only returns the prefix that's actually used by the message (if any)
+    """
+    matcher = await bot.getPrefixMatcher(message.guild)
+    prefix = matcher.match(message.content)
+    return [prefix] if prefix else []
 
 
 __all__ = ("ziBot",)
@@ -128,11 +135,17 @@ class ziBot(commands.Bot):
         self.activityIndex: int = 0
         self.commandUsage: Counter = Counter()
         self.customCommandUsage: int = 0
+        # Pending usage counters, flushed to database periodically
+        self.usage: UsageBuffer = UsageBuffer()
         # How many days before guild data get wiped when bot leaves the guild
         self.guildDelDays: int = 30
 
         # bot's default prefix
         self.defPrefix: str = self.config.defaultPrefix
+        # Prefix matcher for DMs, guilds have their own matcher
+        self._prefixMatcher: PrefixMatcher | None = None
+        # `command run` handle, refreshed whenever a cog is added or removed
+        self._ccRunner: commands.Command | None = None
 
         # News, shows up in help command
         self.news: dict[str, Any] = JSON(
@@ -148,30 +161,45 @@ class ziBot(commands.Bot):
         self.cache: Cache = (
             Cache()
             .add(
-                "prefixes",
-                cls=CacheListProperty,
-                unique=True,
-                limit=15,
+                "guildSettings",
+                cls=CacheProperty,
+                maxSize=10000,
             )
             .add(
-                "guildConfigs",
-                cls=CacheDictProperty,
+                # Custom command's name/alias -> command id index
+                "ccLookup",
+                cls=CacheProperty,
+                maxSize=5000,
             )
             .add(
-                "guildChannels",
-                cls=CacheDictProperty,
+                # Hydrated custom commands, keyed by (guildId, cmdId)
+                "customCommands",
+                cls=CacheProperty,
+                maxSize=2048,
             )
             .add(
-                "guildRoles",
-                cls=CacheDictProperty,
+                # Memoized responses of deterministic custom commands, see
+                # `CustomCommand.responseKey`. Keyed by the values the command
+                # reads, expiring only keeps unused responses from piling up
+                "ccResponses",
+                cls=CacheProperty,
+                ttl=60,
+                maxSize=4096,
             )
             .add(
-                "guildMutes",
-                cls=CacheListProperty,
-                unique=True,
+                # Guild's latest case number, see `utils.nextCaseId`
+                "caseIds",
+                cls=CacheProperty,
+                maxSize=10000,
             )
         )
 
+        # Batched guild config upserts
+        self.configWriter: GuildConfigWriter = GuildConfigWriter()
+
+        # Coalesce concurrent cache-miss loads
+        self.singleFlight: SingleFlight = SingleFlight()
+
         self.pubSocket: zmq.asyncio.Socket | None = None
         self.subSocket: zmq.asyncio.Socket | None = None
         self.repSocket: zmq.asyncio.Socket | None = None
@@ -214,6 +242,11 @@ class ziBot(commands.Bot):
 
         Button.__init__ = newInit  # type: ignore
 
+        # aerich uses MySQL's `ALTER TABLE ... ADD INDEX` syntax for SQLite,
+        # which SQLite doesn't support
+        SqliteDDL._ADD_INDEX_TEMPLATE = 'CREATE {unique}INDEX "{index_name}" ON "{table_name}" ({column_names})'
+        SqliteDDL._DROP_INDEX_TEMPLATE = 'DROP INDEX "{index_name}"'
+
     async def setup_hook(self) -> None:
         """`__init__` but async"""
         if not self.ownerIds:
@@ -243,6 +276,17 @@ class ziBot(commands.Bot):
         if migrationDir.exists():
             await aerichCmd.init()
 
+            # Old versions could give out the same case number twice, which
+            # would break the migration that makes it unique
+            with suppress(OperationalError):
+                if renumbered := await dedupeCaseIds():
+                    self.logger.warning(f"Renumbered {renumbered} duplicated case numbers")
+
+            # Same goes for guild configs, they're now limited to 1 row per guild
+            with suppress(OperationalError):
+                if removed := await compactGuildConfigs():
+                    self.logger.warning(f"Removed {removed} duplicate guild config rows")
+
             try:
                 update = await aerichCmd.migrate()
 
@@ -290,8 +334,15 @@ class ziBot(commands.Bot):
             await self.manageGuildDeletion()
 
             self.changingPresence.start()
+            self.flushUsage.start()
+            self.sweepGuilds.start()
             await self.zmqBind()
 
+        self.commandUsage, self.customCommandUsage = await UsageBuffer.fetchTotals()
+
+        if self.config.warmUpCache:
+            await self.warmUpCache()
+
         for extension in EXTS:
             await self.load_extension(extension)
 
@@ -365,29 +416,53 @@ class ziBot(commands.Bot):
         except Exception as e:
             print(e)
 
+    async def getGuildSettings(self, guildId: int) -> GuildSettings:
+        """Get guild's settings snapshot, fetch it from database if it's not cached yet"""
+        settings: GuildSettings | None = self.cache.guildSettings.get(guildId)  # type: ignore
+        if settings is None:
+            # Executed when guild settings is not in the cache, empty
+            # settings will also be cached
+            settings = await self.singleFlight.do(("guildSettings", guildId), lambda: self._loadGuildSettings(guildId))
+        return settings
+
+    async def _loadGuildSettings(self, guildId: int) -> GuildSettings:
+        # Configs changed while the guild wasn't cached might not be written yet
+        settings = self.configWriter.apply(await GuildSettings.fetch(guildId))
+        self.cache.guildSettings.set(guildId, settings)  # type: ignore
+        return settings
+
+    async def warmUpCache(self) -> None:
+        """Load every guild's settings in bulk, instead of lazily one by one"""
+        start = time.perf_counter()
+        settings, rowCount = await GuildSettings.fetchMany([guild.id for guild in self.guilds])
+        for guildId, guildSettings in settings.items():
+            self.cache.guildSettings.set(guildId, self.configWriter.apply(guildSettings))  # type: ignore
+        self.logger.warning(
+            f"Cache warmed up in {time.perf_counter() - start:.2f}s: {len(settings)} guilds, {rowCount} rows loaded"
+        )
+
+    async def getPrefixMatcher(self, guild: discord.Guild | None) -> PrefixMatcher:
+        """Get compiled prefix matcher for a guild, or the default one for DMs"""
+        if guild:
+            return await Prefix(owner=guild, bot=self).getMatcher()
+
+        if self._prefixMatcher is None and self.user:
+            self._prefixMatcher = PrefixMatcher.build(self)
+        return self._prefixMatcher or PrefixMatcher.build(self)
+
     async def getGuildConfigs(
         self,
         guildId: int,
         table: str | Model = "GuildConfigs",  # type: ignore
     ) -> dict[str, Any]:
-        # TODO - Cleaner caching system, use the cache system directly to
-        # handle these stuff
         if isinstance(table, str):
             table: Model | None = getattr(db, table, None)  # type: ignore
 
         if table is None:
             raise RuntimeError("Huh?")
 
-        # Get guild configs and maybe cache it
-        cached: CacheDictProperty = getattr(self.cache, table._meta.db_table)
-        if cached.get(guildId) is None:
-            # Executed when guild configs is not in the cache
-            config = await table.filter(guild_id=guildId).first().values() or {}  # type: ignore
-
-            for i in ("id", "guild_id"):
-                config.pop(i, None)
-            cached.set(guildId, config)
-        return cached.get(guildId, {})
+        settings = await self.getGuildSettings(guildId)
+        return settings.getConfigs(table._meta.db_table)
 
     async def getGuildConfig(self, guildId: int, configType: str, table: str | Model = "GuildConfigs") -> Any | None:
         # Get guild's specific config
@@ -411,20 +486,14 @@ class ziBot(commands.Bot):
             # No need to overwrite database value
             return config
 
-        kwargs = {
-            "guild_id": guildId,
-            configType: configValue,
-        }
-
-        await _table.create(**kwargs)
-        # await _table.update_or_create(**kwargs)
+        # Upserted to database shortly after, batched with other changes
+        self.configWriter.set(_table, guildId, configType, configValue)  # type: ignore
 
         # Overwrite current configs
-        cached: CacheDictProperty = getattr(self.cache, _table._meta.db_table)
-        newData = {configType: configValue}
-        cached.set(guildId, newData)
+        configs = await self.getGuildConfigs(guildId, _table)
+        configs[configType] = configValue
 
-        return cached.get(guildId, {}).get(configType, None)
+        return configs.get(configType, None)
 
     @tasks.loop(seconds=15)
     async def changingPresence(self) -> None:
@@ -448,145 +517,155 @@ class ziBot(commands.Bot):
 
         await self.change_presence(activity=activities[self.activityIndex])
 
-    async def manageGuildDeletion(self) -> None:
-        """Manages guild deletion from database on boot"""
-        timer: Timer | None = self.get_cog("Timer")  # type: ignore
-
-        dbGuilds = await db.Guilds.all()
-        dbGuilds = [i.id for i in dbGuilds]
-        guildIds = [i.id for i in self.guilds]
-
-        # Insert new guilds
-        await db.Guilds.bulk_create([db.Guilds(id=i) for i in guildIds if i not in dbGuilds])
-
-        scheduledGuilds = await db.Timer.filter(event="guild_del")
-        cancelledScheduleGuilds = [await i.delete() for i in scheduledGuilds if i.owner in guildIds]
-        scheduledGuildIds = [i.id for i in scheduledGuilds]
+    @tasks.loop(minutes=1)
+    async def flushUsage(self) -> None:
+        """A loop that write pending usage counters to database every minute."""
+        try:
+            # Shielded, cancelling the loop (e.g. on shutdown) mustn't
+            # interrupt a half-written transaction. close() flushes after it
+            await asyncio.shield(self.usage.flush())
+        except Exception as exc:
+            # Counters are kept, they'll be retried on next flush
+            self.logger.exception("Failed to flush usage counters", exc_info=exc)
+
+    def addCommandUsage(self, name: str) -> None:
+        self.commandUsage[name] += 1
+        self.usage.addCommand(name)
+
+    async def manageGuildDeletion(self, *, chunkSize: int = 500) -> None:
+        """Sync `guilds` table with guilds the bot is in on boot
+
+        Guilds the bot left while offline are marked as departed, `sweepGuilds`
+        will wipe their data after `guildDelDays` days.
+        """
+        rows: dict[int, datetime.datetime | None] = dict(await db.Guilds.all().values_list("id", "leftAt"))  # type: ignore
+        guildIds = {i.id for i in self.guilds}
 
-        # Schedule delete guild where the bot no longer in
         now = utcnow()
-        when = now + datetime.timedelta(days=self.guildDelDays)
-
-        await db.Timer.bulk_create(
-            [
-                db.Timer(
-                    id=i,
-                    event="guild_del",
-                    extra={"args": [], "kwargs": {}},
-                    expires=when,
-                    created=now,
-                    owner=i,
-                )
-                for i in dbGuilds
-                if i not in guildIds and i not in scheduledGuildIds
-            ]
+        # Guilds scheduled for deletion by the old per-guild timers
+        legacy: dict[int, datetime.datetime] = dict(
+            await db.Timer.filter(event="guild_del").values_list("owner", "created")  # type: ignore
         )
 
-        if not timer:
-            return
-
-        # Restart timer task
-        if timer._currentTimer and (
-            timer._currentTimer.owner in cancelledScheduleGuilds or when < timer._currentTimer.expires
-        ):
-            timer.restartTimer()
-        elif not timer._currentTimer:
-            timer.restartTimer()
+        newGuilds = [i for i in guildIds if i not in rows]
+        rejoined = [i for i in guildIds if rows.get(i) is not None]
+        departed: defaultdict[datetime.datetime, list[int]] = defaultdict(list)
+        for guildId, leftAt in rows.items():
+            if leftAt is None and guildId not in guildIds:
+                departed[legacy.get(guildId, now)].append(guildId)
+
+        async with in_transaction():
+            await db.Guilds.bulk_create([db.Guilds(id=i) for i in newGuilds], batch_size=chunkSize)
+            for i in range(0, len(rejoined), chunkSize):
+                await db.Guilds.filter(id__in=rejoined[i : i + chunkSize]).update(leftAt=None)
+            for leftAt, ids in departed.items():
+                for i in range(0, len(ids), chunkSize):
+                    await db.Guilds.filter(id__in=ids[i : i + chunkSize]).update(leftAt=leftAt)
+            if legacy:
+                await db.Timer.filter(event="guild_del").delete()
+
+    @tasks.loop(hours=1)
+    async def sweepGuilds(self) -> None:
+        """A loop that wipes data of guilds the bot left every hour."""
+        try:
+            await self.purgeDepartedGuilds()
+        except Exception as exc:
+            # Failed guilds will be retried on next sweep
+            self.logger.exception("Failed to sweep departed guilds", exc_info=exc)
+
+    async def purgeDepartedGuilds(self, *, chunkSize: int = 500) -> int:
+        """Wipe data of guilds the bot left more than `guildDelDays` days ago
+
+        Returns number of guilds wiped
+        """
+        cutoff = utcnow() - datetime.timedelta(days=self.guildDelDays)
+        expired: list[int] = await db.Guilds.filter(leftAt__lte=cutoff).values_list("id", flat=True)  # type: ignore
+        # Just in case the bot rejoined but it's not recorded yet
+        expired = [i for i in expired if not self.get_guild(i)]
+
+        for i in range(0, len(expired), chunkSize):
+            chunk = expired[i : i + chunkSize]
+            async with in_transaction():
+                # Custom commands aren't tied to a guild, only their lookups are
+                lookups = db.CommandsLookup.filter(guild_id__in=chunk)
+                # For the caches, they're gone once the commands are deleted
+                cmdIds = set(await lookups.values_list("cmd_id", flat=True))
+                await db.Commands.filter(id__in=Subquery(lookups.values("cmd_id"))).delete()
+                # Everything else cascades
+                await db.Guilds.filter(id__in=chunk).delete()
+
+            # clear guilds' cache
+            for guildId in chunk:
+                for dataType in self.cache.property:
+                    try:
+                        getattr(self.cache, dataType).clear(guildId)
+                    except KeyError:
+                        pass
+            # Caches keyed by (guildId, cmdId) and (cmdId, ...)
+            guildIds = set(chunk)
+            self.cache.customCommands.clearWhere(lambda key: key[0] in guildIds)  # type: ignore
+            self.cache.ccResponses.clearWhere(lambda key: key[0] in cmdIds)  # type: ignore
+
+        if expired:
+            self.logger.info("Wiped data of {} guild(s)".format(len(expired)))
+        return len(expired)
 
     async def on_guild_join(self, guild: discord.Guild) -> None:
         """Executed when bot joins a guild"""
         await self.waitUntilReady()
 
-        await db.Guilds.create(id=guild.id)
-
-        # Cancel deletion
-        await self.cancelDeletion(guild)
+        # Cancel deletion, or insert the guild if it's new
+        if not await self.cancelDeletion(guild):
+            await db.Guilds.create(id=guild.id)
 
     async def on_guild_remove(self, guild: discord.Guild) -> None:
         """Executed when bot leaves a guild"""
         await self.waitUntilReady()
         # Schedule deletion
-        await self.scheduleDeletion(guild.id, days=self.guildDelDays)
+        await self.scheduleDeletion(guild.id)
 
-    async def scheduleDeletion(self, guildId: int, days: int = 30) -> None:
-        """Schedule guild deletion from `guilds` table"""
-        timer: Timer = self.get_cog("Timer")  # type: ignore
-        if not timer:
-            return
-
-        now = utcnow()
-        when = now + datetime.timedelta(days=days)
-        await timer.createTimer(when, "guild_del", created=now, owner=guildId)
-
-    async def cancelDeletion(self, guild: discord.Guild) -> None:
-        """Cancel guild deletion"""
-        timer: Timer = self.get_cog("Timer")  # type: ignore
-        if not timer:
-            return
-
-        # Remove the deletion timer and restart timer task
-        await db.Timer.filter(owner=guild.id, event="guild_del").delete()
+    async def scheduleDeletion(self, guildId: int) -> None:
+        """Mark guild as departed, `sweepGuilds` will wipe its data later"""
+        await db.Guilds.filter(id=guildId).update(leftAt=utcnow())
 
-        if timer._currentTimer and timer._currentTimer.owner == guild.id:
-            timer.restartTimer()
-
-    async def on_guild_del_timer_complete(self, timer: TimerData) -> None:
-        """Executed when guild deletion timer completed"""
-        await self.waitUntilReady()
-        guildId: int = timer.owner
-
-        guildIds: list[int] = [i.id for i in self.guilds]
-        if guildId in guildIds:
-            # The bot rejoin, about the function
-            return
-
-        # Delete all guild's custom command
-        commands = await CustomCommand.getAll(discord.Object(id=guildId))
-        [await db.Commands.filter(id=i.id).delete() for i in commands]
-        await db.Guilds.filter(id=guildId).delete()
-
-        # clear guild's cache
-        for dataType in self.cache.property:
-            try:
-                getattr(self.cache, dataType).clear(guildId)
-            except KeyError:
-                pass
+    async def cancelDeletion(self, guild: discord.Guild) -> int:
+        """Cancel guild deletion, returns 0 if the guild is not in database"""
+        return await db.Guilds.filter(id=guild.id).update(leftAt=None)
 
     async def get_context(self, message, *, cls=Context):
         return await super().get_context(message, cls=cls)
 
-    async def process_commands(self, message: discord.Message) -> (str | commands.Command | commands.Group) | None:
-        # initial ctx
-        ctx: Context = await self.get_context(message)
-
-        if not ctx.prefix:
-            return
-
-        # 0 = Built-In, 1 = Custom
-        priority = 0
-        unixStyle = False
+    async def add_cog(self, cog: commands.Cog, /, *args, **kwargs) -> None:
+        await super().add_cog(cog, *args, **kwargs)
+        # Cache `command run` handle, so we don't have to look it up on every message
+        self._ccRunner = self.get_command("command run")
 
-        # Handling custom command priority
-        msg = copy.copy(message)
-        # Get msg content without prefix
-        msgContent: str = msg.content[len(ctx.prefix) :]
-        # TODO: Add ability add custom priority prefix
-        if msgContent.startswith(">") or msgContent.startswith("!") or (unixStyle := msgContent.startswith("./")):
-            # Also support `./` for unix-style of launching custom scripts
-            priority = 1
+    async def remove_cog(self, name: str, /, *args, **kwargs) -> commands.Cog | None:
+        cog = await super().remove_cog(name, *args, **kwargs)
+        self._ccRunner = self.get_command("command run")
+        return cog
 
-            # Turn `>command` into `command`
-            msgContent = msgContent[2 if unixStyle else 1 :]
+    async def process_commands(self, message: discord.Message) -> (str | commands.Command | commands.Group) | None:
+        me: discord.ClientUser | None = self.user
+        if me is None or message.author.id == me.id:
+            return
 
-            # Properly get command when priority is 1
-            msg.content = ctx.prefix + msgContent
+        content: str = message.content
+        prefix = (await self.getPrefixMatcher(message.guild)).match(content)
+        if not prefix:
+            return
 
-            # This fixes the problem, idk how ._.
-            ctx = await self.get_context(msg)
+        # Handling custom command priority, e.g. `>>command` -> `command`
+        parsed = parseCommand(content, prefix)
 
-        # Get arguments for custom commands
-        tmp = msgContent.split(" ")
-        args = (ctx, str(tmp.pop(0)).lower(), " ".join(tmp))
+        # Build ctx directly from the original message, view starts right
+        # after prefix (and priority marker if there's any)
+        view = StringView(content)
+        view.skip_string(content[: parsed.start])
+        invoker = view.get_word()
+        ctx: Context = Context(prefix=prefix, view=view, bot=self, message=message)
+        ctx.invoked_with = invoker
+        ctx.command = self.all_commands.get(invoker)
 
         # Check if user can run the command
         canRun = False
@@ -597,12 +676,12 @@ class ziBot(commands.Bot):
                 canRun = False
 
         # Apparently commands are callable, so ctx.invoke longer needed
-        executeCC = self.get_command("command run")
+        executeCC = self._ccRunner
 
         # Handling command invoke with priority
-        if (not canRun or priority >= 1) and executeCC:
+        if (not canRun or parsed.priority >= 1) and executeCC:
             with suppress(CCommandNotFound, CCommandNotInGuild, CCommandDisabled):
-                await executeCC(*args)  # type: ignore
+                await executeCC(ctx, parsed.name, parsed.argument)  # type: ignore
                 self.customCommandUsage += 1
                 return ""
         # Since priority is 0 and it can run the built-in command,
@@ -646,10 +725,10 @@ class ziBot(commands.Bot):
         if not processed:
             return await self.processNoNitroEmoji(message)
         if processed and not isinstance(processed, str):
-            self.commandUsage[formatCmdName(processed)] += 1
+            self.addCommandUsage(formatCmdName(processed))
 
     async def on_app_command_completion(self, _, command: discord.app_commands.Command | discord.app_commands.ContextMenu):
-        self.commandUsage[formatCmdName(command)] += 1
+        self.addCommandUsage(formatCmdName(command))
 
     async def on_message(self, message: discord.Message) -> None:
         if (
@@ -705,6 +784,26 @@ class ziBot(commands.Bot):
         if not self.config.test:
             await super().close()
 
+        # Write whatever is left before closing database connections. The
+        # loop's in-flight flush is shielded from the cancel, the final flush
+        # waits for it to finish before writing the rest
+        if self.flushUsage.is_running():
+            task = self.flushUsage.get_task()
+            self.flushUsage.cancel()
+            if task is not None:
+                with suppress(asyncio.CancelledError):
+                    await task
+        if self.sweepGuilds.is_running():
+            self.sweepGuilds.cancel()
+        try:
+            await self.usage.flush()
+        except Exception as exc:
+            self.logger.exception("Failed to flush usage counters", exc_info=exc)
+        try:
+            await self.configWriter.close()
+        except Exception as exc:
+            self.logger.exception("Failed to write guild configs", exc_info=exc)
+
         # Close database connections
         await connections.close_all()
         if self.config.test:
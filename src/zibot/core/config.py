@@ -31,6 +31,7 @@ class Config:
         "destUrl",
         "isDataMigration",
         "migrationDir",
+        "warmUpCache",
     )
 
     def __init__(
@@ -50,6 +51,7 @@ class Config:
         destUrl: str | None = None,
         isDataMigration: bool = False,
         migrationFolder: str | None = None,
+        warmUpCache: bool = False,
     ):
         self.token = token
         self.defaultPrefix = defaultPrefix or ">"
@@ -66,6 +68,8 @@ class Config:
         self.test = test
         self.zmqPorts = zmqPorts or {}
         self.migrationDir = Path(migrationFolder or "migrations")
+        # Load every guild's settings on startup instead of on first message
+        self.warmUpCache = warmUpCache
 
     @property
     def tortoiseConfig(self):
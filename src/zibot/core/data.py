@@ -6,17 +6,27 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import time
 import uuid
+from collections import Counter, OrderedDict
 from pathlib import Path
-from typing import Any, Iterable, Optional
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional, TypeVar
+
+
+T = TypeVar("T")
 
 
 # https://github.com/Rapptz/RoboDanny/blob/rewrite/cogs/utils/cache.py#L22-L43
 class ExpiringDict(dict):
-    """Subclassed dict for expiring cache"""
+    """Subclassed dict for expiring cache
+
+    Every item shares the same max age and re-setting a key moves it to the
+    end, so insertion order is also expiry order. Expired items are removed
+    from the front, which makes every access O(1) amortized.
+    """
 
     def __init__(self, items: Optional[dict] = None, maxAgeSeconds: Optional[int] = None) -> None:
         self.maxAgeSeconds: int = maxAgeSeconds or 3600  # (Default: 3600 seconds (1 hour))
@@ -27,17 +37,30 @@ class ExpiringDict(dict):
 
     def verifyCache(self) -> None:
         curTime: float = time.monotonic()
-        toRemove: list = [k for (k, (v, t)) in self.items() if curTime > (t + self.maxAgeSeconds)]
-        for k in toRemove:
-            del self[k]
+        expired = []
+        for k, (_, t) in super().items():
+            if curTime <= (t + self.maxAgeSeconds):
+                break
+            expired.append(k)
+        else:
+            # Everything is expired (or empty)
+            super().clear()
+            return
+
+        # Collected first, re-iterating from the front after every delete
+        # has to skip over the deleted slots
+        for k in expired:
+            super().__delitem__(k)
 
     def __contains__(self, key: Any) -> bool:
-        self.verifyCache()
-        return super().__contains__(key)
+        try:
+            self.getRaw(key)
+        except KeyError:
+            return False
+        return True
 
     def __getitem__(self, key: Any) -> Any:
-        self.verifyCache()
-        return super().__getitem__(key)[0]
+        return self.getRaw(key)[0]
 
     def get(self, key: Any, fallback: Any = None) -> Any:
         try:
@@ -46,14 +69,22 @@ class ExpiringDict(dict):
             return fallback
 
     def getRaw(self, key: Any) -> tuple[Any]:
-        self.verifyCache()
-        return super().__getitem__(key)
+        value = super().__getitem__(key)
+        if time.monotonic() > (value[1] + self.maxAgeSeconds):
+            self.verifyCache()
+            raise KeyError(key)
+        return value
 
     def __setitem__(self, key: Any, value: Any) -> None:
         self.verifyCache()
+        # Move re-set key to the end to keep items ordered by age
+        self.pop(key, None)
         return super().__setitem__(key, (value, time.monotonic()))
 
 
+_MISSING: Any = object()
+
+
 class CacheError(Exception):
     def __init__(self, message):
         super().__init__(message)
@@ -70,41 +101,101 @@ class CacheListFull(CacheError):
 
 
 class CacheProperty:
-    """Base Class for Cache Property"""
+    """Base Class for Cache Property
+
+    Bounded by `maxSize` (least recently used item is evicted first) and
+    optionally expires items `ttl` seconds after they're set, 0 means
+    unlimited for both. Keys are used as-is, e.g. guild id (int).
+    """
 
     # issubclass doesn't work properly, this is the best workaround i could think of
     isCacheProperty: bool = True
 
-    def __init__(self, unique: bool = False, ttl: int = 0) -> None:
+    def __init__(self, unique: bool = False, ttl: int = 0, maxSize: int = 0) -> None:
         self.unique: bool = unique  # Only unique value can be added/appended
-        self._items: dict[str, Any] = {} if ttl < 1 else ExpiringDict(maxAgeSeconds=ttl)
+        self.ttl: int = ttl
+        self.maxSize: int = maxSize
+        self._items: OrderedDict[Any, Any] = OrderedDict()
+        # key -> time when item expires, only used when ttl is set
+        self._expires: dict[Any, float] = {}
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
 
     def __repr__(self) -> str:
-        return f"<CacheProperty: {self._items}>"
+        return "<{0.__class__.__name__}: size={1} maxSize={0.maxSize} ttl={0.ttl}>".format(self, len(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Any) -> bool:
+        return self._getRaw(key, _MISSING) is not _MISSING
 
     @property
     def items(self) -> dict:
         return self._items
 
-    def set(self, _key: Any, value: Any) -> CacheProperty:
-        # Will bypass unique check
-        key: str = str(_key)
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _getRaw(self, key: Any, fallback: Any = None) -> Any:
+        """Get item without affecting stats nor eviction order, expired item is dropped"""
+        try:
+            value = self._items[key]
+        except KeyError:
+            return fallback
 
-        self._items.update({key: value})
-        return self
+        if self.ttl and self._expires[key] < time.monotonic():
+            self._pop(key)
+            self.evictions += 1
+            return fallback
+        return value
+
+    def _pop(self, key: Any) -> None:
+        del self._items[key]
+        self._expires.pop(key, None)
 
-    def add(self, _key: Any, value: Any) -> CacheProperty:
-        key: str = str(_key)
+    def set(self, key: Any, value: Any) -> CacheProperty:
+        # Will bypass unique check
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if self.ttl:
+            now = time.monotonic()
+            self._expires[key] = now + self.ttl
+            # Amortized cleanup, drop expired items from the cold end
+            while (oldest := next(iter(self._items))) is not key and self._expires[oldest] < now:
+                self._pop(oldest)
+                self.evictions += 1
+
+        if self.maxSize:
+            while len(self._items) > self.maxSize:
+                oldest = next(iter(self._items))
+                self._pop(oldest)
+                self.evictions += 1
+        return self
 
-        if self.unique and key in self._items:
+    def add(self, key: Any, value: Any) -> CacheProperty:
+        if self.unique and key in self:
             raise CacheUniqueViolation
 
         return self.set(key, value)
 
-    def __getitem__(self, _key: Any) -> Any:
-        key = str(_key)
+    def __getitem__(self, key: Any) -> Any:
+        value = self._getRaw(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            raise KeyError(key)
 
-        return self._items[key]
+        self.hits += 1
+        self._items.move_to_end(key)
+        return value
 
     def get(self, key: Any, fallback: Any = None) -> Any:
         try:
@@ -112,39 +203,42 @@ class CacheProperty:
         except KeyError:
             return fallback
 
+    def peek(self, key: Any, fallback: Any = None) -> Any:
+        """Get item without affecting the stats nor the eviction order"""
+        return self._getRaw(key, fallback)
+
     def clear(self, key: Any) -> None:
         try:
-            del self._items[str(key)]
+            self._pop(key)
         except KeyError:
             # Not exists
             pass
 
+    def clearWhere(self, predicate: Callable[[Any], bool]) -> int:
+        """Remove items whose key matches `predicate`, e.g. tuple keys by
+        their first element. Returns number of removed items
+        """
+        keys = [key for key in self._items if predicate(key)]
+        for key in keys:
+            self._pop(key)
+        return len(keys)
+
 
 class CacheDictProperty(CacheProperty):
     """Cache Dict Property"""
 
-    def __init__(
-        self,
-        unique: bool = False,
-        ttl: int = 0,
-    ) -> None:
-        super().__init__(unique=unique, ttl=ttl)
-        self._items: dict[str, Any] = {}
-
-    def set(self, _key: Any, value: dict[str, Any]) -> CacheDictProperty:
-        key: str = str(_key)
-
+    def set(self, key: Any, value: dict[str, Any]) -> CacheDictProperty:
         if not isinstance(value, dict):
             raise RuntimeError("Only dict value is allowed!")
-        try:
-            self._items[key].update(value)
-        except KeyError:
+
+        items = self._getRaw(key)
+        if items is None:
             super().set(key, value)
+        else:
+            items.update(value)
         return self
 
     # def add(self, key: str, value: Dict[str, Any]) -> CacheDictProperty:
-    #     key = str(key)
-
     #     return self.set(key, value)
 
     add = set
@@ -158,6 +252,8 @@ class CacheListProperty(CacheProperty):
         unique: bool = False,
         blacklist: Iterable = tuple(),
         limit: int = 0,
+        ttl: int = 0,
+        maxSize: int = 0,
     ) -> None:
         """
         Usage
@@ -174,64 +270,61 @@ class CacheListProperty(CacheProperty):
         __main__.CacheUniqueViolation: Unique Value Violation
         ...
         """
-        super().__init__(unique=unique)
+        super().__init__(unique=unique, ttl=ttl, maxSize=maxSize)
         self.blacklist: Iterable = list(blacklist)
         self.limit: int = limit
 
-    def extend(self, _key: Any, values: Iterable) -> CacheListProperty:
-        key: str = str(_key)
-        items = self._items.get(key, [])
+    def extend(self, key: Any, values: Iterable) -> CacheListProperty:
+        items = self._getRaw(key)
         values = set(values)  # Remove duplicates
 
         if not values:
             self.set(key, [])
             raise ValueError("value can't be empty")
 
-        if self.limit and (len(items) + len(values)) > self.limit:
+        if self.limit and (len(items or []) + len(values)) > self.limit:
             raise CacheListFull
 
         if self.unique:
-            values = [v for v in values if v not in items or v not in self.blacklist]
+            values = [v for v in values if v not in (items or []) or v not in self.blacklist]
             if not values:
                 raise CacheUniqueViolation
 
-        try:
-            self._items[key].extend(values)
-        except KeyError:
+        if items is None:
             self.set(key, list(values))
+        else:
+            items.extend(values)
 
         return self
 
-    def add(self, _key: Any, value: Any) -> CacheListProperty:
-        key: str = str(_key)
-        items = self._items.get(key, [])
+    def add(self, key: Any, value: Any) -> CacheListProperty:
+        items = self._getRaw(key)
 
         if not isinstance(value, int) and not value:
-            self._items[key] = []
+            self.set(key, [])
             raise ValueError("value can't be empty")
 
-        if self.limit and (len(items) + 1) > self.limit:
+        if self.limit and (len(items or []) + 1) > self.limit:
             raise CacheListFull
 
-        if self.unique and value in items:
+        if self.unique and value in (items or []):
             raise CacheUniqueViolation
 
         if value in self.blacklist:
             raise CacheError(f"'{value}' is blacklisted")
 
-        try:
-            self._items[key].append(value)
-        except KeyError:
+        if items is None:
             self.set(key, [value])
+        else:
+            items.append(value)
 
         return self
 
     # Alias add as append
     append = add
 
-    def remove(self, _key: Any, value: Any) -> CacheListProperty:
-        key: str = str(_key)
-        items = self._items.get(key, [])
+    def remove(self, key: Any, value: Any) -> CacheListProperty:
+        items = self._getRaw(key)
 
         if not value:
             raise ValueError("value can't be empty!")
@@ -240,13 +333,61 @@ class CacheListProperty(CacheProperty):
             raise IndexError("List is empty!")
 
         try:
-            self._items[key].remove(value)
+            items.remove(value)
         except ValueError:
             raise ValueError(f"'{value}' not in the list") from None
 
         return self
 
 
+class SingleFlight:
+    """Coalesce concurrent loads with the same key into a single call
+
+    Used for cache-miss loaders, while a key is being loaded every other
+    caller awaits the same in-flight task instead of querying the database
+    again.
+
+    Usage
+    -----
+    >>> settings = await flight.do(("guildSettings", guildId), lambda: GuildSettings.fetch(guildId))
+    """
+
+    __slots__ = ("_inflight", "calls", "saved")
+
+    def __init__(self) -> None:
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # Key's namespace (first item if key is a tuple) -> count
+        self.calls: Counter[str] = Counter()
+        self.saved: Counter[str] = Counter()
+
+    def __repr__(self) -> str:
+        return "<SingleFlight: inflight={} saved={}>".format(len(self._inflight), sum(self.saved.values()))
+
+    @staticmethod
+    def _namespace(key: Hashable) -> str:
+        return str(key[0] if isinstance(key, tuple) else key)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        namespace = self._namespace(key)
+        self.calls[namespace] += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            # Someone else already loading it
+            self.saved[namespace] += 1
+        else:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shielded, so a cancelled caller won't cancel the load for the others
+        return await asyncio.shield(task)
+
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {ns: {"calls": self.calls[ns], "saved": self.saved[ns]} for ns in self.calls}
+
+
 class Cache:
     """Cache manager"""
 
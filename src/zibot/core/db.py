@@ -47,6 +47,8 @@ class NewIntField(fields.IntField):
 
 class Guilds(Model):
     id = fields.BigIntField(pk=True, generated=False)
+    # When the bot left the guild, data will be wiped after `ziBot.guildDelDays` days
+    leftAt = fields.DatetimeField(null=True, index=True)
 
 
 class ContainsGuildId:
@@ -58,7 +60,7 @@ class Timer(Model):
     id = NewBigIntField(pk=True)
     event = fields.TextField()
     extra = fields.JSONField()  # {"args": ..., "kwargs": ...}
-    expires = fields.DatetimeField()
+    expires = fields.DatetimeField(index=True)
     created = fields.DatetimeField()
     owner = fields.BigIntField(pk=False, generated=False)
 
@@ -86,12 +88,16 @@ class CommandsLookup(ContainsGuildId, Model):
 
     class Meta:
         table = "commandsLookup"
+        indexes = (("guild_id", "name"),)
 
 
 class Disabled(ContainsGuildId, Model):
     id = NewIntField(pk=True)
     command = fields.TextField()
 
+    class Meta:
+        indexes = (("guild_id", "command"),)
+
 
 class Prefixes(ContainsGuildId, Model):
     id = NewIntField(pk=True)
@@ -99,6 +105,7 @@ class Prefixes(ContainsGuildId, Model):
 
     class Meta:
         unique_together = (("prefix", "guild_id"),)
+        indexes = (("guild_id",),)
 
 
 class GuildConfigs(ContainsGuildId, Model):
@@ -111,6 +118,7 @@ class GuildConfigs(ContainsGuildId, Model):
 
     class Meta:
         table = "guildConfigs"
+        unique_together = (("guild_id",),)
 
 
 class GuildChannels(ContainsGuildId, Model):
@@ -123,6 +131,7 @@ class GuildChannels(ContainsGuildId, Model):
 
     class Meta:
         table = "guildChannels"
+        unique_together = (("guild_id",),)
 
 
 class GuildRoles(ContainsGuildId, Model):
@@ -133,6 +142,7 @@ class GuildRoles(ContainsGuildId, Model):
 
     class Meta:
         table = "guildRoles"
+        unique_together = (("guild_id",),)
 
 
 class GuildMutes(ContainsGuildId, Model):
@@ -141,6 +151,7 @@ class GuildMutes(ContainsGuildId, Model):
 
     class Meta:
         table = "guildMutes"
+        indexes = (("guild_id", "mutedId"),)
 
 
 class CaseLog(ContainsGuildId, Model):
@@ -154,9 +165,25 @@ class CaseLog(ContainsGuildId, Model):
 
     class Meta:
         table = "caseLog"
+        unique_together = (("guild_id", "caseId"),)
+        indexes = (("guild_id", "modId"),)
 
 
 class Users(Model):
     id = fields.BigIntField(pk=True, generated=False)
     locale = fields.TextField(null=True)
     timeZone = fields.TextField(null=True)
+
+
+class CommandUsage(Model):
+    """Command usage rollup, one row per command per day"""
+
+    id = NewBigIntField(pk=True)
+    command = fields.TextField()  # formatted command name, or custom command's id
+    custom = fields.BooleanField(default=False)
+    uses = fields.BigIntField(pk=False, generated=False, default=0)
+    day = fields.DateField()
+
+    class Meta:
+        table = "commandUsage"
+        unique_together = (("command", "custom", "day"),)
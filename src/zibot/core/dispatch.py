@@ -0,0 +1,62 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("PRIORITY_MARKERS", "ParsedCommand", "parseCommand")
+
+
+# Marker used to prioritize custom command over built-in command, e.g.
+# `>>ping` or `>./ping` will always run custom command called `ping`.
+# `./` is there for unix-style of launching custom scripts.
+# TODO: Add ability add custom priority prefix
+PRIORITY_MARKERS: tuple[str, ...] = (">", "!", "./")
+
+
+class ParsedCommand:
+    """Prefixed message, split into parts needed to dispatch the command
+
+    Attributes
+    ----------
+    prefix: str
+        Prefix used to invoke the command
+    priority: int
+        0 = Built-In, 1 = Custom
+    start: int
+        Index where the invoked name starts (after prefix and priority marker)
+    name: str
+        Invoked name, lowercased (used to find custom command)
+    argument: str
+        Everything after the invoked name (used as custom command's argument)
+    """
+
+    __slots__ = ("prefix", "priority", "start", "name", "argument")
+
+    def __init__(self, prefix: str, priority: int, start: int, name: str, argument: str) -> None:
+        self.prefix: str = prefix
+        self.priority: int = priority
+        self.start: int = start
+        self.name: str = name
+        self.argument: str = argument
+
+    def __repr__(self) -> str:
+        return "<ParsedCommand: prefix={0.prefix!r} priority={0.priority} name={0.name!r}>".format(self)
+
+
+def parseCommand(content: str, prefix: str) -> ParsedCommand:
+    """Parse message's content that's already known to start with `prefix`"""
+    start = len(prefix)
+    priority = 0
+
+    for marker in PRIORITY_MARKERS:
+        if content.startswith(marker, start):
+            priority = 1
+            start += len(marker)
+            break
+
+    name, _, argument = content[start:].partition(" ")
+    return ParsedCommand(prefix, priority, start, name.lower(), argument)
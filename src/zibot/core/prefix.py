@@ -6,7 +6,8 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import re
+from typing import TYPE_CHECKING, Iterable
 
 import discord
 from discord.ext import commands
@@ -21,10 +22,49 @@ if TYPE_CHECKING:
     from .bot import ziBot
 
 
-__all__ = ("Prefix",)
+__all__ = ("Prefix", "PrefixMatcher")
+
+
+class PrefixMatcher:
+    """Precompiled matcher for every prefix the bot listens to in a guild
+
+    Prefixes are tried in the same order as `commands.when_mentioned_or`
+    (mentions first, then the rest sorted), so the first matching prefix
+    wins just like it did before.
+    """
+
+    __slots__ = ("prefixes", "_firstChars", "_pattern")
+
+    def __init__(self, prefixes: Iterable[str]) -> None:
+        self.prefixes: tuple[str, ...] = tuple(p for p in prefixes if p)
+        # Most messages aren't commands, reject them without touching the regex
+        self._firstChars: frozenset[str] = frozenset(p[0] for p in self.prefixes)
+        self._pattern: re.Pattern = re.compile("|".join(re.escape(p) for p in self.prefixes))
+
+    def __repr__(self) -> str:
+        return f"<PrefixMatcher: {self.prefixes}>"
+
+    @classmethod
+    def build(cls, bot: ziBot, prefixes: Iterable[str] = tuple()) -> PrefixMatcher:
+        mentions = []
+        if bot.user:
+            mentions = [f"<@{bot.user.id}> ", f"<@!{bot.user.id}> "]
+        return cls(mentions + sorted([bot.defPrefix, *prefixes]))
+
+    def match(self, content: str) -> str | None:
+        """Get the prefix used by `content`, None if it doesn't start with any prefix"""
+        if content[:1] not in self._firstChars:
+            return None
+
+        if match := self._pattern.match(content):
+            return match.group()
+        return None
 
 
 class Prefix:
+    # Maximum amount of custom prefixes a guild can have
+    limit: int = 15
+
     def __init__(self, *, owner: discord.Guild | discord.User, bot: ziBot):
         self.owner: discord.Guild | discord.User = owner
         self.bot: ziBot = bot
@@ -35,16 +75,11 @@ class Prefix:
         return []
 
     async def get(self) -> list[str]:
-        if self.bot.cache.prefixes.get(self.owner.id) is None:  # type: ignore
-            # Only executed when there's no cache for guild's prefix
-            dbPrefixes = await self.fetch()
+        if not isinstance(self.owner, discord.Guild):
+            return []
 
-            try:
-                self.bot.cache.prefixes.extend(self.owner.id, [p.prefix for p in dbPrefixes])  # type: ignore
-            except ValueError:
-                return []
-
-        return self.bot.cache.prefixes[self.owner.id]  # type: ignore
+        settings = await self.bot.getGuildSettings(self.owner.id)
+        return settings.prefixes
 
     async def getFormatted(self) -> str:
         _prefixes = await self.get()
@@ -63,35 +98,52 @@ class Prefix:
             result += "\n\nCustom prefixes: {}".format(prefixes)
         return result
 
+    async def getMatcher(self) -> PrefixMatcher:
+        if not isinstance(self.owner, discord.Guild):
+            return PrefixMatcher.build(self.bot)
+
+        settings = await self.bot.getGuildSettings(self.owner.id)
+        matcher = settings.prefixMatcher
+        if matcher is None:
+            matcher = PrefixMatcher.build(self.bot, settings.prefixes)
+            if self.bot.user:
+                # Only cache it once it knows the bot's mention
+                settings.prefixMatcher = matcher
+        return matcher
+
     async def add(self, prefix: str) -> str:
-        prefixes = await self.fetch()
+        settings = await self.bot.getGuildSettings(self.owner.id)
+        prefixes = settings.prefixes
 
         try:
-            if prefixes and (len(prefixes) + 1) > self.bot.cache.prefixes.limit:  # type: ignore
+            if prefix in prefixes:
+                raise CacheUniqueViolation
+
+            if (len(prefixes) + 1) > self.limit:
                 raise CacheListFull
 
             await db.Prefixes.create(prefix=prefix, guild_id=self.owner.id)
-            self.bot.cache.prefixes.add(self.owner.id, prefix)  # type: ignore
-        except (CacheUniqueViolation, IntegrityError) as exc:
-            if exc is IntegrityError:
-                self.bot.cache.prefixes.remove(self.owner.id, prefix)  # type: ignore
+            prefixes.append(prefix)
+            settings.prefixMatcher = None
+        except (CacheUniqueViolation, IntegrityError):
             raise commands.BadArgument("Prefix `{}` is already exists".format(self.cleanify(prefix)))
         except CacheListFull:
-            raise IndexError(
-                "Custom prefixes is full! (Only allowed to add up to `{}` prefixes)".format(
-                    self.bot.cache.prefixes.limit  # type: ignore
-                )
-            )
+            raise IndexError("Custom prefixes is full! (Only allowed to add up to `{}` prefixes)".format(self.limit))
 
         return prefix
 
     async def remove(self, prefix: str) -> str:
+        settings = await self.bot.getGuildSettings(self.owner.id)
+        prefixes = settings.prefixes
+
         try:
-            res = [await i.delete() for i in await db.Prefixes.filter(prefix=prefix, guild_id=self.owner.id)]
-            if not res:
+            deleted = await db.Prefixes.filter(prefix=prefix, guild_id=self.owner.id).delete()
+            if not deleted:
                 raise IndexError
 
-            self.bot.cache.prefixes.remove(self.owner.id, prefix)  # type: ignore
+            if prefix in prefixes:
+                prefixes.remove(prefix)
+            settings.prefixMatcher = None
         except IndexError:
             raise commands.BadArgument("Prefix `{}` is not exists".format(self.cleanify(prefix)))
 
@@ -0,0 +1,271 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Iterable
+
+from tortoise.functions import Count
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from . import db
+
+
+if TYPE_CHECKING:
+    from .prefix import PrefixMatcher
+
+
+__all__ = ("GuildSettings", "GuildConfigWriter", "compactGuildConfigs")
+
+
+# db_table -> GuildSettings slot, for tables that only store 1 row per guild
+CONFIG_TABLES: dict[str, str] = {
+    "guildConfigs": "configs",
+    "guildChannels": "channels",
+    "guildRoles": "roles",
+}
+
+
+class GuildSettings:
+    """Snapshot of everything the bot needs to know about a guild
+
+    Loaded with a single batch of queries and cached as a whole, empty
+    values included, so a guild without any custom prefix or disabled
+    command doesn't hit the database on every message.
+    """
+
+    __slots__ = (
+        "guildId",
+        "prefixes",
+        "disabled",
+        "configs",
+        "channels",
+        "roles",
+        "mutes",
+        "prefixMatcher",
+    )
+
+    def __init__(
+        self,
+        guildId: int,
+        *,
+        prefixes: list[str] | None = None,
+        disabled: list[str] | None = None,
+        configs: dict[str, Any] | None = None,
+        channels: dict[str, Any] | None = None,
+        roles: dict[str, Any] | None = None,
+        mutes: list[int] | None = None,
+    ) -> None:
+        self.guildId: int = guildId
+        self.prefixes: list[str] = prefixes or []
+        self.disabled: list[str] = disabled or []
+        self.configs: dict[str, Any] = configs or {}
+        self.channels: dict[str, Any] = channels or {}
+        self.roles: dict[str, Any] = roles or {}
+        self.mutes: list[int] = mutes or []
+        # Built from prefixes on demand, reset when prefixes changed
+        self.prefixMatcher: PrefixMatcher | None = None
+
+    def __repr__(self) -> str:
+        return "<GuildSettings: guildId={0.guildId} prefixes={0.prefixes} disabled={0.disabled}>".format(self)
+
+    @staticmethod
+    def _cleanConfig(config: dict[str, Any] | None) -> dict[str, Any]:
+        config = config or {}
+        for i in ("id", "guild_id"):
+            config.pop(i, None)
+        return config
+
+    def getConfigs(self, table: str) -> dict[str, Any]:
+        """Get config dict by its table name (e.g. 'guildConfigs')"""
+        try:
+            return getattr(self, CONFIG_TABLES[table])
+        except KeyError:
+            raise RuntimeError(f"'{table}' is not a guild config table") from None
+
+    @classmethod
+    async def fetch(cls, guildId: int) -> GuildSettings:
+        prefixes, disabled, configs, channels, roles, mutes = await asyncio.gather(
+            db.Prefixes.filter(guild_id=guildId).values_list("prefix", flat=True),
+            db.Disabled.filter(guild_id=guildId).values_list("command", flat=True),
+            db.GuildConfigs.filter(guild_id=guildId).first().values(),
+            db.GuildChannels.filter(guild_id=guildId).first().values(),
+            db.GuildRoles.filter(guild_id=guildId).first().values(),
+            db.GuildMutes.filter(guild_id=guildId).values_list("mutedId", flat=True),
+        )
+
+        return cls(
+            guildId,
+            prefixes=list(dict.fromkeys(prefixes)),  # type: ignore
+            disabled=list(dict.fromkeys(disabled)),  # type: ignore
+            configs=cls._cleanConfig(configs),  # type: ignore
+            channels=cls._cleanConfig(channels),  # type: ignore
+            roles=cls._cleanConfig(roles),  # type: ignore
+            mutes=list(dict.fromkeys(mutes)),  # type: ignore
+        )
+
+    @classmethod
+    async def fetchMany(cls, guildIds: Iterable[int], *, chunkSize: int = 500) -> tuple[dict[int, GuildSettings], int]:
+        """Bulk version of `fetch`, 6 queries per `chunkSize` guilds
+
+        Returns (guild id -> settings, number of rows loaded)
+        """
+        guildIds = list(dict.fromkeys(guildIds))
+        lists: defaultdict[str, defaultdict[int, list]] = defaultdict(lambda: defaultdict(list))
+        dicts: defaultdict[str, dict[int, dict[str, Any]]] = defaultdict(dict)
+        rowCount = 0
+
+        for i in range(0, len(guildIds), chunkSize):
+            chunk = guildIds[i : i + chunkSize]
+            prefixes, disabled, mutes, configs, channels, roles = await asyncio.gather(
+                db.Prefixes.filter(guild_id__in=chunk).values_list("guild_id", "prefix"),
+                db.Disabled.filter(guild_id__in=chunk).values_list("guild_id", "command"),
+                db.GuildMutes.filter(guild_id__in=chunk).values_list("guild_id", "mutedId"),
+                db.GuildConfigs.filter(guild_id__in=chunk).order_by("id").values(),
+                db.GuildChannels.filter(guild_id__in=chunk).order_by("id").values(),
+                db.GuildRoles.filter(guild_id__in=chunk).order_by("id").values(),
+            )
+
+            for name, rows in (("prefixes", prefixes), ("disabled", disabled), ("mutes", mutes)):
+                for guildId, value in rows:  # type: ignore
+                    lists[name][guildId].append(value)
+                rowCount += len(rows)
+
+            for name, rows in (("configs", configs), ("channels", channels), ("roles", roles)):
+                for row in rows:  # type: ignore
+                    # Same as `.first()`, only the oldest row counts
+                    dicts[name].setdefault(row["guild_id"], row)
+                rowCount += len(rows)
+
+        ret = {
+            guildId: cls(
+                guildId,
+                prefixes=list(dict.fromkeys(lists["prefixes"].get(guildId, ()))),
+                disabled=list(dict.fromkeys(lists["disabled"].get(guildId, ()))),
+                configs=cls._cleanConfig(dicts["configs"].get(guildId)),
+                channels=cls._cleanConfig(dicts["channels"].get(guildId)),
+                roles=cls._cleanConfig(dicts["roles"].get(guildId)),
+                mutes=list(dict.fromkeys(lists["mutes"].get(guildId, ()))),
+            )
+            for guildId in guildIds
+        }
+        return ret, rowCount
+
+
+class GuildConfigWriter:
+    """Batch guild config writes issued within `delay` seconds
+
+    Every (table, guild) gets a single upsert, all of them in one
+    transaction. Settings cache is updated by the caller right away, this
+    only delays the database write. Settings loaded from the database
+    before the write lands have to go through `apply()`.
+    """
+
+    __slots__ = ("delay", "_pending", "_flushing", "_task", "_lock", "logger")
+
+    def __init__(self, delay: float = 1.0) -> None:
+        self.delay: float = delay
+        # (table, guild id) -> {column: value}
+        self._pending: dict[tuple[type[Model], int], dict[str, Any]] = {}
+        # Writes of the flush in progress, not committed yet
+        self._flushing: dict[tuple[type[Model], int], dict[str, Any]] = {}
+        self._task: asyncio.Task | None = None
+        # Flushes are serialized, close() waits for the in-flight one
+        self._lock = asyncio.Lock()
+        self.logger: logging.Logger = logging.getLogger("discord")
+
+    def __repr__(self) -> str:
+        return "<GuildConfigWriter: pending={}>".format(len(self._pending))
+
+    def set(self, table: type[Model], guildId: int, column: str, value: Any) -> None:
+        self._pending.setdefault((table, guildId), {})[column] = value
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flushLater())
+
+    def apply(self, settings: GuildSettings) -> GuildSettings:
+        """Overlay uncommitted writes on settings freshly loaded from the database"""
+        for pending in (self._flushing, self._pending):
+            for (table, guildId), values in pending.items():
+                if guildId == settings.guildId:
+                    settings.getConfigs(table._meta.db_table).update(values)
+        return settings
+
+    async def _flushLater(self) -> None:
+        await asyncio.sleep(self.delay)
+        try:
+            # Shielded, close() cancelling this mustn't drop the writes
+            # halfway through
+            await asyncio.shield(self.flush())
+        except Exception as exc:
+            # Pending writes are kept, they'll be retried on next write/close
+            self.logger.exception("Failed to write guild configs", exc_info=exc)
+            return
+
+        # Written while flushing, set() didn't schedule them since this
+        # task was still running
+        if self._pending:
+            self._task = asyncio.create_task(self._flushLater())
+
+    async def flush(self) -> int:
+        """Write pending configs to the database, returns number of upserted rows"""
+        async with self._lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        self._flushing = pending
+        try:
+            async with in_transaction():
+                for (table, guildId), values in pending.items():
+                    if not await table.filter(guild_id=guildId).update(**values):
+                        await table.create(guild_id=guildId, **values)
+        except Exception:
+            # Put them back, values set while flushing are newer
+            for key, values in pending.items():
+                self._pending[key] = {**values, **self._pending.get(key, {})}
+            raise
+        finally:
+            self._flushing = {}
+
+        return len(pending)
+
+    async def close(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+        # Waits for a flush that's already running, then writes the rest
+        await self.flush()
+
+
+async def compactGuildConfigs() -> int:
+    """Remove duplicate config rows, required before guild_id is unique
+
+    Older versions inserted a new row on every config change, but only the
+    oldest row was ever read back. It's kept as is, so guilds end up with
+    the configs they actually had, the rest are deleted.
+
+    Returns number of removed rows
+    """
+    removed = 0
+    async with in_transaction():
+        for table in (db.GuildConfigs, db.GuildChannels, db.GuildRoles):
+            guildIds = (
+                await table.annotate(count=Count("id"))
+                .group_by("guild_id")
+                .filter(count__gt=1)
+                .values_list("guild_id", flat=True)
+            )
+            for guildId in guildIds:
+                oldest = await table.filter(guild_id=guildId).order_by("id").first().values_list("id", flat=True)
+                removed += await table.filter(guild_id=guildId, id__gt=oldest).delete()
+
+    return removed
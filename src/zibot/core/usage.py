@@ -0,0 +1,135 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+from collections import Counter, defaultdict
+
+from tortoise.expressions import F
+from tortoise.functions import Sum
+from tortoise.transactions import in_transaction
+
+from ..utils import utcnow
+from . import db
+
+
+__all__ = ("UsageBuffer",)
+
+
+class UsageBuffer:
+    """Write-behind buffer for command usage counters
+
+    Increments only touch memory, `flush()` writes them to the database in
+    one transaction as atomic `uses = uses + n` updates. The rollup table
+    gets one row per command per day, so it grows with the number of days
+    rather than the number of flushes.
+    """
+
+    __slots__ = ("commands", "customCommands", "_lock")
+
+    def __init__(self) -> None:
+        # formatted command name -> pending uses
+        self.commands: Counter[str] = Counter()
+        # custom command id -> pending uses
+        self.customCommands: Counter[int] = Counter()
+        # Flushes are serialized, so a flush waits for an in-flight one to
+        # finish (or put its counters back) before writing
+        self._lock = asyncio.Lock()
+
+    def __repr__(self) -> str:
+        return "<UsageBuffer: commands={} customCommands={}>".format(len(self.commands), len(self.customCommands))
+
+    def __len__(self) -> int:
+        return len(self.commands) + len(self.customCommands)
+
+    def addCommand(self, name: str) -> None:
+        self.commands[name] += 1
+
+    def addCustomCommand(self, cmdId: int) -> None:
+        self.customCommands[cmdId] += 1
+
+    def pending(self, cmdId: int) -> int:
+        """Custom command's uses that haven't been written to the database yet"""
+        return self.customCommands.get(cmdId, 0)
+
+    async def flush(self) -> int:
+        """Write pending counters to the database, returns number of rows written"""
+        async with self._lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        if not self:
+            return 0
+
+        # Swap before awaiting anything, increments made while flushing will
+        # go to the next flush
+        commands, self.commands = self.commands, Counter()
+        customCommands, self.customCommands = self.customCommands, Counter()
+
+        # Group command ids by increment, so each distinct `n` is 1 query
+        byIncrement: defaultdict[int, list[int]] = defaultdict(list)
+        for cmdId, n in customCommands.items():
+            byIncrement[n].append(cmdId)
+
+        # (custom, command) -> uses, rolled up into today's row
+        rollup: dict[tuple[bool, str], int] = {(False, name): n for name, n in commands.items()}
+        rollup.update({(True, str(cmdId)): n for cmdId, n in customCommands.items()})
+        today = utcnow().date()
+
+        try:
+            async with in_transaction():
+                for n, ids in byIncrement.items():
+                    await db.Commands.filter(id__in=ids).update(uses=F("uses") + n)
+                await self._upsertRollup(dict(rollup), today)
+        except Exception:
+            # Put them back, so they're retried on next flush
+            self.commands.update(commands)
+            self.customCommands.update(customCommands)
+            raise
+
+        return len(rollup)
+
+    @staticmethod
+    async def _upsertRollup(rollup: dict[tuple[bool, str], int], day: dt.date) -> None:
+        existing = await db.CommandUsage.filter(day=day, command__in=list({name for _, name in rollup})).values_list(
+            "id", "custom", "command"
+        )
+
+        byIncrement: defaultdict[int, list[int]] = defaultdict(list)
+        for rowId, isCustom, name in existing:  # type: ignore
+            n = rollup.pop((isCustom, name), None)
+            if n is not None:
+                byIncrement[n].append(rowId)
+
+        for n, ids in byIncrement.items():
+            await db.CommandUsage.filter(id__in=ids).update(uses=F("uses") + n)
+        if rollup:
+            await db.CommandUsage.bulk_create(
+                [db.CommandUsage(command=name, custom=isCustom, uses=n, day=day) for (isCustom, name), n in rollup.items()]
+            )
+
+    @staticmethod
+    async def fetchTotals() -> tuple[Counter[str], int]:
+        """Get command usage totals from the rollup table
+
+        Returns (built-in command name -> uses, total custom command uses)
+        """
+        rows = (
+            await db.CommandUsage.annotate(total=Sum("uses"))
+            .group_by("custom", "command")
+            .values_list("custom", "command", "total")
+        )
+
+        commands: Counter[str] = Counter()
+        custom = 0
+        for isCustom, name, total in rows:
+            if isCustom:
+                custom += int(total or 0)
+            else:
+                commands[name] = int(total or 0)
+        return commands, custom
@@ -11,7 +11,7 @@ import json
 import re
 import traceback
 from contextlib import suppress
-from typing import TYPE_CHECKING, Any, Dict, Optional, Union, cast
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union, cast
 
 import discord
 import pytz
@@ -116,6 +116,10 @@ class EventHandler(commands.Cog, CogMixin):
             tse.ReactBlock(),
         ]
         self.engine = tse.Interpreter(blocks)
+        # (guildId, type) -> (member, guild's member count at the time) waiting
+        # for a greeting that's already being sent, so joins during a raid are
+        # rendered in batches
+        self._pendingGreetings: Dict[Tuple[int, str], List[Tuple[discord.Member, Optional[int]]]] = {}
 
         bot.tree.error(self.appCommandError)
 
@@ -131,10 +135,10 @@ class EventHandler(commands.Cog, CogMixin):
             f"Something went wrong, please use legacy command `>{interaction.command}` in the meantime"
         )
 
-    def getGreetSeed(self, member: discord.Member) -> Dict[str, Any]:
+    def getGreetSeed(self, member: discord.Member, guild: Optional[tse.GuildAdapter] = None) -> Dict[str, Any]:
         """For welcome and farewell message"""
         target = tse.MemberAdapter(member)
-        guild = tse.GuildAdapter(member.guild)
+        guild = guild or tse.GuildAdapter(member.guild)
         return {
             "user": target,
             "member": target,
@@ -143,33 +147,88 @@ class EventHandler(commands.Cog, CogMixin):
         }
 
     async def handleGreeting(self, member: discord.Member, type: str) -> None:
-        channel = await self.bot.getGuildConfig(member.guild.id, f"{type}Ch", "GuildChannels")
+        key = (member.guild.id, type)
+        # Counted now, the batch is rendered after more members joined/left
+        entry = (member, member.guild.member_count)
+        pending = self._pendingGreetings.get(key)
+        if pending is not None:
+            # Greeted by the batch that's currently running
+            pending.append(entry)
+            return
+
+        self._pendingGreetings[key] = [entry]
+        # Drained in the background, so the listener (e.g. auto role) doesn't
+        # wait for the whole batch
+        self.bot.loop.create_task(self.greetPending(key))
+
+    async def greetPending(self, key: Tuple[int, str]) -> None:
+        """Greet members queued for (guildId, type) until there's none left"""
+        pending = self._pendingGreetings[key]
+        type = key[1]
+        try:
+            while pending:
+                members = pending.copy()
+                pending.clear()
+                try:
+                    await self.greetMembers(members, type)
+                except Exception as exc:
+                    # Members that were queued in the meantime still get theirs
+                    self.bot.logger.exception(f"Failed to send {type} messages", exc_info=exc)
+        finally:
+            del self._pendingGreetings[key]
+
+    async def greetMembers(self, members: List[Tuple[discord.Member, Optional[int]]], type: str) -> None:
+        """Send welcome or farewell message for members of the same guild
+
+        Members are paired with the guild's member count at the time they
+        joined/left.
+        """
+        guild = members[0][0].guild
+        channel = await self.bot.getGuildConfig(guild.id, f"{type}Ch", "GuildChannels")
         channel = self.bot.get_channel(channel or 0)
         if not channel:
             return
 
-        message = await self.bot.getGuildConfig(member.guild.id, f"{type}Msg")
+        message = await self.bot.getGuildConfig(guild.id, f"{type}Msg")
         if not message:
             message = ("Welcome" if type == "welcome" else "Goodbye") + ", {member}!"
 
-        result = self.engine.process(message, self.getGreetSeed(member))
-        embed = result.actions.get("embed")
-        # TODO: Make action tag block to ping everyone, here, or role if admin wants it
-        content = (
-            str(result.body or ("\u200b" if not embed else ""))
-            .replace("@everyone", "@\u200beveryone")
-            .replace("@here", "@\u200bhere")
-        )
-        try:
-            msg = await channel.send(content, embed=embed)  # type: ignore
-        except discord.HTTPException:
-            msg = await channel.send(content)  # type: ignore
-        except AttributeError:
-            return
+        # Guild's attributes are only resolved once for the whole batch,
+        # except for the member count
+        guildAdapter = tse.GuildAdapter(guild)
+        seeds = [
+            self.getGreetSeed(
+                member,
+                guildAdapter if count is None else guildAdapter.with_attributes(member_count=count, members=count),
+            )
+            for member, count in members
+        ]
+        results = self.engine.render_many(message, seeds, return_exceptions=True)
+        for (member, _), result in zip(members, results):
+            if isinstance(result, Exception):
+                self.bot.logger.warning(f"Failed to render {type} message for {member.id}: {result}")
+                continue
+
+            embed = result.actions.get("embed")
+            # TODO: Make action tag block to ping everyone, here, or role if admin wants it
+            content = (
+                str(result.body or ("\u200b" if not embed else ""))
+                .replace("@everyone", "@\u200beveryone")
+                .replace("@here", "@\u200bhere")
+            )
+            try:
+                msg = await channel.send(content, embed=embed)  # type: ignore
+            except discord.HTTPException:
+                try:
+                    msg = await channel.send(content)  # type: ignore
+                except discord.HTTPException:
+                    continue
+            except AttributeError:
+                return
 
-        if msg:
-            if react := result.actions.get("react"):
-                self.bot.loop.create_task(reactsToMessage(msg, react))
+            if msg:
+                if react := result.actions.get("react"):
+                    self.bot.loop.create_task(reactsToMessage(msg, react))
 
     @commands.Cog.listener("on_member_join")
     async def onMemberJoin(self, member: discord.Member) -> None:
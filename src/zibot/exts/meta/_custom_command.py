@@ -6,6 +6,9 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from __future__ import annotations
 
+import asyncio
+import copy
+
 import discord
 from discord.ext import commands
 
@@ -21,6 +24,7 @@ from ._errors import (
     CCommandNotFound,
     CCommandNotInGuild,
 )
+from ._utils import getCommandsLookup
 
 
 _blocks = [
@@ -33,8 +37,24 @@ _blocks = [
     tse.ReactBlock(),
     tse.ReactUBlock(),
     tse.SilentBlock(),
+    # Pure blocks, constant ones are folded when the command is compiled.
+    # Has to be after the variable getter, so they don't shadow variables
+    tse.MathBlock(),
+    tse.IfBlock(),
+    tse.AnyBlock(),
+    tse.AllBlock(),
+    tse.ReplaceBlock(),
+    tse.PythonBlock(),
+    tse.SubstringBlock(),
+    tse.URLEncodeBlock(),
 ]
-ENGINE = tse.Interpreter(_blocks)
+# Budget for a single custom command execution
+ENGINE = tse.Interpreter(_blocks, charlimit=100_000, node_limit=2000, time_limit=2.0)
+# Commands with more blocks than this are compiled and processed in a worker
+# thread, so they don't block the event loop
+THREADED_NODES = 100
+# Seed variables that change on every execution
+VOLATILE_SEEDS = frozenset(("unix", "uses"))
 
 
 class CustomCommand(commands.Converter):
@@ -101,7 +121,7 @@ class CustomCommand(commands.Converter):
             2: True,
         }.get(mode, False)
 
-    def _processTag(self, ctx, argument: str = ""):
+    async def _processTag(self, ctx, argument: str = ""):
         """Process tags from CC's content with TSE."""
         author = tse.MemberAdapter(ctx.author)
         content = self.content
@@ -116,7 +136,7 @@ class CustomCommand(commands.Converter):
             "member": target,
             "channel": channel,
             "unix": tse.IntAdapter(int(utcnow().timestamp())),
-            "prefix": ctx.prefix,
+            "prefix": tse.StringAdapter(ctx.prefix),
             "uses": tse.IntAdapter(self.uses + 1),
             "args": arguments,
             "argument": arguments,
@@ -124,7 +144,59 @@ class CustomCommand(commands.Converter):
         if ctx.guild:
             guild = tse.GuildAdapter(ctx.guild)
             seed.update(guild=guild, server=guild)
-        return ENGINE.process(content, seed)
+        # Compiled templates are cached, so popular commands are only parsed
+        # once. Compiling a big one (folding included) is done off the event
+        # loop, "{" count is an upper bound of its node count
+        if content.count("{") > THREADED_NODES:
+            template = await asyncio.to_thread(ENGINE.compile, content)
+        else:
+            template = ENGINE.compile(content)
+
+        key = self.responseKey(template, seed)
+        if key is not None:
+            cached: tse.Response | None = ctx.bot.cache.ccResponses.get(key)
+            if cached is not None:
+                return cached
+
+        if len(template.nodes) > THREADED_NODES:
+            result = await asyncio.to_thread(ENGINE.process, template, seed)
+        else:
+            result = ENGINE.process(template, seed)
+
+        if key is not None:
+            # Variables aren't needed, don't keep the adapters alive
+            memo = tse.Response()
+            memo.body = result.body
+            memo.actions = result.actions
+            ctx.bot.cache.ccResponses.set(key, memo)
+        return result
+
+    def responseKey(self, template: tse.Template, seed: dict[str, tse.Adapter]) -> tuple | None:
+        """Key for memoizing the command's response, None if it can't be memoized
+
+        Deterministic scripts give the same response for the same values of
+        the variables they read. Values are resolved for every block that
+        reads them, so e.g. renaming the author gives a different key.
+        """
+        variables = template.variables
+        if (
+            not template.deterministic
+            or variables is None
+            or template.reads is None
+            or not variables.isdisjoint(VOLATILE_SEEDS)
+        ):
+            return None
+
+        values = []
+        for name, verb in template.reads:
+            adapter = seed.get(name)
+            value = None
+            if adapter is not None:
+                value = adapter.cache_key(verb)
+                if value is None:
+                    return None
+            values.append((name, value))
+        return (self.id, self.content, tuple(values))
 
     async def execute(self, ctx: Context, argument: str = "", *, raw: bool = False):
         if not ctx.guild:
@@ -138,10 +210,17 @@ class CustomCommand(commands.Converter):
         if not self.enabled:
             raise CCommandDisabled
 
-        # Increment uses
-        await db.Commands.filter(id=self.id).update(uses=self.uses + 1)
-
-        result = self._processTag(ctx, argument)
+        # Increment uses, written to database later by the usage buffer
+        ctx.bot.usage.addCustomCommand(self.id)
+        cached: CustomCommand | None = ctx.bot.cache.customCommands.peek((ctx.guild.id, self.id))
+        if cached:
+            cached.uses += 1
+
+        try:
+            result = await self._processTag(ctx, argument)
+        except tse.WorkloadExceededError as err:
+            # Reported here, priority execution doesn't go through command error handler
+            return await ctx.error(str(err), title="Command is too heavy to run!")
         embed = result.actions.get("embed")
 
         dest = result.actions.get("target")
@@ -174,33 +253,61 @@ class CustomCommand(commands.Converter):
         if not guild:
             raise CCommandNotInGuild
 
-        lookup: db.CommandsLookup | None = await db.CommandsLookup.filter(name=command, guild_id=guild.id).first()
-        if not lookup:
+        # Answer misses from the in-memory index, no need to ask the database
+        _id: int | None = (await getCommandsLookup(context.bot, guild.id)).get(command)
+        if _id is None:
             # No command found
             raise CCommandNotFound(command)
 
-        _id = lookup.cmd_id  # type: ignore
-        name = lookup.name
+        bot = context.bot
+        cached: CustomCommand | None = bot.cache.customCommands.get((guild.id, _id))
+        if cached is None:
+            cached = await bot.singleFlight.do(("customCommand", guild.id, _id), lambda: cls._load(bot, guild.id, _id))
+            if cached is None:
+                raise CCommandNotFound(command)
 
-        results: db.CommandsLookup | None = await db.CommandsLookup.filter(cmd_id=_id).prefetch_related("cmd")  # type: ignore
-        if not results:
-            raise CCommandNotFound(command)
+        # Cached object is shared, invokedName differs per invocation
+        result = copy.copy(cached)
+        result.invokedName = command
+        return result
 
-        cmd: db.Commands = results[0].cmd  # type: ignore
-
-        return cls(
-            id=_id,
-            content=cmd.content,
-            name=cmd.name,
-            invokedName=name,
-            description=cmd.description,
-            category=cmd.category,
-            aliases=[alias.name for alias in results if alias.name != cmd.name],
-            uses=cmd.uses,
-            url=cmd.url,
-            owner=cmd.ownerId,
-            enabled=cmd.enabled,
+    @classmethod
+    async def _load(cls, bot, guildId: int, cmdId: int) -> CustomCommand | None:
+        # Command and all of its aliases in a single (joined) query
+        results = await db.CommandsLookup.filter(cmd_id=cmdId).values(
+            "name",
+            "cmd__name",
+            "cmd__content",
+            "cmd__description",
+            "cmd__category",
+            "cmd__uses",
+            "cmd__url",
+            "cmd__ownerId",
+            "cmd__enabled",
+        )
+        if not results:
+            return None
+
+        cmd = results[0]
+        command = cls(
+            id=cmdId,
+            content=cmd["cmd__content"],
+            name=cmd["cmd__name"],
+            description=cmd["cmd__description"],
+            category=cmd["cmd__category"],
+            aliases=[alias["name"] for alias in results if alias["name"] != cmd["cmd__name"]],
+            uses=cmd["cmd__uses"] + bot.usage.pending(cmdId),
+            url=cmd["cmd__url"],
+            owner=cmd["cmd__ownerId"],
+            enabled=cmd["cmd__enabled"],
         )
+        bot.cache.customCommands.set((guildId, cmdId), command)
+        return command
+
+    @staticmethod
+    def invalidate(bot, guildId: int, cmdId: int) -> None:
+        """Drop command from the cache, should be called after it's modified"""
+        bot.cache.customCommands.clear((guildId, cmdId))
 
     @staticmethod
     async def getAll(context: Context | discord.Object, category: str = None) -> list[CustomCommand]:
@@ -4,16 +4,30 @@ License, v. 2.0. If a copy of the MPL was not distributed with this
 file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """
 
+from __future__ import annotations
+
 from ...core import db
 
 
-async def getDisabledCommands(bot, guildId):
-    if bot.cache.disabled.get(guildId) is None:
-        dbDisabled = await db.Disabled.filter(guild_id=guildId)
+async def getDisabledCommands(bot, guildId) -> list[str]:
+    settings = await bot.getGuildSettings(guildId)
+    return settings.disabled
+
+
+async def getCommandsLookup(bot, guildId) -> dict[str, int]:
+    """Get guild's custom command name/alias -> command id index
+
+    Loaded from database on first use, callers that add/remove commands or
+    aliases are expected to keep it updated.
+    """
+    lookup: dict[str, int] | None = bot.cache.ccLookup.get(guildId)
+    if lookup is None:
+        lookup = await bot.singleFlight.do(("ccLookup", guildId), lambda: _loadCommandsLookup(bot, guildId))
+    return lookup
 
-        try:
-            bot.cache.disabled.extend(guildId, [c.command for c in dbDisabled])
-        except ValueError:
-            return []
 
-    return bot.cache.disabled.get(guildId, [])
+async def _loadCommandsLookup(bot, guildId) -> dict[str, int]:
+    rows = await db.CommandsLookup.filter(guild_id=guildId).values_list("name", "cmd_id")
+    lookup = {name: cmdId for name, cmdId in rows}  # type: ignore
+    bot.cache.ccLookup.set(guildId, lookup)
+    return lookup
@@ -15,7 +15,6 @@ from discord.ext import commands
 
 from ....core import checks, db
 from ....core.context import Context
-from ....core.data import CacheListProperty, CacheUniqueViolation
 from ....core.embed import ZEmbed
 from ....core.guild import CCMode, GuildWrapper
 from ....core.menus import ZChoices, choice
@@ -26,7 +25,7 @@ from .._checks import hasCCPriviledge
 from .._custom_command import CustomCommand, ManagedCustomCommand
 from .._errors import CCommandAlreadyExists, CCommandNoPerm, CCommandNotFound
 from .._flags import CmdManagerFlags
-from .._utils import getDisabledCommands
+from .._utils import getCommandsLookup, getDisabledCommands
 
 
 if TYPE_CHECKING:
@@ -47,13 +46,6 @@ class MetaCustomCommands(commands.Cog, CogMixin):
     def __init__(self, bot: ziBot):
         super().__init__(bot)
 
-        # Cache for disabled commands
-        self.bot.cache.add(
-            "disabled",
-            cls=CacheListProperty,
-            unique=True,
-        )
-
     # TODO: Separate tags from custom command
     @commands.group(
         aliases=("cmd", "tag", "script"),
@@ -91,6 +83,7 @@ class MetaCustomCommands(commands.Cog, CogMixin):
         )
         lookup = await db.CommandsLookup.create(cmd_id=cmd.id, name=name, guild_id=ctx.guild.id)
         if cmd and lookup:
+            (await getCommandsLookup(self.bot, ctx.guild.id))[lookup.name] = cmd.id
             return cmd.id, lookup.name
         return (None,) * 2
 
@@ -120,8 +113,7 @@ class MetaCustomCommands(commands.Cog, CogMixin):
 
     async def isCmdExist(self, ctx, name: str):
         """Check if command already exists"""
-        rows = await db.CommandsLookup.filter(name=name, guild__id=ctx.guild.id).first()
-        if rows:
+        if name in await getCommandsLookup(self.bot, ctx.guild.id):
             raise CCommandAlreadyExists(name)
 
     @command.command(
@@ -224,15 +216,17 @@ class MetaCustomCommands(commands.Cog, CogMixin):
             return await ctx.try_reply("Nothing changed.")
 
         await db.Commands.filter(id=command.id).update(url=link)
+        CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)
 
         return await ctx.success(
             "\nYou can do `{}command update {}` to update the content".format(ctx.clean_prefix, name),
             title="`{}` url has been set to <{}>".format(name, url),
         )
 
-    async def updateCommandContent(self, _: Context, command: ManagedCustomCommand, content):
+    async def updateCommandContent(self, ctx: Context, command: ManagedCustomCommand, content):
         """Update command's content"""
         update = await db.Commands.filter(id=command.id).update(content=content)
+        CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)  # type: ignore
         if update:
             return True
         return False
@@ -307,6 +301,8 @@ class MetaCustomCommands(commands.Cog, CogMixin):
         insert = await db.CommandsLookup.create(cmd_id=command.id, name=alias, guild_id=ctx.guild.id)
 
         if insert:
+            (await getCommandsLookup(self.bot, ctx.guild.id))[alias] = command.id
+            CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)
             return await ctx.success(title="Alias `{}` for `{}` has been created".format(alias, command))
 
     @command.command(
@@ -390,6 +386,7 @@ class MetaCustomCommands(commands.Cog, CogMixin):
             return await ctx.success(title="{} already in {}!".format(command, category))
 
         update = await db.Commands.filter(id=command.id).update(category=category)
+        CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)
 
         if update:
             return await ctx.success(title="{}'s category has been set to {}!".format(command, category))
@@ -438,11 +435,16 @@ class MetaCustomCommands(commands.Cog, CogMixin):
     )
     async def remove(self, ctx, command: ManagedCustomCommand):
         isAlias = command.invokedName in command.aliases
+        lookup = await getCommandsLookup(self.bot, ctx.guild.id)
         if isAlias:
             await db.CommandsLookup.filter(name=command.invokedName, guild_id=ctx.guild.id).delete()
+            lookup.pop(command.invokedName, None)
         else:
             # NOTE: Aliases will be deleted automatically
             await db.Commands.filter(id=command.id).delete()
+            for name in [command.name, *command.aliases]:
+                lookup.pop(name, None)
+        CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)
 
         return await ctx.success(title="{} `{}` has been removed".format("Alias" if isAlias else "Command", command.name))
 
@@ -560,7 +562,7 @@ class MetaCustomCommands(commands.Cog, CogMixin):
             if not added:
                 return await ctx.error(title="No commands succesfully disabled")
 
-            self.bot.cache.disabled.extend(ctx.guild.id, added)  # type: ignore
+            disabled.extend(added)
 
             await db.Disabled.bulk_create([db.Disabled(guild_id=ctx.guild.id, command=str(cmd)) for cmd in added])
 
@@ -576,20 +578,19 @@ class MetaCustomCommands(commands.Cog, CogMixin):
                 return await ctx.error(title=alreadyMsg.format(name))
 
             await db.Commands.filter(id=command.id).update(enabled=False)
+            CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)
             return await ctx.success(title=successMsg.format(name))
 
         if mode == "command":
             cmdName = chosen[0]
 
-            # Make sure disable command is cached from database
-            await getDisabledCommands(self.bot, ctx.guild.id)
+            disabled = await getDisabledCommands(self.bot, ctx.guild.id)
 
-            try:
-                self.bot.cache.disabled.append(ctx.guild.id, cmdName)  # type: ignore
-            except CacheUniqueViolation:
+            if cmdName in disabled:
                 # check if command already disabled
                 return await ctx.error(title=alreadyMsg.format(cmdName))
 
+            disabled.append(cmdName)
             await db.Disabled.create(guild_id=ctx.guild.id, command=cmdName)
             return await ctx.success(title=successMsg.format(cmdName))
 
@@ -638,7 +639,7 @@ class MetaCustomCommands(commands.Cog, CogMixin):
             for c in chosen[0].get_commands():
                 if c.name not in disabled:
                     continue
-                self.bot.cache.disabled.remove(ctx.guild.id, c.name)  # type: ignore
+                disabled.remove(c.name)
                 removed.append(c.name)
 
             if not removed:
@@ -660,17 +661,20 @@ class MetaCustomCommands(commands.Cog, CogMixin):
                 return await ctx.error(title=alreadyMsg.format(name))
 
             await db.Commands.filter(id=command.id).update(enabled=True)
+            CustomCommand.invalidate(self.bot, ctx.guild.id, command.id)
             return await ctx.success(title=successMsg.format(name))
 
         if mode == "command":
             cmdName = chosen[0]
 
-            try:
-                self.bot.cache.disabled.remove(ctx.guild.id, cmdName)  # type: ignore
-            except (ValueError, IndexError):
+            disabled = await getDisabledCommands(self.bot, ctx.guild.id)
+
+            if cmdName not in disabled:
                 # command already enabled
                 return await ctx.error(title=alreadyMsg.format(cmdName))
 
+            disabled.remove(cmdName)
+
             await db.Disabled.filter(guild_id=ctx.guild.id, command=cmdName).delete()
 
             return await ctx.success(title=successMsg.format(cmdName))
@@ -12,7 +12,6 @@ from discord.ext import commands
 
 from ...core import checks, db
 from ...core.converter import BannedMember, Hierarchy, MemberOrUser, TimeAndArgument
-from ...core.data import CacheUniqueViolation
 from ...core.embed import ZEmbed
 from ...core.errors import MissingMuteRole
 from ...core.menus import ZMenuPagesView
@@ -424,18 +423,10 @@ class Moderation(commands.Cog, CogMixin):
             # incase mute role got removed or member left the server
             await self.manageMuted(member, False, role)
 
-    async def getMutedMembers(self, guildId: int):
-        # Getting muted members from db/cache
-        # Will cache db results automatically
-        if (mutedMembers := self.bot.cache.guildMutes.get(guildId)) is None:  # type: ignore
-            dbMutes = await db.GuildMutes.filter(guild_id=guildId)
-
-            try:
-                mutedMembers = [m.mutedId for m in dbMutes]
-                self.bot.cache.guildMutes.extend(guildId, mutedMembers)  # type: ignore
-            except ValueError:
-                mutedMembers = []
-        return mutedMembers
+    async def getMutedMembers(self, guildId: int) -> list[int]:
+        # Getting muted members from guild's settings snapshot
+        settings = await self.bot.getGuildSettings(guildId)
+        return settings.mutes
 
     async def manageMuted(
         self,
@@ -450,28 +441,28 @@ class Moderation(commands.Cog, CogMixin):
         memberId = member.id
         guildId = member.guild.id
 
-        await self.getMutedMembers(guildId)
+        mutedMembers = await self.getMutedMembers(guildId)
 
         if mode is False:
             # Remove member from mutedMembers list
-            try:
-                self.bot.cache.guildMutes.remove(guildId, memberId)  # type: ignore
-            except IndexError:
+            if memberId not in mutedMembers:
                 # It's not in the list so we'll just return
                 return
 
+            mutedMembers.remove(memberId)
+
             await db.GuildMutes.filter(guild_id=guildId, mutedId=memberId).delete()
 
             self.bot.dispatch("member_unmuted", member, mutedRole)
 
         elif mode is True:
             # Add member to mutedMembers list
-            try:
-                self.bot.cache.guildMutes.add(guildId, memberId)  # type: ignore
-            except CacheUniqueViolation:
+            if memberId in mutedMembers:
                 # Already in the list
                 return
 
+            mutedMembers.append(memberId)
+
             await db.GuildMutes.create(guild_id=guildId, mutedId=memberId)
 
             self.bot.dispatch("member_muted", member, mutedRole)
@@ -8,7 +8,7 @@ from __future__ import annotations
 
 import asyncio
 import datetime as dt
-import sys
+import heapq
 from contextlib import suppress
 from typing import TYPE_CHECKING, Optional
 
@@ -16,6 +16,7 @@ import discord
 import pytz
 from discord.app_commands import locale_str as _
 from discord.ext import commands
+from tortoise.expressions import Q
 
 from ...core import commands as cmds
 from ...core import db
@@ -79,15 +80,30 @@ class Timer(commands.Cog, CogMixin):
     icon = "🕑"
     cc = True
 
+    # How many timers loaded from database at once
+    BATCH_SIZE: int = 1000
+    # Longest time dispatcher sleeps before re-checking, asyncio doesn't
+    # like sleeping for too long
+    MAX_SLEEP: float = 86400.0
+
     def __init__(self, bot: ziBot) -> None:
         super().__init__(bot)
 
-        pyVer = sys.version_info
-        if pyVer[1] >= 10:
-            self.haveData = asyncio.Event()
-        else:
-            self.haveData = asyncio.Event(loop=bot.loop)
-        self._currentTimer: Optional[TimerData] = None
+        # Upcoming timers, min-heap of (expires, id, timer)
+        self._heap: list[tuple[dt.datetime, int, TimerData]] = []
+        self._heapIds: set[int] = set()
+        # Timers deleted from database while still in the heap
+        self._cancelled: set[int] = set()
+        # (expires, id) of the last timer loaded from database, every timer
+        # up to this point is in the heap
+        self._loadedUntil: Optional[tuple[dt.datetime, int]] = None
+        # No more timers left in database
+        self._exhausted: bool = False
+        # Timers created while a top up is in flight, it might've queried
+        # the database before they were inserted
+        self._createdDuringTopUp: Optional[list[TimerData]] = None
+        # Wakes the dispatcher up when there's an earlier timer
+        self._wakeUp: asyncio.Event = asyncio.Event()
 
     async def cog_load(self) -> None:
         self.task = self.bot.loop.create_task(self.dispatchTimers())
@@ -98,48 +114,138 @@ class Timer(commands.Cog, CogMixin):
             task.cancel()
 
     def restartTimer(self) -> None:
+        """Reload timers from database, needed after timers are created/deleted without this cog"""
         self.task.cancel()
         self.task = self.bot.loop.create_task(self.dispatchTimers())
 
-    async def getActiveTimer(self, days: int = 7) -> Optional[TimerData]:
-        data = await db.Timer.filter(expires__lt=utcnow() + dt.timedelta(days=days)).order_by("expires").values()  # type: ignore
-        return TimerData(data[0]) if data else None
+    def _reset(self) -> None:
+        self._heap.clear()
+        self._heapIds.clear()
+        self._cancelled.clear()
+        self._loadedUntil = None
+        self._exhausted = False
+        self._createdDuringTopUp = None
 
-    async def waitForActiveTimer(self, days: int = 7) -> Optional[TimerData]:
-        timer: Optional[TimerData] = await self.getActiveTimer(days=days)
-        if timer is not None:
-            self.haveData.set()
-            return timer
+    def _push(self, timer: TimerData) -> None:
+        if timer.id in self._heapIds:
+            return
+        heapq.heappush(self._heap, (timer.expires, timer.id, timer))
+        self._heapIds.add(timer.id)
+
+    def _isLoaded(self, expires: dt.datetime, id: int) -> bool:
+        return self._exhausted or (self._loadedUntil is not None and (expires, id) <= self._loadedUntil)
+
+    async def _fetchBatch(self) -> list[dict]:
+        query = db.Timer.all()
+        if self._loadedUntil is not None:
+            expires, id = self._loadedUntil
+            query = query.filter(Q(expires__gt=expires) | Q(expires=expires, id__gt=id))
+        return await query.order_by("expires", "id").limit(self.BATCH_SIZE).values()
+
+    async def _topUp(self) -> None:
+        """Load next batch of timers from database"""
+        created: list[TimerData] = []
+        self._createdDuringTopUp = created
+        try:
+            data = await self._fetchBatch()
+        finally:
+            if self._createdDuringTopUp is created:
+                self._createdDuringTopUp = None
+
+        for row in data:
+            self._push(TimerData(row))
+        if data:
+            self._loadedUntil = (data[-1]["expires"], data[-1]["id"])
+        self._exhausted = len(data) < self.BATCH_SIZE
+
+        # Timers the query missed, the ones beyond the new window are picked
+        # up by the next top up
+        for timer in created:
+            if self._isLoaded(timer.expires, timer.id):
+                self._push(timer)
+        # Cancelled while loading, but didn't make it into the heap
+        self._cancelled &= self._heapIds
+
+    async def getActiveTimer(self) -> Optional[TimerData]:
+        """Get the earliest timer"""
+        while True:
+            if not self._heap and not self._exhausted:
+                await self._topUp()
+            if not self._heap:
+                return None
+
+            _, id, timer = self._heap[0]
+            if id not in self._cancelled:
+                return timer
+
+            heapq.heappop(self._heap)
+            self._heapIds.discard(id)
+            self._cancelled.discard(id)
+
+    async def callTimers(self, timers: list[TimerData]) -> None:
+        # delete the timers
+        await db.Timer.filter(id__in=[timer.id for timer in timers]).delete()
+
+        # dispatch the events
+        for timer in timers:
+            eventName = f"{timer.event}_timer_complete"
+            self.bot.dispatch(eventName, timer)
+
+    async def dispatchDue(self) -> float:
+        """Dispatch every timer that's already expired together
+
+        Returns how long to sleep until the next timer expires, 0 if some
+        timers were dispatched.
+        """
+        timer = await self.getActiveTimer()
+        now = utcnow()
 
-        self.haveData.clear()
-        self._currentTimer: Optional[TimerData] = None
-        await self.haveData.wait()
-        return await self.getActiveTimer(days=days)
+        if timer is None or timer.expires > now:
+            timeout = self.MAX_SLEEP if timer is None else (timer.expires - now).total_seconds()
+            return min(timeout, self.MAX_SLEEP)
 
-    async def callTimer(self, timer: TimerData) -> None:
-        # delete the timer
-        await db.Timer.filter(id=timer.id).delete()
+        due: list[TimerData] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, id, timer = heapq.heappop(self._heap)
+            self._heapIds.discard(id)
+            if id in self._cancelled:
+                self._cancelled.discard(id)
+                continue
+            due.append(timer)
 
-        # dispatch the event
-        eventName = f"{timer.event}_timer_complete"
-        self.bot.dispatch(eventName, timer)
+        if due:
+            await self.callTimers(due)
+        return 0.0
 
     async def dispatchTimers(self) -> None:
+        self._reset()
         try:
             while not self.bot.is_closed():
-                timer = self._currentTimer = await self.waitForActiveTimer(days=40)
-                now = utcnow()
-
-                if timer.expires >= now:  # type: ignore # Already waited for active timer
-                    sleepAmount = (timer.expires - now).total_seconds()  # type: ignore
-                    await asyncio.sleep(sleepAmount)
-
-                await self.callTimer(timer)  # type: ignore
+                self._wakeUp.clear()
+                if timeout := await self.dispatchDue():
+                    # Sleep until the timer expires, or there's an earlier timer
+                    with suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._wakeUp.wait(), timeout=timeout)
         except asyncio.CancelledError:
             raise
         except (OSError, discord.ConnectionClosed):
             self.restartTimer()
 
+    async def cancelTimers(self, **filters) -> int:
+        """Delete timers matching `filters`, returns number of deleted timers"""
+        ids: list[int] = await db.Timer.filter(**filters).values_list("id", flat=True)  # type: ignore
+        if not ids:
+            return 0
+
+        await db.Timer.filter(id__in=ids).delete()
+        if self._createdDuringTopUp is not None:
+            # In-flight top up might still load them
+            self._cancelled.update(ids)
+        else:
+            self._cancelled.update(id for id in ids if id in self._heapIds)
+        self._wakeUp.set()
+        return len(ids)
+
     async def createTimer(self, *args, **kwargs) -> TimerData:
         when, event, *args = args
 
@@ -157,7 +263,6 @@ class Timer(commands.Cog, CogMixin):
             created=nowTs,
             owner=owner,
         )
-        delta = (when - now).total_seconds()
 
         values = {
             "event": event,
@@ -169,12 +274,14 @@ class Timer(commands.Cog, CogMixin):
         _dbTimer = await db.Timer.create(**values)
         timer.id = _dbTimer.id
 
-        if delta <= (86400 * 40):  # 40 days
-            self.haveData.set()
-
-        if self._currentTimer and when < self._currentTimer.expires:
-            # cancel the task and re-run it
-            self.restartTimer()
+        # Timers beyond what's loaded will be loaded later by top up
+        if self._createdDuringTopUp is not None:
+            self._createdDuringTopUp.append(timer)
+        elif self._isLoaded(when, timer.id):
+            self._push(timer)
+            if self._heap[0][2] is timer:
+                # It's the earliest timer, wake the dispatcher up
+                self._wakeUp.set()
 
         return timer
 
@@ -22,9 +22,10 @@ from ...core import commands as cmds
 from ...core.context import Context
 from ...core.embed import Field, ZEmbed, ZEmbedBuilder
 from ...core.mixin import CogMixin
-from ...utils import NumericStringParser, decodeMorse, encodeMorse, parseCodeBlock
+from ...utils import decodeMorse, encodeMorse, parseCodeBlock
 from ...utils.api.googletrans import GoogleTranslate
 from ...utils.api.piston import Piston
+from ...utils.sandbox import EvaluationLimitExceeded, MathSandbox
 
 
 if TYPE_CHECKING:
@@ -41,6 +42,15 @@ class Utilities(commands.Cog, CogMixin):
         super().__init__(bot)
         self.piston = Piston(session=self.bot.session, loop=self.bot.loop)
         self.googletrans = GoogleTranslate(session=self.bot.session)
+        # calc's expressions are evaluated in separate processes, so
+        # a heavy expression can't block the bot
+        self.mathSandbox = MathSandbox()
+
+    async def cog_load(self) -> None:
+        await self.mathSandbox.start()
+
+    def cog_unload(self) -> None:
+        self.mathSandbox.close()
 
     @cmds.command(
         name=_("calc"),
@@ -61,7 +71,7 @@ class Utilities(commands.Cog, CogMixin):
         result: _ | str
         key = "calc-result"
         try:
-            _result = NumericStringParser().eval(equation)
+            _result = await self.mathSandbox.evaluate(equation)
             if _result > sys.maxsize:
                 formattedResult = _(key + "-too-large")
             else:
@@ -71,6 +81,8 @@ class Utilities(commands.Cog, CogMixin):
             formattedResult, result = (_(key + "-infinite"),) * 2
         except (InvalidOperation, DivisionByZero):
             formattedResult, result = (_(key + "-error"),) * 2
+        except EvaluationLimitExceeded as e:
+            return await ctx.send(str(e))
         except Exception as e:
             return await ctx.send("I couldn't read that expression properly.")
 
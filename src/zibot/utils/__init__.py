@@ -4,172 +4,37 @@ License, v. 2.0. If a copy of the MPL was not distributed with this
 file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """
 
-from __future__ import annotations, division
+from __future__ import annotations
 
 import datetime as dt
-import math
-import operator
 from decimal import Decimal
 from html.parser import HTMLParser
 from typing import Any, Optional, Tuple
 
 import discord
-from pyparsing import (
-    CaselessKeyword,
-    Forward,
-    Group,
-    Literal,
-    Regex,
-    Suppress,
-    Word,
-    alphanums,
-    alphas,
-    delimitedList,
-)
-from tortoise.functions import Max
-
-from ..core import db
+from tortoise.exceptions import IntegrityError
+from tortoise.functions import Count, Max
+from tortoise.transactions import in_transaction
 
+from src import tse
 
-PHI = (1 + math.sqrt(5)) / 2
+from ..core import db
 
 
-class NumericStringParser(object):
-    """
-    Most of this code comes from the fourFn.py pyparsing example by Paul McGuire
+def _toDecimal(value: Any) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    # repr, so 0.1 stays 0.1 instead of 0.1000000000000000055511151231257827...
+    return Decimal(repr(value))
 
-    http://pyparsing.wikispaces.com/file/view/fourFn.py
-    http://pyparsing.wikispaces.com/message/view/home/15549426
-    """
 
-    def pushFirst(self, toks):
-        self.exprStack.append(toks[0])
-
-    def pushUMinus(self, toks):
-        if toks and toks[0] == "-":
-            self.exprStack.append("unary -")
-
-    def __init__(self):
-        """
-        expop   :: '^' | '**'
-        multop  :: '*' | '/' | '%'
-        addop   :: '+' | '-'
-        integer :: ['+' | '-'] '0'..'9'+
-        atom    :: PI | E | real | fn '(' expr ')' | '(' expr ')'
-        factor  :: atom [ expop factor ]*
-        term    :: factor [ multop factor ]*
-        expr    :: term [ addop term ]*
-        """
-        # point = Literal(".")
-
-        e = CaselessKeyword("E")
-        pi = CaselessKeyword("PI")
-        phi = CaselessKeyword("PHI")
-        tau = CaselessKeyword("TAU")
-
-        # fnumber = Combine(
-        #     Word("+-" + nums, nums)
-        #     + Optional(point + Optional(Word(nums)))
-        #     + Optional(e + Word("+-" + nums, nums))
-        # )
-        fnumber = Regex(r"[+-]?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?")
-        ident = Word(alphas, alphanums + "_$")
-
-        plus, minus, mult, div, mod = map(Literal, "+-*/%")
-        lpar, rpar = map(Suppress, "()")
-        addop = plus | minus
-        multop = mult | div | mod
-        expop = Literal("^") | Literal("**")
-
-        expr = Forward()
-        expr_list = delimitedList(Group(expr))
-
-        # add parse action that replaces the function identifier with a (name, number of args) tuple
-        def insert_fn_argcount_tuple(t):
-            fn = t.pop(0)
-            num_args = len(t[0])
-            t.insert(0, (fn, num_args))
-
-        fn_call = (ident + lpar - Group(expr_list) + rpar).setParseAction(insert_fn_argcount_tuple)
-        atom = (
-            addop[...]
-            + ((fn_call | pi | phi | e | tau | fnumber | ident).setParseAction(self.pushFirst) | Group(lpar + expr + rpar))
-        ).setParseAction(self.pushUMinus)
-
-        # by defining exponentiation as "atom [ ^ factor ]..." instead of
-        # "atom [ ^ atom ]...", we get right-to-left exponents, instead of left-to-right
-        # that is, 2^3^2 = 2^(3^2), not (2^3)^2.
-        factor = Forward()
-        factor <<= atom + (expop + factor).setParseAction(self.pushFirst)[...]
-        term = factor + (multop + factor).setParseAction(self.pushFirst)[...]
-        expr <<= term + (addop + term).setParseAction(self.pushFirst)[...]
-
-        self.bnf = expr
-
-        # map operator symbols to corresponding arithmetic operations
-        epsilon = 1e-12
-        self.opn = {
-            "+": operator.add,
-            "-": operator.sub,
-            "*": operator.mul,
-            "/": operator.truediv,
-            "%": operator.mod,
-            "^": operator.pow,
-            "**": operator.pow,
-        }
-        self.fn = {
-            "sin": math.sin,
-            "cos": math.cos,
-            "tan": math.tan,
-            "atan": math.atan,
-            "exp": math.exp,
-            "abs": abs,
-            "trunc": int,
-            "round": round,
-            "sgn": lambda a: -1 if a < -epsilon else 1 if a > epsilon else 0,
-            "sqrt": math.sqrt,
-            "floor": math.floor,
-            "fact": math.factorial,
-            # functionsl with multiple arguments
-            "multiply": lambda a, b: a * b,
-            "hypot": math.hypot,
-            # functions with a variable number of arguments
-            "all": lambda *a: all(a),
-        }
-
-    def evaluateStack(self, s):
-        op, num_args = s.pop(), 0
-        if isinstance(op, tuple):
-            op, num_args = op
-
-        if op == "unary -":
-            return -self.evaluateStack(s)
-        if op in self.opn:
-            op2 = self.evaluateStack(s)
-            op1 = self.evaluateStack(s)
-            return self.opn[op](op1, op2)
-        elif op == "PI":
-            return math.pi  # 3.1415926535
-        elif op == "E":
-            return math.e  # 2.718281828
-        elif op == "PHI":
-            return PHI
-        elif op == "TAU":
-            return math.tau
-        elif op in self.fn:
-            # note: args are pushed onto the stack in reverse order
-            args = reversed([self.evaluateStack(s) for _ in range(num_args)])
-            return self.fn[op](*args)
-        elif op[0].isalpha():
-            return 0
-        else:
-            return Decimal(op)
+class NumericStringParser(tse.MathParser):
+    """MathParser that uses Decimal, unknown names evaluate to 0"""
 
-    def eval(self, num_string, parseAll=True):
-        self.exprStack = []
-        self.bnf.parseString(num_string, parseAll)
-        val = self.evaluateStack(self.exprStack[:])
-        return val
+    def __init__(self) -> None:
+        super().__init__(number=Decimal, convert=_toDecimal, strict=False)
 
 
 async def reactsToMessage(message: discord.Message, reactions: list = []):
@@ -290,6 +155,39 @@ def decodeMorse(msg):
     return decoded
 
 
+async def _loadCaseId(bot, guildId: int) -> int:
+    # I had to use .values() instead of .first() because of a known Tortoise issue
+    # REF: https://github.com/tortoise/tortoise-orm/issues/794
+    q: list[dict[str, Any]] = await db.CaseLog.filter(guild_id=guildId).annotate(caseId=Max("caseId")).values("caseId")  # type: ignore
+
+    try:
+        caseNum = int(q[0]["caseId"] or 0)
+    except (IndexError, KeyError):
+        caseNum = 0
+
+    # Another load could've already set it (and given out numbers)
+    if (current := bot.cache.caseIds.peek(guildId)) is None:
+        bot.cache.caseIds.set(guildId, caseNum)
+        return caseNum
+    return current
+
+
+async def nextCaseId(bot, guildId: int) -> int:
+    """Hand out guild's next case number
+
+    MAX(caseId) is only queried once per guild, after that it's just an
+    in-memory counter.
+    """
+    if bot.cache.caseIds.peek(guildId) is None:
+        await bot.singleFlight.do(("caseId", guildId), lambda: _loadCaseId(bot, guildId))
+
+    # No await between reading and setting the counter, so concurrent
+    # callers always get different numbers
+    caseNum = bot.cache.caseIds.get(guildId, 0) + 1
+    bot.cache.caseIds.set(guildId, caseNum)
+    return caseNum
+
+
 async def doCaselog(
     bot,
     *,
@@ -298,28 +196,56 @@ async def doCaselog(
     modId: int,
     targetId: int,
     reason: str,
+    retries: int = 3,
 ) -> Optional[int]:
-    # I had to use .values() instead of .first() because of a known Tortoise issue
-    # REF: https://github.com/tortoise/tortoise-orm/issues/794
-    q: list[dict[str, Any]] = await db.CaseLog.filter(guild_id=guildId).annotate(caseId=Max("caseId")).values("caseId")  # type: ignore
+    for attempt in range(retries):
+        caseNum = await nextCaseId(bot, guildId)
+        try:
+            await db.CaseLog.create(
+                caseId=caseNum,
+                guild_id=guildId,
+                type=type,
+                modId=modId,
+                targetId=targetId,
+                reason=reason,
+                createdAt=utcnow(),
+            )
+        except IntegrityError:
+            # Case number already taken (by another instance?), reload it
+            # from the database and try again
+            bot.cache.caseIds.clear(guildId)
+            if attempt + 1 >= retries:
+                raise
+            continue
+        return caseNum
 
-    try:
-        caseNum = q[0]["caseId"]
-    except (IndexError, KeyError):
-        caseNum = 0
-    caseNum += 1
-
-    if caseNum:
-        await db.CaseLog.create(
-            caseId=caseNum,
-            guild_id=guildId,
-            type=type,
-            modId=modId,
-            targetId=targetId,
-            reason=reason,
-            createdAt=utcnow(),
-        )
-        return int(caseNum)
+
+async def dedupeCaseIds() -> int:
+    """Renumber duplicated case numbers, required before (guild_id, caseId) is unique
+
+    Oldest case keeps its number, the rest are appended after guild's
+    latest case. Returns number of renumbered cases.
+    """
+    dupes = (
+        await db.CaseLog.annotate(count=Count("id"))
+        .group_by("guild_id", "caseId")
+        .filter(count__gt=1)
+        .values_list("guild_id", flat=True)
+    )
+    renumbered = 0
+    async with in_transaction():
+        for guildId in set(dupes):
+            rows = await db.CaseLog.filter(guild_id=guildId).order_by("caseId", "id").values_list("id", "caseId")
+            lastCaseId = max(caseId for _, caseId in rows)
+            seen: set[int] = set()
+            for id, caseId in rows:
+                if caseId not in seen:
+                    seen.add(caseId)
+                    continue
+                lastCaseId += 1
+                await db.CaseLog.filter(id=id).update(caseId=lastCaseId)
+                renumbered += 1
+    return renumbered
 
 
 TAG_IN_MD = {
@@ -0,0 +1,214 @@
+"""
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import decimal
+import math
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from typing import Optional
+
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore
+
+from . import NumericStringParser
+
+
+__all__ = ("EvaluationLimitExceeded", "MathSandbox")
+
+
+class EvaluationLimitExceeded(Exception):
+    """Expression used too much CPU time or memory"""
+
+
+# Compiled expressions are cached per process, workers get their own parser
+_parser = NumericStringParser()
+
+
+def _limitMemory(memory: int) -> None:
+    if resource is None:
+        return
+
+    # RLIMIT_AS counts address space inherited from the bot, so the limit is
+    # relative to what the worker already has mapped
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        return
+
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = current + memory
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _initWorker(memory: int) -> None:
+    # Ctrl+C is handled by the bot, workers are shut down by MathSandbox.close()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limitMemory(memory)
+
+
+def _ping() -> None:
+    pass
+
+
+def _onCPUTimeExceeded(signum, frame) -> None:
+    raise EvaluationLimitExceeded("Expression took too long to evaluate")
+
+
+def _evaluate(expression: str, cpuTime: float, maxExponent: int) -> Decimal:
+    """Evaluate expression, runs inside a worker process"""
+    timed = hasattr(signal, "setitimer")
+    if timed:
+        # Interrupts the evaluation between bytecodes
+        signal.signal(signal.SIGVTALRM, _onCPUTimeExceeded)
+        signal.setitimer(signal.ITIMER_VIRTUAL, cpuTime)
+    if resource is not None:
+        # Kills the worker if it's stuck in C code where the timer above can't
+        # interrupt it, RLIMIT_CPU counts the worker's total CPU time in whole
+        # seconds, so it's rounded up to the next second
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + cpuTime)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    try:
+        with decimal.localcontext() as ctx:
+            # Magnitude guard, anything above 10^maxExponent raises Overflow
+            ctx.Emax = maxExponent
+            ctx.Emin = -maxExponent
+            return +_parser.eval(expression)
+    except MemoryError:
+        raise EvaluationLimitExceeded("Expression used too much memory") from None
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+
+
+class MathSandbox:
+    """Evaluates calc's expressions in pre-forked worker processes
+
+    Each evaluation is limited to `cpuTime` seconds of CPU time, workers are
+    limited to `memory` bytes on top of what they inherited from the bot.
+    Workers are replaced if one of them has to be killed.
+    """
+
+    __slots__ = ("workers", "cpuTime", "memory", "maxExponent", "_pool", "_semaphore")
+
+    def __init__(
+        self, workers: int = 2, *, cpuTime: float = 1.0, memory: int = 128 * 1024 * 1024, maxExponent: int = 100_000
+    ) -> None:
+        self.workers: int = workers
+        self.cpuTime: float = cpuTime
+        self.memory: int = memory
+        self.maxExponent: int = maxExponent
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(workers)
+
+    @property
+    def timeout(self) -> float:
+        """Wall-clock time to wait for a busy worker before giving up on it"""
+        return self.cpuTime * 2 + 1
+
+    def _createPool(self) -> Optional[ProcessPoolExecutor]:
+        # Workers import this module by forking, spawning them would import
+        # the bot from scratch. Without fork expressions are evaluated
+        # in-process, still with the magnitude guard
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return None
+
+        return ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_initWorker,
+            initargs=(self.memory,),
+        )
+
+    async def start(self) -> None:
+        """Fork the workers, so the first expression doesn't wait for them"""
+        if self._pool is not None:
+            return
+
+        self._pool = self._createPool()
+        if self._pool is not None:
+            # With fork, every worker is started on the first submit
+            await asyncio.wrap_future(self._pool.submit(_ping))
+
+    def _restart(self, pool: ProcessPoolExecutor) -> None:
+        # Another expression might've restarted it already
+        if self._pool is not pool:
+            return
+
+        # A worker might still be stuck on the expression
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._createPool()
+
+    async def evaluate(self, expression: str) -> Decimal:
+        """Evaluate expression with NumericStringParser
+
+        Raises
+        ------
+        EvaluationLimitExceeded
+            Expression used too much CPU time or memory.
+        """
+        if self._pool is None:
+            await self.start()
+
+        if self._pool is None:
+            return _evaluate(expression, self.cpuTime, self.maxExponent)
+
+        # One expression per worker, so the timeout doesn't count time spent
+        # queued behind other expressions
+        async with self._semaphore:
+            retried = False
+            while True:
+                pool = self._pool
+                if pool is None:
+                    raise RuntimeError("MathSandbox is closed")
+
+                try:
+                    future = asyncio.wrap_future(pool.submit(_evaluate, expression, self.cpuTime, self.maxExponent))
+                    # Shielded, so a cancelled future can only mean the pool
+                    # was shut down
+                    return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    future.cancel()
+                    self._restart(pool)
+                    raise EvaluationLimitExceeded("Expression took too long to evaluate") from None
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        future.cancel()
+                        raise
+                except BrokenProcessPool:
+                    if self._pool is pool:
+                        # This expression took the worker down
+                        self._restart(pool)
+                        raise EvaluationLimitExceeded("Expression used too much CPU time or memory") from None
+
+                # Worker was killed because of another expression, give this
+                # one another go on the new pool
+                if retried:
+                    raise EvaluationLimitExceeded("Expression was interrupted, try again")
+                retried = True
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None